@@ -0,0 +1,81 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from replication import ReplicationManager
+from sharding import reconstruct_from_binary_shards
+from storage.local import LocalNetworkStorage
+
+NUM_BACKENDS = 5
+THRESHOLD = 3
+PAYLOAD_SIZES = [1024 * 1024, 16 * 1024 * 1024]
+
+def stored_bytes(backends):
+    total = 0
+    for backend in backends:
+        for locator in backend.list_all():
+            total += len(backend.download(locator))
+    return total
+
+def measure_mode(name, upload, download, payload):
+    backend_root = tempfile.mkdtemp(prefix="tsm_bench_")
+    try:
+        backends = [
+            LocalNetworkStorage(os.path.join(backend_root, f"backend_{i}"))
+            for i in range(NUM_BACKENDS)
+        ]
+        manager = ReplicationManager(backends)
+
+        start_time = time.perf_counter()
+        locators = upload(manager, payload)
+        upload_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        restored = download(manager, backends, locators)
+        download_time = time.perf_counter() - start_time
+        assert restored == payload, f"{name} returned corrupted data"
+
+        overhead = stored_bytes(backends) / len(payload)
+        manager.close()
+    finally:
+        shutil.rmtree(backend_root, ignore_errors=True)
+
+    size_mb = len(payload) / (1024 * 1024)
+    print(
+        f"{name:<12} {size_mb:>6.0f} MB  upload {size_mb / upload_time:>8.1f} MB/s  "
+        f"download {size_mb / download_time:>8.1f} MB/s  stored {overhead:.2f}x"
+    )
+
+def download_shards(manager, backends, locators):
+    shards = [backends[i].download(locators[i]) for i in range(THRESHOLD)]
+    return reconstruct_from_binary_shards(shards)
+
+def run_benchmarks():
+    print(f"Storage mode benchmark: {NUM_BACKENDS} local backends, threshold/k = {THRESHOLD}")
+    modes = [
+        (
+            "replicate",
+            lambda manager, data: manager.replicate_upload("bench", data),
+            lambda manager, backends, locators: manager.replicate_download(locators),
+        ),
+        (
+            "shamir",
+            lambda manager, data: manager.shard_upload("bench", data, THRESHOLD),
+            download_shards,
+        ),
+        (
+            "erasure",
+            lambda manager, data: manager.erasure_upload("bench", data, THRESHOLD),
+            lambda manager, backends, locators: manager.erasure_download(locators, THRESHOLD),
+        ),
+    ]
+    for size in PAYLOAD_SIZES:
+        payload = os.urandom(size)
+        for name, upload, download in modes:
+            measure_mode(name, upload, download, payload)
+
+if __name__ == '__main__':
+    run_benchmarks()
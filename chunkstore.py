@@ -0,0 +1,549 @@
+"""
+Content-addressed, deduplicating chunk storage.
+
+Data is cut into variable-sized chunks with FastCDC-style content-defined
+chunking: a gear rolling hash is computed over every byte and a chunk ends
+where the hash matches a mask, so an insertion or change only moves the
+boundaries near it and the remaining chunks of a file keep their identity.
+Chunks are stored once under their SHA-256 digest, backups and objects are
+described by manifests listing their chunks, and every chunk carries a
+reference count so it is deleted when the last manifest using it goes away.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+import numpy as np
+
+MIN_CHUNK_SIZE = 16 * 1024
+AVG_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+# A fixed pseudo-random value per byte, derived from SHA-256 so chunk
+# boundaries are stable across versions and platforms.
+GEAR_TABLE = np.frombuffer(
+    b"".join(hashlib.sha256(bytes([value])).digest()[:4] for value in range(256)),
+    dtype="<u4",
+).astype(np.uint32)
+
+def _masks(avg_size: int) -> tuple[int, int]:
+    """
+    Returns the strict and the loose boundary masks for an average chunk size.
+
+    Normalized chunking uses a mask with two more bits than the average
+    size calls for before the average is reached and one with two fewer
+    bits after it, which narrows the spread of chunk sizes. The masks take
+    the high bits of the hash, which mix in the most bytes of the window.
+    """
+    bits = max(1, avg_size.bit_length() - 1)
+    strict = ((1 << min(32, bits + 2)) - 1) << (32 - min(32, bits + 2))
+    loose = ((1 << max(1, bits - 2)) - 1) << (32 - max(1, bits - 2))
+    return strict, loose
+
+def gear_hashes(data) -> np.ndarray:
+    """
+    Computes the 32-bit gear rolling hash at every byte of `data`.
+
+    The gear hash h = (h << 1) + GEAR[byte] only depends on the last 32
+    bytes, so instead of a byte-by-byte loop it is built by doubling the
+    window five times over whole arrays.
+    """
+    hashes = GEAR_TABLE[np.frombuffer(data, dtype=np.uint8)]
+    width = 1
+    while width < 32:
+        shifted = np.zeros_like(hashes)
+        shifted[width:] = hashes[:-width] << np.uint32(width)
+        hashes += shifted
+        width *= 2
+    return hashes
+
+def find_boundaries(
+    data,
+    min_size: int = MIN_CHUNK_SIZE,
+    avg_size: int = AVG_CHUNK_SIZE,
+    max_size: int = MAX_CHUNK_SIZE,
+    final: bool = True,
+) -> list[int]:
+    """
+    Finds the chunk end offsets in a buffer that starts at a chunk boundary.
+
+    Args:
+        data: The buffer to chunk.
+        min_size: The minimum chunk size.
+        avg_size: The target average chunk size.
+        max_size: The maximum chunk size.
+        final: Whether the buffer ends the stream. If not, the trailing
+               bytes that do not yet form a complete chunk are left out.
+
+    Returns:
+        The increasing end offsets of the chunks.
+    """
+    if not 64 <= min_size <= avg_size <= max_size:
+        raise ValueError("Chunk sizes must satisfy 64 <= min <= avg <= max.")
+    length = len(data)
+    if length == 0:
+        return []
+
+    strict, loose = _masks(avg_size)
+    hashes = gear_hashes(data)
+    # Candidate cuts are the offsets just after a matching byte
+    strict_cuts = np.flatnonzero((hashes & np.uint32(strict)) == 0) + 1
+    loose_cuts = np.flatnonzero((hashes & np.uint32(loose)) == 0) + 1
+
+    boundaries = []
+    start = 0
+    while start < length:
+        if length - start <= min_size:
+            if final:
+                boundaries.append(length)
+            break
+        normal = start + avg_size
+        limit = start + max_size
+        index = np.searchsorted(strict_cuts, start + min_size)
+        if index < len(strict_cuts) and strict_cuts[index] < min(normal, length + 1):
+            cut = int(strict_cuts[index])
+        else:
+            index = np.searchsorted(loose_cuts, normal)
+            if index < len(loose_cuts) and loose_cuts[index] < min(limit, length + 1):
+                cut = int(loose_cuts[index])
+            elif limit <= length:
+                cut = limit
+            elif final:
+                cut = length
+            else:
+                break
+        if not final and cut >= length and length - start < max_size:
+            # A later block could still move this cut
+            break
+        boundaries.append(cut)
+        start = cut
+    return boundaries
+
+def iter_chunks(
+    stream: BinaryIO,
+    min_size: int = MIN_CHUNK_SIZE,
+    avg_size: int = AVG_CHUNK_SIZE,
+    max_size: int = MAX_CHUNK_SIZE,
+    block_size: int = READ_BLOCK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Reads a stream in large blocks and yields its content-defined chunks.
+    """
+    pending = b""
+    while True:
+        block = stream.read(block_size)
+        final = not block
+        buffer = pending + block if pending else block
+        start = 0
+        for end in find_boundaries(buffer, min_size, avg_size, max_size, final=final):
+            yield buffer[start:end]
+            start = end
+        pending = buffer[start:]
+        if final:
+            return
+
+@dataclass
+class ChunkedObject:
+    """The result of storing one stream in a ChunkStore."""
+    chunks: list[str]
+    size: int
+    sha256: str
+    new_chunks: int = 0
+    new_bytes: int = 0
+
+@dataclass
+class TreeBackupStats:
+    """The result of storing a directory tree in a ChunkStore."""
+    files: int = 0
+    bytes: int = 0
+    new_chunks: int = 0
+    new_bytes: int = 0
+    errors: list[str] = field(default_factory=list)
+
+class ChunkStore:
+    """
+    A deduplicating store of content-addressed chunks and manifests.
+
+    Chunks are files under `<root>/chunks/<first two hex digits>/<digest>`.
+    Manifests and per-chunk reference counts live in a SQLite index at
+    `<root>/index.db` and are updated in one transaction, so a manifest
+    never references a chunk that is not counted. Chunks are written before
+    their manifest is committed; a crash in between only leaves unreferenced
+    chunks behind, which `collect_garbage()` removes.
+    """
+
+    def __init__(
+        self,
+        root,
+        min_size: int = MIN_CHUNK_SIZE,
+        avg_size: int = AVG_CHUNK_SIZE,
+        max_size: int = MAX_CHUNK_SIZE,
+    ):
+        self.root = Path(root)
+        self.chunk_dir = self.root / "chunks"
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.root / "index.db", check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (digest TEXT PRIMARY KEY, size INTEGER NOT NULL, refcount INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS manifests (name TEXT PRIMARY KEY, manifest TEXT NOT NULL)")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def chunk_path(self, digest: str) -> Path:
+        return self.chunk_dir / digest[:2] / digest
+
+    def has_chunk(self, digest: str) -> bool:
+        return self.chunk_path(digest).exists()
+
+    def put_chunk(self, data) -> tuple[str, bool]:
+        """
+        Stores a chunk unless it is already present.
+
+        Returns:
+            The chunk digest and whether it was newly written.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if path.exists():
+            return digest, False
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, True
+
+    def get_chunk(self, digest: str) -> bytes:
+        """
+        Reads a chunk and verifies it against its digest.
+
+        Raises:
+            KeyError: If the chunk does not exist.
+            ValueError: If the chunk is corrupt.
+        """
+        try:
+            data = self.chunk_path(digest).read_bytes()
+        except FileNotFoundError:
+            raise KeyError(digest) from None
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk {digest} is corrupt.")
+        return data
+
+    def store_stream(self, stream: BinaryIO) -> ChunkedObject:
+        """
+        Chunks a stream and stores the chunks that are not yet present.
+
+        The returned chunk list must be committed with `add_manifest()`
+        to be protected from garbage collection.
+        """
+        file_hash = hashlib.sha256()
+        result = ChunkedObject(chunks=[], size=0, sha256="")
+        for chunk in iter_chunks(stream, self.min_size, self.avg_size, self.max_size):
+            file_hash.update(chunk)
+            digest, written = self.put_chunk(chunk)
+            result.chunks.append(digest)
+            result.size += len(chunk)
+            if written:
+                result.new_chunks += 1
+                result.new_bytes += len(chunk)
+        result.sha256 = file_hash.hexdigest()
+        return result
+
+    def store_bytes(self, data: bytes) -> ChunkedObject:
+        """
+        Chunks and stores an in-memory buffer.
+        """
+        file_hash = hashlib.sha256(data)
+        result = ChunkedObject(chunks=[], size=len(data), sha256=file_hash.hexdigest())
+        start = 0
+        view = memoryview(data)
+        for end in find_boundaries(data, self.min_size, self.avg_size, self.max_size):
+            digest, written = self.put_chunk(view[start:end])
+            result.chunks.append(digest)
+            if written:
+                result.new_chunks += 1
+                result.new_bytes += end - start
+            start = end
+        return result
+
+    def read_chunks(self, digests: Iterable[str]) -> Iterator[bytes]:
+        for digest in digests:
+            yield self.get_chunk(digest)
+
+    @staticmethod
+    def _manifest_chunks(manifest: dict) -> list[str]:
+        """
+        Returns every chunk reference of a manifest, with repeats.
+        """
+        if "files" in manifest:
+            return [digest for entry in manifest["files"] for digest in entry["chunks"]]
+        return list(manifest.get("chunks", []))
+
+    def add_manifest(self, name: str, manifest: dict) -> None:
+        """
+        Commits a manifest and takes a reference on each of its chunks.
+
+        A manifest is either {"chunks": [...]} for a single object or
+        {"files": [{"path", "chunks", ...}, ...]} for a directory tree.
+
+        Raises:
+            ValueError: If the name is taken or a referenced chunk is missing.
+        """
+        counts = {}
+        for digest in self._manifest_chunks(manifest):
+            counts[digest] = counts.get(digest, 0) + 1
+
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM manifests WHERE name = ?", (name,)).fetchone():
+                raise ValueError(f"Manifest '{name}' already exists.")
+            known = {
+                row[0] for row in self._conn.execute(
+                    "SELECT digest FROM chunks WHERE digest IN (SELECT value FROM json_each(?))",
+                    (json.dumps(list(counts)),),
+                )
+            }
+            sizes = {}
+            for digest in counts:
+                if digest in known:
+                    continue
+                path = self.chunk_path(digest)
+                if not path.exists():
+                    raise ValueError(f"Manifest '{name}' references missing chunk {digest}.")
+                sizes[digest] = path.stat().st_size
+
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO chunks (digest, size, refcount) VALUES (?, ?, 0) ON CONFLICT(digest) DO NOTHING",
+                    sizes.items(),
+                )
+                self._conn.executemany(
+                    "UPDATE chunks SET refcount = refcount + ? WHERE digest = ?",
+                    ((count, digest) for digest, count in counts.items()),
+                )
+                self._conn.execute(
+                    "INSERT INTO manifests (name, manifest) VALUES (?, ?)", (name, json.dumps(manifest))
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_manifest(self, name: str) -> dict:
+        """
+        Raises:
+            KeyError: If there is no manifest with this name.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT manifest FROM manifests WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return json.loads(row[0])
+
+    def list_manifests(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM manifests ORDER BY name")]
+
+    def delete_manifest(self, name: str) -> Optional[int]:
+        """
+        Deletes a manifest and drops its chunk references.
+
+        Returns:
+            The number of chunks freed because nothing references them
+            anymore, or None if there is no manifest with this name.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT manifest FROM manifests WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            counts = {}
+            for digest in self._manifest_chunks(json.loads(row[0])):
+                counts[digest] = counts.get(digest, 0) + 1
+
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM manifests WHERE name = ?", (name,))
+                self._conn.executemany(
+                    "UPDATE chunks SET refcount = refcount - ? WHERE digest = ?",
+                    ((count, digest) for digest, count in counts.items()),
+                )
+                freed = [
+                    row[0] for row in self._conn.execute(
+                        "SELECT digest FROM chunks WHERE refcount <= 0 AND digest IN (SELECT value FROM json_each(?))",
+                        (json.dumps(list(counts)),),
+                    )
+                ]
+                self._conn.executemany("DELETE FROM chunks WHERE digest = ?", ((digest,) for digest in freed))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            # Files go only after the commit, and under the lock so that a
+            # concurrent add_manifest cannot count a chunk being removed.
+            for digest in freed:
+                try:
+                    self.chunk_path(digest).unlink()
+                except FileNotFoundError:
+                    pass
+        return len(freed)
+
+    def missing_chunks(self, name: str) -> list[str]:
+        """
+        Returns the chunks of a manifest that are not present on disk.
+        """
+        manifest = self.get_manifest(name)
+        return [digest for digest in dict.fromkeys(self._manifest_chunks(manifest)) if not self.has_chunk(digest)]
+
+    def collect_garbage(self) -> int:
+        """
+        Removes chunk files that no committed manifest references.
+
+        Must not run concurrently with backups, whose chunks are written
+        before their manifest is committed.
+
+        Returns:
+            The number of chunk files removed.
+        """
+        removed = 0
+        with self._lock:
+            referenced = {row[0] for row in self._conn.execute("SELECT digest FROM chunks WHERE refcount > 0")}
+            for prefix in os.scandir(self.chunk_dir):
+                if not prefix.is_dir():
+                    continue
+                for entry in os.scandir(prefix.path):
+                    if entry.name not in referenced:
+                        os.remove(entry.path)
+                        removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        """
+        Returns the number of manifests, unique chunks, bytes stored and
+        logical bytes referenced.
+        """
+        with self._lock:
+            chunks, stored, logical = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(size * refcount), 0) FROM chunks"
+            ).fetchone()
+            manifests = self._conn.execute("SELECT COUNT(*) FROM manifests").fetchone()[0]
+        return {"manifests": manifests, "chunks": chunks, "stored_bytes": stored, "logical_bytes": logical}
+
+    def _store_file(self, root: Path, path: Path) -> tuple[dict, ChunkedObject]:
+        """
+        Stores one file and returns its manifest entry and chunking result.
+        """
+        stat = path.stat()
+        with path.open("rb") as f:
+            result = self.store_stream(f)
+        entry = {
+            "path": path.relative_to(root).as_posix(),
+            "size": result.size,
+            "mode": stat.st_mode & 0o7777,
+            "mtime": stat.st_mtime,
+            "sha256": result.sha256,
+            "chunks": result.chunks,
+        }
+        return entry, result
+
+    def _safe_store(self, root: Path, path: Path):
+        try:
+            return self._store_file(root, path)
+        except Exception as e:
+            return e
+
+    def backup_tree(
+        self,
+        src,
+        name: str,
+        executor: Optional[ThreadPoolExecutor] = None,
+        exclude: Iterable[str] = (),
+    ) -> tuple[dict, TreeBackupStats]:
+        """
+        Stores every file of a directory tree and commits it as a manifest.
+
+        Args:
+            src: The directory to back up.
+            name: The manifest name.
+            executor: Optional pool to chunk files in parallel.
+            exclude: File names to skip.
+
+        Returns:
+            The committed manifest and the backup statistics.
+        """
+        src = Path(src)
+        excluded = set(exclude)
+        files = sorted(p for p in src.rglob("*") if p.is_file() and p.name not in excluded)
+
+        stats = TreeBackupStats()
+        if executor is None:
+            results = [self._safe_store(src, path) for path in files]
+        else:
+            results = list(executor.map(lambda path: self._safe_store(src, path), files))
+
+        entries = []
+        for path, outcome in zip(files, results):
+            if isinstance(outcome, Exception):
+                stats.errors.append(f"{path}: {outcome}")
+                continue
+            entry, result = outcome
+            stats.files += 1
+            stats.bytes += result.size
+            stats.new_chunks += result.new_chunks
+            stats.new_bytes += result.new_bytes
+            entries.append(entry)
+
+        manifest = {"files": entries}
+        self.add_manifest(name, manifest)
+        return manifest, stats
+
+    def restore_tree(self, name: str, dst) -> int:
+        """
+        Rebuilds the files of a tree manifest under `dst`.
+
+        Returns:
+            The number of bytes written.
+        """
+        dst = Path(dst)
+        written = 0
+        for entry in self.get_manifest(name)["files"]:
+            target = dst / entry["path"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with target.open("wb") as f:
+                for chunk in self.read_chunks(entry["chunks"]):
+                    f.write(chunk)
+                    written += len(chunk)
+            os.chmod(target, entry["mode"])
+            os.utime(target, (entry["mtime"], entry["mtime"]))
+        return written
+
+def manifest_tree_digest(manifest: dict) -> str:
+    """
+    Computes the same tree digest as hashing every file of the restored tree
+    in path order, from the file hashes recorded in a tree manifest.
+    """
+    digest = hashlib.sha256()
+    for entry in sorted(manifest["files"], key=lambda entry: Path(entry["path"])):
+        digest.update(entry["sha256"].encode())
+    return digest.hexdigest()
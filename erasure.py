@@ -0,0 +1,197 @@
+"""
+Systematic Reed-Solomon erasure coding over GF(2^8).
+
+Data is cut into k equal stripes and n - k parity stripes are computed
+with a Cauchy matrix, so any k of the n shards rebuild the data. Storage
+and upload cost is n/k times the data size, instead of n times for full
+replication or Shamir sharding. Each shard carries a header with its
+position and a SHA-256 checksum of its payload, so corrupt shards are
+detected and treated as missing.
+"""
+
+import hashlib
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from gf256 import MUL_TABLE, gf_inv, gf_mul
+
+SHARD_MAGIC = b"TSRS"
+# magic, data shards (k), total shards (n), shard index, data length, checksum
+HEADER_FORMAT = ">4sBBBQ32s"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+@dataclass
+class ShardHeader:
+    """The metadata stored at the start of every erasure-coded shard."""
+    data_shards: int
+    total_shards: int
+    index: int
+    data_length: int
+    checksum: bytes
+
+def parse_header(shard: bytes) -> ShardHeader:
+    """
+    Parses and validates the header of an erasure-coded shard.
+
+    Raises:
+        ValueError: If the shard is truncated or not an erasure-coded shard.
+    """
+    if len(shard) < HEADER_SIZE:
+        raise ValueError("Shard is too short to contain a header.")
+    magic, k, n, index, length, checksum = struct.unpack_from(HEADER_FORMAT, shard)
+    if magic != SHARD_MAGIC:
+        raise ValueError("Not an erasure-coded shard.")
+    if not 1 <= k <= n or index >= n:
+        raise ValueError("Invalid shard header.")
+    return ShardHeader(k, n, index, length, checksum)
+
+def verify_shard(shard: bytes) -> bool:
+    """
+    Returns True if the shard header is valid and its payload checksum matches.
+    """
+    try:
+        header = parse_header(shard)
+    except ValueError:
+        return False
+    payload = memoryview(shard)[HEADER_SIZE:]
+    return hashlib.sha256(payload).digest() == header.checksum
+
+def _parity_matrix(data_shards: int, total_shards: int) -> list[list[int]]:
+    """
+    Builds the Cauchy matrix used for the parity rows.
+
+    Row i, column j is 1 / (x_i + y_j) with x_i = k + i and y_j = j. Every
+    square submatrix of a Cauchy matrix is invertible, so the identity rows
+    for the data shards stacked on top of it have any k rows invertible.
+    """
+    return [
+        [gf_inv((data_shards + i) ^ j) for j in range(data_shards)]
+        for i in range(total_shards - data_shards)
+    ]
+
+def _encoding_row(index: int, data_shards: int, parity: list[list[int]]) -> list[int]:
+    """
+    Returns the row of the systematic encoding matrix for a shard index.
+    """
+    if index < data_shards:
+        return [1 if j == index else 0 for j in range(data_shards)]
+    return parity[index - data_shards]
+
+def _invert_matrix(matrix: list[list[int]]) -> list[list[int]]:
+    """
+    Inverts a square matrix over GF(2^8) with Gauss-Jordan elimination.
+    """
+    size = len(matrix)
+    augmented = [row[:] + [1 if i == j else 0 for j in range(size)] for i, row in enumerate(matrix)]
+    for column in range(size):
+        pivot = next((r for r in range(column, size) if augmented[r][column]), None)
+        if pivot is None:
+            raise ValueError("Shard matrix is singular.")
+        augmented[column], augmented[pivot] = augmented[pivot], augmented[column]
+        scale = gf_inv(augmented[column][column])
+        augmented[column] = [gf_mul(value, scale) for value in augmented[column]]
+        for r in range(size):
+            factor = augmented[r][column]
+            if r != column and factor:
+                augmented[r] = [
+                    value ^ gf_mul(factor, pivot_value)
+                    for value, pivot_value in zip(augmented[r], augmented[column])
+                ]
+    return [row[size:] for row in augmented]
+
+def _combine(coefficients: list[int], stripes: list[np.ndarray]) -> np.ndarray:
+    """
+    Computes the GF(2^8) linear combination of equally sized stripes.
+    """
+    result = np.zeros(len(stripes[0]), dtype=np.uint8)
+    for coefficient, stripe in zip(coefficients, stripes):
+        if coefficient == 1:
+            result ^= stripe
+        elif coefficient:
+            result ^= MUL_TABLE[coefficient][stripe]
+    return result
+
+def encode(data: bytes, data_shards: int, total_shards: int) -> list[bytes]:
+    """
+    Encodes data into `total_shards` shards, any `data_shards` of which
+    are enough to rebuild it.
+
+    Args:
+        data: The data to encode.
+        data_shards: The number of data stripes (k).
+        total_shards: The total number of shards (n), at most 255.
+
+    Returns:
+        A list of shards, each a header followed by ceil(len(data) / k) bytes.
+    """
+    if not 1 <= data_shards <= total_shards:
+        raise ValueError("Data shards must be between 1 and the total number of shards.")
+    if total_shards > 255:
+        raise ValueError("Reed-Solomon over GF(256) supports at most 255 shards.")
+
+    stripe_size = max(1, -(-len(data) // data_shards))
+    padded = np.zeros(stripe_size * data_shards, dtype=np.uint8)
+    padded[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+    stripes = list(padded.reshape(data_shards, stripe_size))
+
+    parity = _parity_matrix(data_shards, total_shards)
+    payloads = stripes + [_combine(row, stripes) for row in parity]
+
+    shards = []
+    for index, payload in enumerate(payloads):
+        payload = payload.tobytes()
+        header = struct.pack(
+            HEADER_FORMAT, SHARD_MAGIC, data_shards, total_shards, index,
+            len(data), hashlib.sha256(payload).digest(),
+        )
+        shards.append(header + payload)
+    return shards
+
+def decode(shards: list[Optional[bytes]]) -> bytes:
+    """
+    Rebuilds data from any `data_shards` valid shards.
+
+    Args:
+        shards: Shards in any order. Missing shards may be None, and shards
+                that fail their checksum are ignored.
+
+    Returns:
+        The original data.
+
+    Raises:
+        ValueError: If fewer than `data_shards` valid shards are available.
+    """
+    valid = {}
+    for shard in shards:
+        if shard is not None and verify_shard(shard):
+            header = parse_header(shard)
+            valid.setdefault(header.index, (header, shard))
+    if not valid:
+        raise ValueError("No valid shards available.")
+
+    header = next(iter(valid.values()))[0]
+    k, n, length = header.data_shards, header.total_shards, header.data_length
+    chosen = sorted(valid)[:k]
+    if len(chosen) < k:
+        raise ValueError(f"Need {k} valid shards to decode, found {len(chosen)}.")
+
+    stripes = [
+        np.frombuffer(valid[index][1], dtype=np.uint8, offset=HEADER_SIZE)
+        for index in chosen
+    ]
+    if chosen == list(range(k)):
+        # All data shards survived; no arithmetic needed.
+        return b"".join(stripe.tobytes() for stripe in stripes)[:length]
+
+    parity = _parity_matrix(k, n)
+    decoding = _invert_matrix([_encoding_row(index, k, parity) for index in chosen])
+    data_stripes = []
+    for row in range(k):
+        if row in valid:
+            data_stripes.append(np.frombuffer(valid[row][1], dtype=np.uint8, offset=HEADER_SIZE))
+        else:
+            data_stripes.append(_combine(decoding[row], stripes))
+    return b"".join(stripe.tobytes() for stripe in data_stripes)[:length]
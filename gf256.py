@@ -0,0 +1,158 @@
+"""
+Byte-wise Shamir secret sharing over GF(2^8).
+
+Every byte of the secret is shared independently with its own random
+polynomial, using table-based field arithmetic applied to whole NumPy
+uint8 arrays at once. A share is a one-byte x-coordinate followed by as
+many bytes as the secret, so payloads of any size can be split and
+shares are barely larger than the input.
+"""
+
+import os
+
+import numpy as np
+
+# The AES field polynomial x^8 + x^4 + x^3 + x + 1, with generator 3.
+FIELD_POLYNOMIAL = 0x11b
+GENERATOR = 3
+
+def _build_tables():
+    """ Builds the exponent, logarithm and full multiplication tables.
+    """
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int32)
+    value = 1
+    for power in range(255):
+        exp[power] = value
+        log[value] = power
+        # Multiply by the generator (x + 1): value * 2 ^ value
+        doubled = value << 1
+        if doubled & 0x100:
+            doubled ^= FIELD_POLYNOMIAL
+        value = doubled ^ value
+    exp[255:510] = exp[:255]
+
+    nonzero = np.arange(1, 256)
+    mul = np.zeros((256, 256), dtype=np.uint8)
+    mul[1:, 1:] = exp[(log[nonzero][:, None] + log[nonzero][None, :])]
+
+    inv = np.zeros(256, dtype=np.uint8)
+    inv[1:] = exp[255 - log[nonzero]]
+    return exp, log, mul, inv
+
+EXP_TABLE, LOG_TABLE, MUL_TABLE, INV_TABLE = _build_tables()
+
+def gf_mul(a: int, b: int) -> int:
+    """ Multiplies two field elements.
+    """
+    return int(MUL_TABLE[a, b])
+
+def gf_inv(a: int) -> int:
+    """ Returns the multiplicative inverse of a non-zero field element.
+    """
+    if a == 0:
+        raise ZeroDivisionError('Zero has no inverse in GF(256).')
+    return int(INV_TABLE[a])
+
+def lagrange_coefficients(x_values, x: int = 0) -> list[int]:
+    """ Returns the Lagrange basis coefficients for evaluating at x.
+
+    Subtraction in GF(2^8) is XOR, so each basis polynomial evaluated at x
+    is the product of (x - x_j) / (x_i - x_j) over all j != i.
+    """
+    coefficients = []
+    for i, x_i in enumerate(x_values):
+        numerator = 1
+        denominator = 1
+        for j, x_j in enumerate(x_values):
+            if i == j:
+                continue
+            numerator = gf_mul(numerator, x ^ x_j)
+            denominator = gf_mul(denominator, x_i ^ x_j)
+        coefficients.append(gf_mul(numerator, gf_inv(denominator)))
+    return coefficients
+
+def evaluate_polynomials(coefficients: np.ndarray, x: int) -> np.ndarray:
+    """ Evaluates one polynomial per column at x using Horner's rule.
+
+    Args:
+        coefficients: A (degree + 1, length) uint8 array whose first row is
+                      the intercept.
+        x: The field element to evaluate at.
+
+    Returns:
+        A uint8 array with one value per column.
+    """
+    row = MUL_TABLE[x]
+    y = coefficients[-1].copy()
+    for coefficient in coefficients[-2::-1]:
+        y = row[y]
+        y ^= coefficient
+    return y
+
+def _parse_shares(shares):
+    """ Splits binary shares into x-coordinates and a matrix of y values.
+    """
+    if not isinstance(shares, (list, tuple)) or len(shares) < 2:
+        raise ValueError('Shares must be a list of at least two shares.')
+    lengths = {len(share) for share in shares}
+    if len(lengths) != 1 or lengths.pop() < 1:
+        raise ValueError('All shares must be non-empty and of the same length.')
+
+    x_values = [share[0] for share in shares]
+    if 0 in x_values or len(set(x_values)) != len(x_values):
+        raise ValueError('Share x-coordinates must be distinct and non-zero.')
+    y_values = [np.frombuffer(share, dtype=np.uint8, offset=1) for share in shares]
+    return x_values, y_values
+
+def interpolate_at(shares, x: int) -> np.ndarray:
+    """ Evaluates the shared polynomials at x from a threshold of shares.
+
+    Args:
+        shares: At least `threshold` binary shares.
+        x: The field element to evaluate at; 0 recovers the secret.
+
+    Returns:
+        A uint8 array with the polynomial values at x.
+    """
+    x_values, y_values = _parse_shares(shares)
+    result = np.zeros(len(y_values[0]), dtype=np.uint8)
+    for basis, y in zip(lagrange_coefficients(x_values, x), y_values):
+        result ^= MUL_TABLE[basis][y]
+    return result
+
+def split_secret(secret: bytes, share_threshold: int, num_shares: int) -> list[bytes]:
+    """ Splits a secret into binary shares.
+
+    Args:
+        secret: The bytes to share.
+        share_threshold: The number of shares required for recovery.
+        num_shares: The number of shares to create (at most 255).
+
+    Returns:
+        A list of shares, each one x-coordinate byte followed by
+        len(secret) bytes.
+    """
+    if share_threshold < 2:
+        raise ValueError('Share threshold must be >= 2.')
+    if share_threshold > num_shares:
+        raise ValueError('Share threshold must be less than or equal to the number of shares.')
+    if num_shares > 255:
+        raise ValueError('GF(256) sharing supports at most 255 shares.')
+
+    data = np.frombuffer(secret, dtype=np.uint8)
+    coefficients = np.empty((share_threshold, len(data)), dtype=np.uint8)
+    coefficients[0] = data
+    coefficients[1:] = np.frombuffer(
+        os.urandom((share_threshold - 1) * len(data)), dtype=np.uint8
+    ).reshape(share_threshold - 1, len(data))
+
+    shares = []
+    for x in range(1, num_shares + 1):
+        shares.append(bytes([x]) + evaluate_polynomials(coefficients, x).tobytes())
+    return shares
+
+def recover_secret(shares: list[bytes]) -> bytes:
+    """ Recovers a secret from at least a threshold of binary shares.
+    """
+    return interpolate_at(shares, 0).tobytes()
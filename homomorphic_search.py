@@ -17,11 +17,13 @@ class HomomorphicSearchPrototype:
         Encrypts a keyword using a simple XOR cipher.
 
         Args:
-            keyword (str): The keyword to encrypt.
+            keyword (str or bytes): The keyword to encrypt.
 
         Returns:
             bytes: The encrypted keyword.
         """
+        if isinstance(keyword, str):
+            keyword = keyword.encode('utf-8')
         key = b'secret_key'
         encrypted_keyword = bytearray()
         for i in range(len(keyword)):
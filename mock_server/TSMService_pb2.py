@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10TSMService.proto\x12\x03tsm\"\x07\n\x05\x45mpty\"+\n\x15GetSessionDataRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"0\n\x16GetSessionDataResponse\x12\x16\n\x0e\x64\x65\x63rypted_data\x18\x01 \x01(\x0c\"6\n\x15\x41nalyzeSessionRequest\x12\x1d\n\x07session\x18\x01 \x01(\x0b\x32\x0c.tsm.Session\"=\n\x16\x41nalyzeSessionResponse\x12#\n\x06report\x18\x01 \x01(\x0b\x32\x13.tsm.SecurityReport\"I\n\x0eSecurityReport\x12\x12\n\nrisk_score\x18\x01 \x01(\x02\x12\x0f\n\x07threats\x18\x02 \x03(\t\x12\x12\n\nrecommends\x18\x03 \x03(\t\".\n\x18GetSessionDetailsRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\":\n\x19GetSessionDetailsResponse\x12\x1d\n\x07session\x18\x01 \x01(\x0b\x32\x0c.tsm.Session\",\n\x18SRPAuthenticationRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"5\n\x14SRPChallengeResponse\x12\x0c\n\x04salt\x18\x01 \x01(\x0c\x12\x0f\n\x07serverB\x18\x02 \x01(\x0c\"#\n\x10SRPVerifyRequest\x12\x0f\n\x07\x63lientA\x18\x01 \x01(\x0c\"\x1f\n\x11SRPVerifyResponse\x12\n\n\x02m2\x18\x01 \x01(\x0c\"\xab\x01\n\x16\x45ncryptedSearchRequest\x12\x19\n\x11\x65ncrypted_queries\x18\x01 \x03(\t\x12=\n\x08operator\x18\x02 \x01(\x0e\x32+.tsm.EncryptedSearchRequest.BooleanOperator\x12\x13\n\x0bsearch_type\x18\x03 \x01(\t\"\"\n\x0f\x42ooleanOperator\x12\x07\n\x03\x41ND\x10\x00\x12\x06\n\x02OR\x10\x01\"a\n\x0eSearchResponse\x12\x1c\n\x14matching_session_ids\x18\x01 \x03(\t\x12\x15\n\rtotal_matches\x18\x02 \x01(\x05\x12\x1a\n\x12search_duration_ms\x18\x03 \x01(\x01\"\xa7\x01\n\x07Session\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x19\n\x11\x63reated_timestamp\x18\x03 \x01(\x03\x12\x12\n\nsize_bytes\x18\x04 \x01(\x03\x12\x14\n\x0cis_encrypted\x18\x05 \x01(\x08\x12\x0c\n\x04tags\x18\x06 \x03(\t\x12\x16\n\x0elast_used_date\x18\x07 \x01(\x03\x12\x17\n\x0f\x65ncryption_type\x18\x08 \x01(\t\"-\n\x0bSessionList\x12\x1e\n\x08sessions\x18\x01 \x03(\x0b\x32\x0c.tsm.Session\"#\n\rSwitchRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"2\n\x0eSwitchResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"#\n\rBackupRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"Y\n\x0b\x42\x61\x63kupChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x14\n\x0c\x63hunk_number\x18\x02 \x01(\x05\x12\x14\n\x0ctotal_chunks\x18\x03 \x01(\x05\x12\x10\n\x08\x63hecksum\x18\x04 \x01(\t\"\xc2\x01\n\rSystemMetrics\x12\x19\n\x11\x63pu_usage_percent\x18\x01 \x01(\x02\x12\x1a\n\x12memory_usage_bytes\x18\x02 \x01(\x03\x12\x17\n\x0f\x61\x63tive_sessions\x18\x03 \x01(\x05\x12\x1b\n\x13total_storage_bytes\x18\x04 \x01(\x03\x12$\n\x1c\x65ncrypted_searches_performed\x18\x05 \x01(\x05\x12\x1e\n\x16\x61verage_search_time_ms\x18\x06 \x01(\x01\"+\n\x17ZKAuthenticationRequest\x12\x10\n\x08username\x18\x01 \x01(\t\" \n\x13ZKChallengeResponse\x12\t\n\x01H\x18\x01 \x01(\t\"1\n\x0eZKProofRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05proof\x18\x02 \x01(\t\"(\n\x0fZKProofResponse\x12\x15\n\rsession_token\x18\x01 \x01(\t\"\x88\x01\n\rBackendConfig\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x36\n\nparameters\x18\x02 \x03(\x0b\x32\".tsm.BackendConfig.ParametersEntry\x1a\x31\n\x0fParametersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"<\n\x14StorageConfiguration\x12$\n\x08\x62\x61\x63kends\x18\x01 \x03(\x0b\x32\x12.tsm.BackendConfig\"?\n\x18\x41\x64\x64StorageBackendRequest\x12#\n\x07\x62\x61\x63kend\x18\x01 \x01(\x0b\x32\x12.tsm.BackendConfig\"1\n\x1bRemoveStorageBackendRequest\x12\x12\n\nbackend_id\x18\x01 \x01(\t\"<\n\x18StorageOperationResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t*\"\n\x0f\x42ooleanOperator\x12\x07\n\x03\x41ND\x10\x00\x12\x06\n\x02OR\x10\x01\x32\x95\x08\n\nTSMService\x12,\n\x0cListSessions\x12\n.tsm.Empty\x1a\x10.tsm.SessionList\x12I\n\x0eGetSessionData\x12\x1a.tsm.GetSessionDataRequest\x1a\x1b.tsm.GetSessionDataResponse\x12I\n\x0e\x41nalyzeSession\x12\x1a.tsm.AnalyzeSessionRequest\x1a\x1b.tsm.AnalyzeSessionResponse\x12\x38\n\rSwitchSession\x12\x12.tsm.SwitchRequest\x1a\x13.tsm.SwitchResponse\x12R\n\x11GetSessionDetails\x12\x1d.tsm.GetSessionDetailsRequest\x1a\x1e.tsm.GetSessionDetailsResponse\x12R\n\x16StartSRPAuthentication\x12\x1d.tsm.SRPAuthenticationRequest\x1a\x19.tsm.SRPChallengeResponse\x12:\n\tVerifySRP\x12\x15.tsm.SRPVerifyRequest\x1a\x16.tsm.SRPVerifyResponse\x12\x43\n\x0f\x45ncryptedSearch\x12\x1b.tsm.EncryptedSearchRequest\x1a\x13.tsm.SearchResponse\x12O\n\x15StartZKAuthentication\x12\x1c.tsm.ZKAuthenticationRequest\x1a\x18.tsm.ZKChallengeResponse\x12:\n\rVerifyZKProof\x12\x13.tsm.ZKProofRequest\x1a\x14.tsm.ZKProofResponse\x12\x37\n\rBackupSession\x12\x12.tsm.BackupRequest\x1a\x10.tsm.BackupChunk0\x01\x12,\n\nGetMetrics\x12\n.tsm.Empty\x1a\x12.tsm.SystemMetrics\x12@\n\x17GetStorageConfiguration\x12\n.tsm.Empty\x1a\x19.tsm.StorageConfiguration\x12Q\n\x11\x41\x64\x64StorageBackend\x12\x1d.tsm.AddStorageBackendRequest\x1a\x1d.tsm.StorageOperationResponse\x12W\n\x14RemoveStorageBackend\x12 .tsm.RemoveStorageBackendRequest\x1a\x1d.tsm.StorageOperationResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10TSMService.proto\x12\x03tsm\"\x07\n\x05\x45mpty\"+\n\x15GetSessionDataRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"0\n\x16GetSessionDataResponse\x12\x16\n\x0e\x64\x65\x63rypted_data\x18\x01 \x01(\x0c\"6\n\x15\x41nalyzeSessionRequest\x12\x1d\n\x07session\x18\x01 \x01(\x0b\x32\x0c.tsm.Session\"=\n\x16\x41nalyzeSessionResponse\x12#\n\x06report\x18\x01 \x01(\x0b\x32\x13.tsm.SecurityReport\"1\n\x1a\x41nalyzeSessionsBulkRequest\x12\x13\n\x0bsession_ids\x18\x01 \x03(\t\"P\n\x15SessionSecurityReport\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12#\n\x06report\x18\x02 \x01(\x0b\x32\x13.tsm.SecurityReport\"I\n\x0eSecurityReport\x12\x12\n\nrisk_score\x18\x01 \x01(\x02\x12\x0f\n\x07threats\x18\x02 \x03(\t\x12\x12\n\nrecommends\x18\x03 \x03(\t\".\n\x18GetSessionDetailsRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\":\n\x19GetSessionDetailsResponse\x12\x1d\n\x07session\x18\x01 \x01(\x0b\x32\x0c.tsm.Session\",\n\x18SRPAuthenticationRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"5\n\x14SRPChallengeResponse\x12\x0c\n\x04salt\x18\x01 \x01(\x0c\x12\x0f\n\x07serverB\x18\x02 \x01(\x0c\"#\n\x10SRPVerifyRequest\x12\x0f\n\x07\x63lientA\x18\x01 \x01(\x0c\"\x1f\n\x11SRPVerifyResponse\x12\n\n\x02m2\x18\x01 \x01(\x0c\"\xab\x01\n\x16\x45ncryptedSearchRequest\x12\x19\n\x11\x65ncrypted_queries\x18\x01 \x03(\t\x12=\n\x08operator\x18\x02 \x01(\x0e\x32+.tsm.EncryptedSearchRequest.BooleanOperator\x12\x13\n\x0bsearch_type\x18\x03 \x01(\t\"\"\n\x0f\x42ooleanOperator\x12\x07\n\x03\x41ND\x10\x00\x12\x06\n\x02OR\x10\x01\"a\n\x0eSearchResponse\x12\x1c\n\x14matching_session_ids\x18\x01 \x03(\t\x12\x15\n\rtotal_matches\x18\x02 \x01(\x05\x12\x1a\n\x12search_duration_ms\x18\x03 \x01(\x01\"\xa7\x01\n\x07Session\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x19\n\x11\x63reated_timestamp\x18\x03 \x01(\x03\x12\x12\n\nsize_bytes\x18\x04 \x01(\x03\x12\x14\n\x0cis_encrypted\x18\x05 \x01(\x08\x12\x0c\n\x04tags\x18\x06 \x03(\t\x12\x16\n\x0elast_used_date\x18\x07 \x01(\x03\x12\x17\n\x0f\x65ncryption_type\x18\x08 \x01(\t\"-\n\x0bSessionList\x12\x1e\n\x08sessions\x18\x01 \x03(\x0b\x32\x0c.tsm.Session\"#\n\rSwitchRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"2\n\x0eSwitchResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"#\n\rBackupRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"Y\n\x0b\x42\x61\x63kupChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x14\n\x0c\x63hunk_number\x18\x02 \x01(\x05\x12\x14\n\x0ctotal_chunks\x18\x03 \x01(\x05\x12\x10\n\x08\x63hecksum\x18\x04 \x01(\t\"\xee\x01\n\rSystemMetrics\x12\x19\n\x11\x63pu_usage_percent\x18\x01 \x01(\x02\x12\x1a\n\x12memory_usage_bytes\x18\x02 \x01(\x03\x12\x17\n\x0f\x61\x63tive_sessions\x18\x03 \x01(\x05\x12\x1b\n\x13total_storage_bytes\x18\x04 \x01(\x03\x12$\n\x1c\x65ncrypted_searches_performed\x18\x05 \x01(\x05\x12\x1e\n\x16\x61verage_search_time_ms\x18\x06 \x01(\x01\x12*\n\x0e\x62\x61\x63kend_health\x18\x07 \x03(\x0b\x32\x12.tsm.BackendHealth\"\x9b\x01\n\rBackendHealth\x12\x12\n\nbackend_id\x18\x01 \x01(\t\x12\x15\n\rcircuit_state\x18\x02 \x01(\t\x12\x12\n\nlatency_ms\x18\x03 \x01(\x01\x12\x12\n\nerror_rate\x18\x04 \x01(\x01\x12\x11\n\tsuccesses\x18\x05 \x01(\x03\x12\x10\n\x08\x66\x61ilures\x18\x06 \x01(\x03\x12\x12\n\nrejections\x18\x07 \x01(\x03\"+\n\x17ZKAuthenticationRequest\x12\x10\n\x08username\x18\x01 \x01(\t\" \n\x13ZKChallengeResponse\x12\t\n\x01H\x18\x01 \x01(\t\"1\n\x0eZKProofRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05proof\x18\x02 \x01(\t\"(\n\x0fZKProofResponse\x12\x15\n\rsession_token\x18\x01 \x01(\t\"\x88\x01\n\rBackendConfig\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x36\n\nparameters\x18\x02 \x03(\x0b\x32\".tsm.BackendConfig.ParametersEntry\x1a\x31\n\x0fParametersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"<\n\x14StorageConfiguration\x12$\n\x08\x62\x61\x63kends\x18\x01 \x03(\x0b\x32\x12.tsm.BackendConfig\"?\n\x18\x41\x64\x64StorageBackendRequest\x12#\n\x07\x62\x61\x63kend\x18\x01 \x01(\x0b\x32\x12.tsm.BackendConfig\"1\n\x1bRemoveStorageBackendRequest\x12\x12\n\nbackend_id\x18\x01 \x01(\t\"<\n\x18StorageOperationResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t*\"\n\x0f\x42ooleanOperator\x12\x07\n\x03\x41ND\x10\x00\x12\x06\n\x02OR\x10\x01\x32\xeb\x08\n\nTSMService\x12,\n\x0cListSessions\x12\n.tsm.Empty\x1a\x10.tsm.SessionList\x12I\n\x0eGetSessionData\x12\x1a.tsm.GetSessionDataRequest\x1a\x1b.tsm.GetSessionDataResponse\x12I\n\x0e\x41nalyzeSession\x12\x1a.tsm.AnalyzeSessionRequest\x1a\x1b.tsm.AnalyzeSessionResponse\x12T\n\x13\x41nalyzeSessionsBulk\x12\x1f.tsm.AnalyzeSessionsBulkRequest\x1a\x1a.tsm.SessionSecurityReport0\x01\x12\x38\n\rSwitchSession\x12\x12.tsm.SwitchRequest\x1a\x13.tsm.SwitchResponse\x12R\n\x11GetSessionDetails\x12\x1d.tsm.GetSessionDetailsRequest\x1a\x1e.tsm.GetSessionDetailsResponse\x12R\n\x16StartSRPAuthentication\x12\x1d.tsm.SRPAuthenticationRequest\x1a\x19.tsm.SRPChallengeResponse\x12:\n\tVerifySRP\x12\x15.tsm.SRPVerifyRequest\x1a\x16.tsm.SRPVerifyResponse\x12\x43\n\x0f\x45ncryptedSearch\x12\x1b.tsm.EncryptedSearchRequest\x1a\x13.tsm.SearchResponse\x12O\n\x15StartZKAuthentication\x12\x1c.tsm.ZKAuthenticationRequest\x1a\x18.tsm.ZKChallengeResponse\x12:\n\rVerifyZKProof\x12\x13.tsm.ZKProofRequest\x1a\x14.tsm.ZKProofResponse\x12\x37\n\rBackupSession\x12\x12.tsm.BackupRequest\x1a\x10.tsm.BackupChunk0\x01\x12,\n\nGetMetrics\x12\n.tsm.Empty\x1a\x12.tsm.SystemMetrics\x12@\n\x17GetStorageConfiguration\x12\n.tsm.Empty\x1a\x19.tsm.StorageConfiguration\x12Q\n\x11\x41\x64\x64StorageBackend\x12\x1d.tsm.AddStorageBackendRequest\x1a\x1d.tsm.StorageOperationResponse\x12W\n\x14RemoveStorageBackend\x12 .tsm.RemoveStorageBackendRequest\x1a\x1d.tsm.StorageOperationResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,8 +33,8 @@ if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_BACKENDCONFIG_PARAMETERSENTRY']._loaded_options = None
   _globals['_BACKENDCONFIG_PARAMETERSENTRY']._serialized_options = b'8\001'
-  _globals['_BOOLEANOPERATOR']._serialized_start=740
-  _globals['_BOOLEANOPERATOR']._serialized_end=774
+  _globals['_BOOLEANOPERATOR']._serialized_start=873
+  _globals['_BOOLEANOPERATOR']._serialized_end=907
   _globals['_EMPTY']._serialized_start=25
   _globals['_EMPTY']._serialized_end=32
   _globals['_GETSESSIONDATAREQUEST']._serialized_start=34
@@ -45,60 +45,66 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_ANALYZESESSIONREQUEST']._serialized_end=183
   _globals['_ANALYZESESSIONRESPONSE']._serialized_start=185
   _globals['_ANALYZESESSIONRESPONSE']._serialized_end=246
-  _globals['_SECURITYREPORT']._serialized_start=248
-  _globals['_SECURITYREPORT']._serialized_end=321
-  _globals['_GETSESSIONDETAILSREQUEST']._serialized_start=323
-  _globals['_GETSESSIONDETAILSREQUEST']._serialized_end=369
-  _globals['_GETSESSIONDETAILSRESPONSE']._serialized_start=371
-  _globals['_GETSESSIONDETAILSRESPONSE']._serialized_end=429
-  _globals['_SRPAUTHENTICATIONREQUEST']._serialized_start=431
-  _globals['_SRPAUTHENTICATIONREQUEST']._serialized_end=475
-  _globals['_SRPCHALLENGERESPONSE']._serialized_start=477
-  _globals['_SRPCHALLENGERESPONSE']._serialized_end=530
-  _globals['_SRPVERIFYREQUEST']._serialized_start=532
-  _globals['_SRPVERIFYREQUEST']._serialized_end=567
-  _globals['_SRPVERIFYRESPONSE']._serialized_start=569
-  _globals['_SRPVERIFYRESPONSE']._serialized_end=600
-  _globals['_ENCRYPTEDSEARCHREQUEST']._serialized_start=603
-  _globals['_ENCRYPTEDSEARCHREQUEST']._serialized_end=774
-  _globals['_ENCRYPTEDSEARCHREQUEST_BOOLEANOPERATOR']._serialized_start=740
-  _globals['_ENCRYPTEDSEARCHREQUEST_BOOLEANOPERATOR']._serialized_end=774
-  _globals['_SEARCHRESPONSE']._serialized_start=776
-  _globals['_SEARCHRESPONSE']._serialized_end=873
-  _globals['_SESSION']._serialized_start=876
-  _globals['_SESSION']._serialized_end=1043
-  _globals['_SESSIONLIST']._serialized_start=1045
-  _globals['_SESSIONLIST']._serialized_end=1090
-  _globals['_SWITCHREQUEST']._serialized_start=1092
-  _globals['_SWITCHREQUEST']._serialized_end=1127
-  _globals['_SWITCHRESPONSE']._serialized_start=1129
-  _globals['_SWITCHRESPONSE']._serialized_end=1179
-  _globals['_BACKUPREQUEST']._serialized_start=1181
-  _globals['_BACKUPREQUEST']._serialized_end=1216
-  _globals['_BACKUPCHUNK']._serialized_start=1218
-  _globals['_BACKUPCHUNK']._serialized_end=1307
-  _globals['_SYSTEMMETRICS']._serialized_start=1310
-  _globals['_SYSTEMMETRICS']._serialized_end=1504
-  _globals['_ZKAUTHENTICATIONREQUEST']._serialized_start=1506
-  _globals['_ZKAUTHENTICATIONREQUEST']._serialized_end=1549
-  _globals['_ZKCHALLENGERESPONSE']._serialized_start=1551
-  _globals['_ZKCHALLENGERESPONSE']._serialized_end=1583
-  _globals['_ZKPROOFREQUEST']._serialized_start=1585
-  _globals['_ZKPROOFREQUEST']._serialized_end=1634
-  _globals['_ZKPROOFRESPONSE']._serialized_start=1636
-  _globals['_ZKPROOFRESPONSE']._serialized_end=1676
-  _globals['_BACKENDCONFIG']._serialized_start=1679
-  _globals['_BACKENDCONFIG']._serialized_end=1815
-  _globals['_BACKENDCONFIG_PARAMETERSENTRY']._serialized_start=1766
-  _globals['_BACKENDCONFIG_PARAMETERSENTRY']._serialized_end=1815
-  _globals['_STORAGECONFIGURATION']._serialized_start=1817
-  _globals['_STORAGECONFIGURATION']._serialized_end=1877
-  _globals['_ADDSTORAGEBACKENDREQUEST']._serialized_start=1879
-  _globals['_ADDSTORAGEBACKENDREQUEST']._serialized_end=1942
-  _globals['_REMOVESTORAGEBACKENDREQUEST']._serialized_start=1944
-  _globals['_REMOVESTORAGEBACKENDREQUEST']._serialized_end=1993
-  _globals['_STORAGEOPERATIONRESPONSE']._serialized_start=1995
-  _globals['_STORAGEOPERATIONRESPONSE']._serialized_end=2055
-  _globals['_TSMSERVICE']._serialized_start=2094
-  _globals['_TSMSERVICE']._serialized_end=3139
+  _globals['_ANALYZESESSIONSBULKREQUEST']._serialized_start=248
+  _globals['_ANALYZESESSIONSBULKREQUEST']._serialized_end=297
+  _globals['_SESSIONSECURITYREPORT']._serialized_start=299
+  _globals['_SESSIONSECURITYREPORT']._serialized_end=379
+  _globals['_SECURITYREPORT']._serialized_start=381
+  _globals['_SECURITYREPORT']._serialized_end=454
+  _globals['_GETSESSIONDETAILSREQUEST']._serialized_start=456
+  _globals['_GETSESSIONDETAILSREQUEST']._serialized_end=502
+  _globals['_GETSESSIONDETAILSRESPONSE']._serialized_start=504
+  _globals['_GETSESSIONDETAILSRESPONSE']._serialized_end=562
+  _globals['_SRPAUTHENTICATIONREQUEST']._serialized_start=564
+  _globals['_SRPAUTHENTICATIONREQUEST']._serialized_end=608
+  _globals['_SRPCHALLENGERESPONSE']._serialized_start=610
+  _globals['_SRPCHALLENGERESPONSE']._serialized_end=663
+  _globals['_SRPVERIFYREQUEST']._serialized_start=665
+  _globals['_SRPVERIFYREQUEST']._serialized_end=700
+  _globals['_SRPVERIFYRESPONSE']._serialized_start=702
+  _globals['_SRPVERIFYRESPONSE']._serialized_end=733
+  _globals['_ENCRYPTEDSEARCHREQUEST']._serialized_start=736
+  _globals['_ENCRYPTEDSEARCHREQUEST']._serialized_end=907
+  _globals['_ENCRYPTEDSEARCHREQUEST_BOOLEANOPERATOR']._serialized_start=873
+  _globals['_ENCRYPTEDSEARCHREQUEST_BOOLEANOPERATOR']._serialized_end=907
+  _globals['_SEARCHRESPONSE']._serialized_start=909
+  _globals['_SEARCHRESPONSE']._serialized_end=1006
+  _globals['_SESSION']._serialized_start=1009
+  _globals['_SESSION']._serialized_end=1176
+  _globals['_SESSIONLIST']._serialized_start=1178
+  _globals['_SESSIONLIST']._serialized_end=1223
+  _globals['_SWITCHREQUEST']._serialized_start=1225
+  _globals['_SWITCHREQUEST']._serialized_end=1260
+  _globals['_SWITCHRESPONSE']._serialized_start=1262
+  _globals['_SWITCHRESPONSE']._serialized_end=1312
+  _globals['_BACKUPREQUEST']._serialized_start=1314
+  _globals['_BACKUPREQUEST']._serialized_end=1349
+  _globals['_BACKUPCHUNK']._serialized_start=1351
+  _globals['_BACKUPCHUNK']._serialized_end=1440
+  _globals['_SYSTEMMETRICS']._serialized_start=1443
+  _globals['_SYSTEMMETRICS']._serialized_end=1681
+  _globals['_BACKENDHEALTH']._serialized_start=1684
+  _globals['_BACKENDHEALTH']._serialized_end=1839
+  _globals['_ZKAUTHENTICATIONREQUEST']._serialized_start=1841
+  _globals['_ZKAUTHENTICATIONREQUEST']._serialized_end=1884
+  _globals['_ZKCHALLENGERESPONSE']._serialized_start=1886
+  _globals['_ZKCHALLENGERESPONSE']._serialized_end=1918
+  _globals['_ZKPROOFREQUEST']._serialized_start=1920
+  _globals['_ZKPROOFREQUEST']._serialized_end=1969
+  _globals['_ZKPROOFRESPONSE']._serialized_start=1971
+  _globals['_ZKPROOFRESPONSE']._serialized_end=2011
+  _globals['_BACKENDCONFIG']._serialized_start=2014
+  _globals['_BACKENDCONFIG']._serialized_end=2150
+  _globals['_BACKENDCONFIG_PARAMETERSENTRY']._serialized_start=2101
+  _globals['_BACKENDCONFIG_PARAMETERSENTRY']._serialized_end=2150
+  _globals['_STORAGECONFIGURATION']._serialized_start=2152
+  _globals['_STORAGECONFIGURATION']._serialized_end=2212
+  _globals['_ADDSTORAGEBACKENDREQUEST']._serialized_start=2214
+  _globals['_ADDSTORAGEBACKENDREQUEST']._serialized_end=2277
+  _globals['_REMOVESTORAGEBACKENDREQUEST']._serialized_start=2279
+  _globals['_REMOVESTORAGEBACKENDREQUEST']._serialized_end=2328
+  _globals['_STORAGEOPERATIONRESPONSE']._serialized_start=2330
+  _globals['_STORAGEOPERATIONRESPONSE']._serialized_end=2390
+  _globals['_TSMSERVICE']._serialized_start=2429
+  _globals['_TSMSERVICE']._serialized_end=3560
 # @@protoc_insertion_point(module_scope)
@@ -50,6 +50,11 @@ class TSMServiceStub(object):
                 request_serializer=TSMService__pb2.AnalyzeSessionRequest.SerializeToString,
                 response_deserializer=TSMService__pb2.AnalyzeSessionResponse.FromString,
                 _registered_method=True)
+        self.AnalyzeSessionsBulk = channel.unary_stream(
+                '/tsm.TSMService/AnalyzeSessionsBulk',
+                request_serializer=TSMService__pb2.AnalyzeSessionsBulkRequest.SerializeToString,
+                response_deserializer=TSMService__pb2.SessionSecurityReport.FromString,
+                _registered_method=True)
         self.SwitchSession = channel.unary_unary(
                 '/tsm.TSMService/SwitchSession',
                 request_serializer=TSMService__pb2.SwitchRequest.SerializeToString,
@@ -137,6 +142,13 @@ class TSMServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AnalyzeSessionsBulk(self, request, context):
+        """Streams security reports for many sessions (all sessions if none are given)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SwitchSession(self, request, context):
         """Activates a specific session
         """
@@ -237,6 +249,11 @@ def add_TSMServiceServicer_to_server(servicer, server):
                     request_deserializer=TSMService__pb2.AnalyzeSessionRequest.FromString,
                     response_serializer=TSMService__pb2.AnalyzeSessionResponse.SerializeToString,
             ),
+            'AnalyzeSessionsBulk': grpc.unary_stream_rpc_method_handler(
+                    servicer.AnalyzeSessionsBulk,
+                    request_deserializer=TSMService__pb2.AnalyzeSessionsBulkRequest.FromString,
+                    response_serializer=TSMService__pb2.SessionSecurityReport.SerializeToString,
+            ),
             'SwitchSession': grpc.unary_unary_rpc_method_handler(
                     servicer.SwitchSession,
                     request_deserializer=TSMService__pb2.SwitchRequest.FromString,
@@ -390,6 +407,33 @@ class TSMService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def AnalyzeSessionsBulk(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/tsm.TSMService/AnalyzeSessionsBulk',
+            TSMService__pb2.AnalyzeSessionsBulkRequest.SerializeToString,
+            TSMService__pb2.SessionSecurityReport.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def SwitchSession(request,
             target,
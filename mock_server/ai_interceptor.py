@@ -1,10 +1,8 @@
 import grpc
 from tsm_ai_security import SessionSecurityAI
 
-class AISecurityInterceptor(grpc.ServerInterceptor):
-    def __init__(self, security_ai: SessionSecurityAI, threshold: float = 0.9):
-        self.security_ai = security_ai
-        self.threshold = threshold
+def _deny(request, context):
+    context.abort(grpc.StatusCode.PERMISSION_DENIED, "High risk")
 
 class AISecurityInterceptor(grpc.ServerInterceptor):
     def __init__(self, security_ai: SessionSecurityAI, threshold: float = 0.9):
@@ -19,7 +17,8 @@ class AISecurityInterceptor(grpc.ServerInterceptor):
             return continuation(handler_call_details)
 
         # In a real implementation, we would extract meaningful data from the request.
-        # For now, we'll use dummy data.
+        # For now, we'll use dummy data, which is analyzed but not observed
+        # for retraining.
         session_data = {
             "last_login_time": "23:50",
             "message_frequency_per_hour": 150,
@@ -30,6 +29,8 @@ class AISecurityInterceptor(grpc.ServerInterceptor):
         print(f"AI Security Analysis for {method_name}: Risk Score = {report.risk_score:.2f}")
 
         if report.risk_score > self.threshold:
-            raise grpc.RpcError(grpc.StatusCode.PERMISSION_DENIED, "High risk")
+            # Raising here would surface as UNKNOWN; answer with a handler
+            # that rejects the call instead
+            return grpc.unary_unary_rpc_method_handler(_deny)
         else:
             return continuation(handler_call_details)
@@ -20,6 +20,15 @@ class Database:
                 tags TEXT
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS session_locators (
+                session_id TEXT NOT NULL,
+                backend_id TEXT NOT NULL,
+                locator TEXT NOT NULL,
+                PRIMARY KEY (session_id, backend_id, locator)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS session_locators_locator ON session_locators (locator)")
         self.conn.commit()
 
     def upsert_session(self, session, encrypted_data=None):
@@ -43,6 +52,58 @@ class Database:
         cursor.execute("SELECT * FROM sessions WHERE id=?", (session_id,))
         return cursor.fetchone()
 
+    def add_locators(self, session_id, locators):
+        """
+        Records where a session's objects are stored.
+
+        Args:
+            session_id: The session ID.
+            locators: (backend_id, locator) pairs.
+        """
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO session_locators (session_id, backend_id, locator) VALUES (?, ?, ?)",
+            [(session_id, backend_id, locator) for backend_id, locator in locators],
+        )
+        self.conn.commit()
+
+    def remove_locators(self, session_id, locators):
+        """
+        Drops locator references of a session, e.g. those of an object that
+        was replaced. The stored objects are reclaimed by storage garbage
+        collection.
+        """
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "DELETE FROM session_locators WHERE session_id=? AND backend_id=? AND locator=?",
+            [(session_id, backend_id, locator) for backend_id, locator in locators],
+        )
+        self.conn.commit()
+
+    def get_locators(self, session_id):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT backend_id, locator FROM session_locators WHERE session_id=?", (session_id,))
+        return [(row['backend_id'], row['locator']) for row in cursor.fetchall()]
+
+    def referenced_locators(self):
+        """
+        Returns every locator referenced by a session.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT DISTINCT locator FROM session_locators")
+        return {row['locator'] for row in cursor.fetchall()}
+
+    def delete_session(self, session_id):
+        """
+        Deletes a session and its locator references. The stored objects are
+        reclaimed by storage garbage collection.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM session_locators WHERE session_id=?", (session_id,))
+        cursor.execute("DELETE FROM sessions WHERE id=?", (session_id,))
+        self.conn.commit()
+        return cursor.rowcount > 0
+
     def get_all_sessions(self):
         cursor = self.conn.cursor()
         cursor.execute("SELECT * FROM sessions")
@@ -1,7 +1,12 @@
 import grpc
 from concurrent import futures
+import hashlib
+import os
 import time
 import pickle
+import threading
+
+import numpy as np
 
 import TSMService_pb2
 import TSMService_pb2_grpc
@@ -15,9 +20,42 @@ from identity.hardware_rooted_srp import HardwareRootedSRP
 from zk_session_proof import ZKSessionProof
 from zkp_utils import serialize_point, deserialize_point
 import json
-from storage.factory import StorageFactory
+import logging
+from storage.local import LocalNetworkStorage
+from storage.gc import GarbageCollector
+from storage.health import HealthTracker, backend_name
+from storage.inventory import IndexedStorage, InventoryIndex
+from storage.topology import StorageTopology
 from replication import ReplicationManager
 
+BACKUP_CHUNK_SIZE = 1024 * 1024
+# Replaced replication managers are closed after this many seconds, so
+# requests still using the previous topology can finish.
+REPLICATION_RETIRE_DELAY = 60.0
+# Backend options that always hold strings, even when they look like numbers
+STRING_BACKEND_OPTIONS = {"id", "type", "bucket", "endpoint", "base_path", "path", "region"}
+
+def parse_backend_parameters(parameters):
+    """
+    Turns BackendConfig parameters back into typed options.
+
+    Proto map values are strings, and GetStorageConfiguration sends every
+    other value JSON-encoded, so values that decode to a boolean, number,
+    object or array are decoded, and booleans in any case; "false" must
+    not reach the topology as a truthy string.
+    """
+    config = {}
+    for key, value in parameters.items():
+        if key not in STRING_BACKEND_OPTIONS:
+            try:
+                decoded = json.loads(value.lower() if value.lower() in ("true", "false") else value)
+            except ValueError:
+                decoded = value
+            if isinstance(decoded, (bool, int, float, dict, list)):
+                value = decoded
+        config[key] = value
+    return config
+
 class TSMService(TSMService_pb2_grpc.TSMServiceServicer):
     """
     TSM gRPC Service Implementation
@@ -28,7 +66,7 @@ class TSMService(TSMService_pb2_grpc.TSMServiceServicer):
     providing functionality.
     """
     
-    def __init__(self, search_prototype=None):
+    def __init__(self, search_prototype=None, security_ai=None):
         # Initialize the database
         self.db = Database()
 
@@ -41,18 +79,23 @@ class TSMService(TSMService_pb2_grpc.TSMServiceServicer):
         self.qrc = QuantumResistantCrypto()
         self.qrc_public_key, self.qrc_private_key = self.qrc.generate_kyber_keys()
 
-        # Initialize the session security AI
-        self.security_ai = SessionSecurityAI()
+        # Initialize the session security AI, reusing the interceptor's
+        # instance when one is provided so the model is only loaded once
+        self.security_ai = security_ai or SessionSecurityAI()
 
         # In-memory store for SRP sessions
         self.srp_sessions = {}
         # In-memory store for ZK sessions
         self.zk_sessions = {}
 
-        # Initialize storage backends
-        self.storage_factory = StorageFactory()
-        self.storage_backends = self.storage_factory.load_from_config('storage_config.json')
-        self.replication_manager = ReplicationManager(self.storage_backends)
+        # Initialize storage backends from a live, reloadable topology
+        self.storage_inventory = InventoryIndex(os.environ.get("TSM_STORAGE_INVENTORY", 'storage_inventory.db'))
+        self.storage_topology = StorageTopology(
+            os.environ.get("TSM_STORAGE_CONFIG", 'storage_config.json'), inventory=self.storage_inventory
+        )
+        self.replication_manager = ReplicationManager(list(self.storage_topology.current.backends))
+        self.storage_topology.add_listener(self._on_topology_change)
+        self._storage_config_response = None
 
         # Generate some sample sessions and store them in the database
         session_names = ["Alpha", "Bravo", "Charlie", "Delta", "Echo"]
@@ -76,7 +119,7 @@ class TSMService(TSMService_pb2_grpc.TSMServiceServicer):
                 is_encrypted=True,
                 tags=["test", f"tag_{i}"]
             )
-            self.db.upsert_session(session, pickle.dumps(encrypted_data))
+            self.save_session(session, pickle.dumps(encrypted_data))
             
             # Update both numeric index and keyword index
             self.index_manager.update_index(session_id, i)
@@ -85,6 +128,108 @@ class TSMService(TSMService_pb2_grpc.TSMServiceServicer):
         
         print(f"TSM Service initialized with {len(session_names)} encrypted sessions in the database")
 
+    @property
+    def storage_backends(self):
+        return list(self.storage_topology.current.backends)
+
+    def _on_topology_change(self, old, new):
+        """
+        Points replication at the new backends and retires the old manager
+        once in-flight requests have had time to finish.
+        """
+        retired = self.replication_manager
+        health = HealthTracker([backend_name(b) for b in new.backends], previous=retired.health)
+        self.replication_manager = ReplicationManager(list(new.backends), health=health)
+        timer = threading.Timer(REPLICATION_RETIRE_DELAY, retired.close)
+        timer.daemon = True
+        timer.start()
+
+    def _backend_ids(self, backends):
+        """
+        Returns the topology ID of each backend, in order.
+        """
+        snapshot = self.storage_topology.current
+        ids = {id(backend): config["id"] for config, backend in zip(snapshot.configs, snapshot.backends)}
+        # A backend removed since the manager was built keeps its own name
+        return [ids.get(id(backend)) or backend_name(backend) for backend in backends]
+
+    def store_session_object(self, session_id, encrypted_data, mode="replicate", **options):
+        """
+        Uploads a session object to the storage backends and records where
+        it was stored, so that storage garbage collection keeps it. Uploads
+        acknowledged after the quorum are recorded as they complete.
+
+        Args:
+            session_id: The session ID.
+            encrypted_data: The encrypted session object.
+            mode: "replicate", "shard" or "erasure".
+            options: Passed on to the upload, e.g. `threshold` for "shard"
+                     or `data_shards` for "erasure".
+
+        Returns:
+            The locators in backend order, as returned by the upload.
+        """
+        manager = self.replication_manager
+        uploads = {
+            "replicate": manager.replicate_upload,
+            "shard": manager.shard_upload,
+            "erasure": manager.erasure_upload,
+        }
+        if mode not in uploads:
+            raise ValueError(f"Unknown upload mode: {mode}")
+        backend_ids = self._backend_ids(manager.backends)
+
+        def record_late(index, locator):
+            self.db.add_locators(session_id, [(backend_ids[index], locator)])
+
+        locators = uploads[mode](session_id, encrypted_data, on_late_ack=record_late, **options)
+        self.db.add_locators(
+            session_id, [(backend_ids[i], locator) for i, locator in enumerate(locators) if locator is not None]
+        )
+        return locators
+
+    def save_session(self, session, encrypted_data):
+        """
+        Saves a session to the database and its encrypted object to the
+        storage backends. The locators of the object it replaces are dropped
+        once the new one is stored, so garbage collection reclaims it.
+
+        A failed upload is logged and the session stays readable from the
+        database, keeping its previous stored object if it had one.
+        """
+        self.db.upsert_session(session, encrypted_data)
+        previous = self.db.get_locators(session.id)
+        try:
+            self.store_session_object(session.id, encrypted_data)
+        except Exception as e:
+            logging.error(f"Could not store session {session.id} in the storage backends: {e}")
+            return
+        self.db.remove_locators(session.id, previous)
+
+    def collect_storage_garbage(self, dry_run=True, grace_period=None):
+        """
+        Deletes stored objects that no session references any more.
+
+        The inventory index of each backend is reconciled with the backend
+        first, so objects written or removed behind the index's back are
+        seen. A backend that cannot be rescanned is collected from its
+        existing index rows.
+
+        Returns:
+            The garbage collection report.
+        """
+        snapshot = self.storage_topology.current
+        backends = {config["id"]: backend for config, backend in zip(snapshot.configs, snapshot.backends)}
+        for backend_id, backend in backends.items():
+            if isinstance(backend, IndexedStorage):
+                try:
+                    backend.reconcile()
+                except Exception as e:
+                    logging.warning(f"Could not reconcile the inventory of {backend_id}: {e}")
+        options = {} if grace_period is None else {"grace_period": grace_period}
+        collector = GarbageCollector(backends, inventory=self.storage_inventory, **options)
+        return collector.collect(self.db.referenced_locators, dry_run=dry_run)
+
     def ListSessions(self, request, context):
         """
         Lists all available sessions for a user.
@@ -123,6 +268,51 @@ class TSMService(TSMService_pb2_grpc.TSMServiceServicer):
             context.set_details(f"Session {request.session_id} not found")
             return TSMService_pb2.GetSessionDataResponse()
 
+    def BackupSession(self, request, context):
+        """
+        Streams a stored session object as checksummed chunks.
+
+        The session's stored locators are read from the database, never
+        taken from the request. A copy on a local storage backend is
+        streamed straight from a memory mapping, so the only copy made is
+        the one into each BackupChunk message. Sessions held only in the
+        database are streamed from their blob.
+        """
+        snapshot = self.storage_topology.current
+        for backend_id, locator in self.db.get_locators(request.session_id):
+            backend = snapshot.find(backend_id)
+            if isinstance(backend, IndexedStorage):
+                backend = backend.backend
+            if isinstance(backend, LocalNetworkStorage) and backend.exists(locator):
+                with backend.open_mapped(locator) as view:
+                    yield from self._backup_chunks(view)
+                return
+
+        session_row = self.db.get_session(request.session_id)
+        if not session_row or not session_row['encrypted_data']:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(f"Session {request.session_id} not found")
+            return
+        yield from self._backup_chunks(memoryview(session_row['encrypted_data']))
+
+    @staticmethod
+    def _backup_chunks(view):
+        """
+        Splits a buffer into BackupChunk messages without intermediate copies.
+        """
+        total_chunks = max(1, -(-len(view) // BACKUP_CHUNK_SIZE))
+        for number in range(total_chunks):
+            chunk = view[number * BACKUP_CHUNK_SIZE:(number + 1) * BACKUP_CHUNK_SIZE]
+            try:
+                yield TSMService_pb2.BackupChunk(
+                    data=bytes(chunk),  # protobuf bytes fields only accept bytes
+                    chunk_number=number,
+                    total_chunks=total_chunks,
+                    checksum=hashlib.sha256(chunk).hexdigest()
+                )
+            finally:
+                chunk.release()
+
     def AnalyzeSession(self, request, context):
         """
         Analyzes a session for security risks.
@@ -143,6 +333,36 @@ class TSMService(TSMService_pb2_grpc.TSMServiceServicer):
             )
         )
 
+    def AnalyzeSessionsBulk(self, request, context):
+        """
+        Streams security reports for a set of sessions.
+
+        The selected sessions are turned into columns and scored in one
+        vectorized pass, which makes fleet-wide audits practical.
+        """
+        rows = self.db.get_all_sessions()
+        if request.session_ids:
+            wanted = set(request.session_ids)
+            rows = [row for row in rows if row['id'] in wanted]
+
+        last_used = np.array([row['last_used_date'] for row in rows], dtype=np.int64)
+        batch = {
+            "last_login_time": (last_used % 86400) // 3600,  # UTC hour of last use
+            "message_frequency_per_hour": np.full(len(rows), 100), # dummy data
+            "api_calls_last_24h": np.full(len(rows), 20) # dummy data
+        }
+
+        reports = self.security_ai.analyze_sessions_bulk(batch)
+        for row, report in zip(rows, reports):
+            yield TSMService_pb2.SessionSecurityReport(
+                session_id=row['id'],
+                report=TSMService_pb2.SecurityReport(
+                    risk_score=report.risk_score,
+                    threats=report.threats,
+                    recommends=report.recommendations
+                )
+            )
+
     def SwitchSession(self, request, context):
         """
         Switches the active session to the requested one.
@@ -294,45 +514,67 @@ class TSMService(TSMService_pb2_grpc.TSMServiceServicer):
             context.set_details("Search operation failed")
             return TSMService_pb2.SearchResponse()
 
+    def GetMetrics(self, request, context):
+        """
+        Returns system metrics, including the health of each storage backend.
+        """
+        backend_health = [
+            TSMService_pb2.BackendHealth(
+                backend_id=entry["name"],
+                circuit_state=entry["state"],
+                latency_ms=entry["latency_ms"],
+                error_rate=entry["error_rate"],
+                successes=entry["successes"],
+                failures=entry["failures"],
+                rejections=entry["rejections"],
+            )
+            for entry in self.replication_manager.health.snapshot()
+        ]
+        return TSMService_pb2.SystemMetrics(backend_health=backend_health)
+
     def GetStorageConfiguration(self, request, context):
-        with open('storage_config.json', 'r') as f:
-            config_data = json.load(f)
+        """
+        Returns the live storage configuration, built once per topology version.
+        """
+        snapshot = self.storage_topology.current
+        cached = self._storage_config_response
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
 
         backends = []
-        for backend_config in config_data:
+        for backend_config in snapshot.configs:
             backends.append(TSMService_pb2.BackendConfig(
                 type=backend_config['type'],
-                parameters=backend_config
+                parameters={k: v if isinstance(v, str) else json.dumps(v) for k, v in backend_config.items()}
             ))
-        return TSMService_pb2.StorageConfiguration(backends=backends)
+        response = TSMService_pb2.StorageConfiguration(backends=backends)
+        self._storage_config_response = (snapshot.version, response)
+        return response
 
     def AddStorageBackend(self, request, context):
         try:
-            with open('storage_config.json', 'r+') as f:
-                config_data = json.load(f)
-                config_data.append(request.backend)
-                f.seek(0)
-                json.dump(config_data, f, indent=2)
-            return TSMService_pb2.StorageOperationResponse(success=True, message="Backend added successfully.")
+            config = parse_backend_parameters(request.backend.parameters)
+            config['type'] = request.backend.type
+            snapshot = self.storage_topology.add_backend(config)
+            return TSMService_pb2.StorageOperationResponse(
+                success=True, message=f"Backend added successfully (version {snapshot.version}).")
         except Exception as e:
             return TSMService_pb2.StorageOperationResponse(success=False, message=str(e))
 
     def RemoveStorageBackend(self, request, context):
         try:
-            with open('storage_config.json', 'r+') as f:
-                config_data = json.load(f)
-                config_data = [b for b in config_data if b['type'] != request.backend_id]
-                f.seek(0)
-                f.truncate()
-                json.dump(config_data, f, indent=2)
-            return TSMService_pb2.StorageOperationResponse(success=True, message="Backend removed successfully.")
+            snapshot = self.storage_topology.remove_backend(request.backend_id)
+            return TSMService_pb2.StorageOperationResponse(
+                success=True, message=f"Backend removed successfully (version {snapshot.version}).")
+        except KeyError:
+            return TSMService_pb2.StorageOperationResponse(
+                success=False, message=f"No storage backend matches '{request.backend_id}'.")
         except Exception as e:
             return TSMService_pb2.StorageOperationResponse(success=False, message=str(e))
 
 
 from ai_interceptor import AISecurityInterceptor
 
-import logging
 logging.basicConfig(level=logging.INFO)
 
 def serve():
@@ -340,8 +582,14 @@ def serve():
     Starts the gRPC server and handles incoming requests.
     """
     logging.info("Initializing TSM service...")
-    # Initialize the AI security module and the interceptor
-    security_ai = SessionSecurityAI()
+    # Initialize the AI security module and the interceptor. The model is
+    # loaded from TSM_AI_MODEL_PATH when set (and trained/saved there on
+    # first start), and the same instance is shared with the service.
+    security_ai = SessionSecurityAI(model_path=os.environ.get("TSM_AI_MODEL_PATH"))
+    # Periodically refit the model on observed sessions; training runs off
+    # the request path. The interceptor and AnalyzeSession fill in
+    # placeholder features, so they do not observe what they analyze.
+    security_ai.start_retraining(interval=float(os.environ.get("TSM_AI_RETRAIN_INTERVAL", 3600)))
     ai_interceptor = AISecurityInterceptor(security_ai)
 
     # Configure the thread pool for handling concurrent requests
@@ -358,7 +606,9 @@ def serve():
     
     # Register our service implementation
     logging.info("Creating TSM service instance...")
-    service = TSMService()
+    service = TSMService(security_ai=security_ai)
+    # Pick up edits to the storage configuration file without a restart
+    service.storage_topology.start_watching(interval=float(os.environ.get("TSM_STORAGE_WATCH_INTERVAL", 2)))
     logging.info("TSM service instance created.")
     TSMService_pb2_grpc.add_TSMServiceServicer_to_server(service, server)
     
@@ -380,6 +630,8 @@ def serve():
     except KeyboardInterrupt:
         logging.info("\nShutting down TSM server...")
         server.stop(grace_period=5)  # Give 5 seconds for cleanup
+        security_ai.stop_retraining()
+        service.storage_topology.stop_watching()
         logging.info("Server stopped")
 
 if __name__ == '__main__':
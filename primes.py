@@ -27,13 +27,29 @@ def get_large_enough_prime(batch):
             return prime
     return None
 
+mersenne_prime_exponents = [
+    2, 3, 5, 7, 13, 17, 19, 31, 61, 89, 107, 127, 521
+]
+
+def mersenne_exponent(prime):
+    """ Return the exponent e of a supported Mersenne prime 2^e - 1.
+    """
+    exponent = prime.bit_length()
+    if exponent not in mersenne_prime_exponents or prime != (1 << exponent) - 1:
+        raise ValueError("%d is not a supported Mersenne prime." % prime)
+    return exponent
+
+def mersenne_prime(exponent):
+    """ Return the Mersenne prime 2^e - 1 for a supported exponent.
+    """
+    if exponent not in mersenne_prime_exponents:
+        raise ValueError("2^%d - 1 is not a supported Mersenne prime." % exponent)
+    return (1 << exponent) - 1
+
 def calculate_mersenne_primes():
     """
     Returns a list of Mersenne primes that are smaller than 2^521 + 1
     """
-    mersenne_prime_exponents = [
-        2, 3, 5, 7, 13, 17, 19, 31, 61, 89, 107, 127, 521
-    ]
     primes = []
     for exp in mersenne_prime_exponents:
         prime = int(1)
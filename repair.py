@@ -0,0 +1,284 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import erasure
+import gf256
+from storage.base import StorageBackend
+
+log = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    A thread-safe token bucket.
+
+    `acquire(amount)` blocks until `amount` tokens are available. The bucket
+    refills at `rate` tokens per second and holds at most `burst` tokens.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("Rate must be a positive number.")
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> None:
+        """
+        Takes `amount` tokens, sleeping until enough have accumulated.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                # Requests larger than the bucket are let through once it is full
+                if self._tokens >= min(amount, self.burst):
+                    self._tokens -= amount
+                    return
+                wait_time = (min(amount, self.burst) - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+@dataclass
+class RepairReport:
+    """The outcome of a repair pass."""
+    sessions_checked: int = 0
+    sessions_degraded: int = 0
+    shards_rebuilt: int = 0
+    bytes_uploaded: int = 0
+    unrecoverable: list[str] = field(default_factory=list)
+    unlistable_backends: list[int] = field(default_factory=list)
+    shard_map: dict[str, list[Optional[str]]] = field(default_factory=dict)
+
+class ShardRepairer:
+    """
+    Restores redundancy of sharded sessions after backend loss.
+
+    Missing shards are found by diffing a scan of each backend's objects
+    against the known shard locators, and only those shards are regenerated from a
+    threshold subset of the surviving ones and uploaded, so the work done
+    is proportional to what was lost rather than to the number of sessions.
+    """
+
+    def __init__(
+        self,
+        backends: list[StorageBackend],
+        mode: str = "shamir",
+        max_workers: int = 4,
+        max_shards_per_second: Optional[float] = None,
+        max_bytes_per_second: Optional[float] = None,
+    ):
+        """
+        Args:
+            backends: The backends in shard order, as used for the upload.
+                      A lost backend may be replaced by a fresh one at the
+                      same position.
+            mode: "shamir" for `shard_upload` sets or "erasure" for
+                  `erasure_upload` sets.
+            max_workers: Number of sessions repaired concurrently.
+            max_shards_per_second: Optional cap on shard uploads per second.
+            max_bytes_per_second: Optional cap on uploaded bytes per second.
+        """
+        if mode not in ("shamir", "erasure"):
+            raise ValueError(f"Unknown shard mode: {mode}")
+        self.backends = backends
+        self.mode = mode
+        self.max_workers = max_workers
+        self._shard_limiter = RateLimiter(max_shards_per_second) if max_shards_per_second else None
+        self._byte_limiter = RateLimiter(max_bytes_per_second) if max_bytes_per_second else None
+
+    def _inventory(self, index: int) -> Optional[set]:
+        """
+        Lists one backend, returning None if it cannot be listed.
+
+        The objects are scanned with `scan_inventory` rather than taken
+        from `list_all()`, which an `IndexedStorage` answers from its index:
+        a shard lost on the store itself is still listed there.
+        """
+        backend = self.backends[index]
+        try:
+            return {
+                entry.locator
+                for partition in backend.inventory_partitions()
+                for entry in backend.scan_inventory(partition)
+            }
+        except Exception as e:
+            log.warning(f"Could not list backend {index}: {e}")
+            return None
+
+    def find_degraded(
+        self,
+        shard_map: dict[str, list[Optional[str]]],
+        report: Optional[RepairReport] = None,
+    ) -> dict[str, list[int]]:
+        """
+        Finds sessions with missing shards.
+
+        A backend that cannot be listed is skipped rather than treated as
+        empty, so a transient listing error does not trigger a rebuild of
+        every shard it holds. Its index is added to the report's
+        `unlistable_backends`.
+
+        Args:
+            shard_map: Session ID to shard locators in backend order.
+            report: Receives the indices of unlistable backends.
+
+        Returns:
+            Session ID to the backend indices whose shard is missing, for
+            degraded sessions only.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, len(self.backends))) as executor:
+            inventories = list(executor.map(self._inventory, range(len(self.backends))))
+        if report is not None:
+            report.unlistable_backends = [i for i, inventory in enumerate(inventories) if inventory is None]
+
+        degraded = {}
+        for session_id, locators in shard_map.items():
+            missing = [
+                index for index, locator in enumerate(locators)
+                if inventories[index] is not None and (locator is None or locator not in inventories[index])
+            ]
+            if missing:
+                degraded[session_id] = missing
+        return degraded
+
+    def _rebuild_shards(self, shards: list[bytes], missing: list[int]) -> Optional[dict[int, bytes]]:
+        """
+        Regenerates the shards for the missing backend indices.
+
+        Returns None if the surviving shards are not enough.
+        """
+        if self.mode == "shamir":
+            if len(shards) < 2:
+                return None
+            # Shamir shares for backend i sit at x = i + 1; evaluating the
+            # interpolated polynomials there recreates the lost share exactly.
+            return {
+                index: bytes([index + 1]) + gf256.interpolate_at(shards, index + 1).tobytes()
+                for index in missing
+            }
+
+        valid = [shard for shard in shards if erasure.verify_shard(shard)]
+        if not valid:
+            return None
+        header = erasure.parse_header(valid[0])
+        try:
+            data = erasure.decode(valid)
+        except ValueError:
+            return None
+        encoded = erasure.encode(data, header.data_shards, header.total_shards)
+        return {index: encoded[index] for index in missing}
+
+    def _collect_shards(self, locators: list[Optional[str]], missing: list[int], needed: Optional[int]) -> list[bytes]:
+        """
+        Downloads surviving shards until `needed` have been read.
+        """
+        shards = []
+        for index, locator in enumerate(locators):
+            if index in missing:
+                continue
+            if needed is not None and len(shards) >= needed:
+                break
+            try:
+                shard = self.backends[index].download(locator)
+            except Exception as e:
+                log.warning(f"Could not read shard {index}: {e}")
+                continue
+            if self.mode == "erasure" and not erasure.verify_shard(shard):
+                continue
+            shards.append(shard)
+            if needed is None and self.mode == "erasure":
+                needed = erasure.parse_header(shard).data_shards
+        return shards
+
+    def _repair_session(
+        self,
+        session_id: str,
+        locators: list[Optional[str]],
+        missing: list[int],
+        threshold: Optional[int],
+    ) -> tuple[Optional[list[Optional[str]]], int, int]:
+        """
+        Rebuilds and uploads the missing shards of one session.
+
+        Returns:
+            The updated locators (None if unrecoverable), the number of
+            shards uploaded and the number of bytes uploaded.
+        """
+        shards = self._collect_shards(locators, missing, threshold)
+        if threshold is not None and len(shards) < threshold:
+            return None, 0, 0
+        rebuilt = self._rebuild_shards(shards, missing)
+        if rebuilt is None:
+            return None, 0, 0
+
+        updated = list(locators)
+        uploaded_bytes = 0
+        for index, shard in rebuilt.items():
+            if self._shard_limiter:
+                self._shard_limiter.acquire()
+            if self._byte_limiter:
+                self._byte_limiter.acquire(len(shard))
+            updated[index] = self.backends[index].upload(session_id, shard)
+            uploaded_bytes += len(shard)
+        return updated, len(rebuilt), uploaded_bytes
+
+    def repair(
+        self,
+        shard_map: dict[str, list[Optional[str]]],
+        threshold: Optional[int] = None,
+        dry_run: bool = False,
+    ) -> RepairReport:
+        """
+        Finds degraded sessions and restores their missing shards.
+
+        Args:
+            shard_map: Session ID to shard locators in backend order.
+            threshold: Number of shards needed to rebuild (the Shamir
+                       threshold). Required for "shamir" mode; erasure
+                       shards record it in their headers.
+            dry_run: Only report which sessions are degraded.
+
+        Returns:
+            A RepairReport whose `shard_map` holds the updated locators of
+            every repaired session.
+        """
+        if self.mode == "shamir" and threshold is None:
+            raise ValueError("A threshold is required to repair Shamir shards.")
+
+        report = RepairReport(sessions_checked=len(shard_map))
+        degraded = self.find_degraded(shard_map, report)
+        if report.unlistable_backends:
+            log.warning(f"Skipped unlistable backends {report.unlistable_backends}; their shards were not checked")
+        report.sessions_degraded = len(degraded)
+        if dry_run or not degraded:
+            return report
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._repair_session, session_id, shard_map[session_id], missing, threshold): session_id
+                for session_id, missing in degraded.items()
+            }
+            for future, session_id in futures.items():
+                try:
+                    updated, shard_count, byte_count = future.result()
+                except Exception as e:
+                    log.error(f"Repair of session {session_id} failed: {e}")
+                    updated, shard_count, byte_count = None, 0, 0
+                if updated is None:
+                    report.unrecoverable.append(session_id)
+                    continue
+                report.shard_map[session_id] = updated
+                report.shards_rebuilt += shard_count
+                report.bytes_uploaded += byte_count
+
+        log.info(
+            f"Repaired {len(report.shard_map)} of {report.sessions_degraded} degraded sessions "
+            f"({report.shards_rebuilt} shards, {report.bytes_uploaded} bytes)"
+        )
+        return report
@@ -1,50 +1,548 @@
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+import erasure
 from storage.base import StorageBackend
-from sharding import create_shards
+from storage.health import CircuitOpenError, HealthTracker, RecordOnce, backend_name
+from sharding import create_binary_shards
+
+class QuorumNotReachedError(Exception):
+    """
+    Raised when fewer backends than the write quorum acknowledge an upload.
+    """
+
+    def __init__(self, message: str, locators: list, errors: dict):
+        super().__init__(message)
+        self.locators = locators
+        self.errors = errors
+
+class ReplicaReadError(Exception):
+    """
+    Raised when no replica returns valid data for a download.
+    """
+
+    def __init__(self, message: str, errors: dict):
+        super().__init__(message)
+        self.errors = errors
+
+class LatencyTracker:
+    """
+    Tracks read latency for one backend.
+
+    Keeps an exponentially weighted moving average, used to choose the
+    primary replica, and a window of recent samples for the p95 estimate
+    that decides when a read is hedged to another replica.
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 128, default_p95: float = 0.05):
+        self.alpha = alpha
+        self.default_p95 = default_p95
+        self.ewma = None
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """
+        Adds a latency sample in seconds.
+        """
+        with self._lock:
+            self._samples.append(seconds)
+            if self.ewma is None:
+                self.ewma = seconds
+            else:
+                self.ewma = self.alpha * seconds + (1 - self.alpha) * self.ewma
+
+    def p95(self) -> float:
+        """
+        Returns the 95th percentile of recent samples, or the default when
+        there are too few samples to estimate it.
+        """
+        with self._lock:
+            if len(self._samples) < 5:
+                return self.default_p95
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
 
 class ReplicationManager:
     """
     Manages the replication of data across multiple storage backends.
+
+    Uploads fan out to all backends concurrently, so the latency of a
+    replicated write is set by the quorum-th fastest backend rather than by
+    the sum of every backend's latency. Downloads go to the replica with the
+    lowest observed latency and are hedged to the next one when the primary
+    is slower than usual.
+
+    Every call goes through a per-backend circuit breaker (see
+    `storage.health`). Backends whose circuit is open are skipped without
+    being called: they count as failed acknowledgements for uploads and are
+    left out of read candidates, so a dead backend costs nothing instead of
+    a timeout per request.
+
+    Three placement modes are offered: full copies (`replicate_upload`),
+    Shamir shards for threshold secrecy (`shard_upload`) and Reed-Solomon
+    erasure coding (`erasure_upload`), which stores n/k times the data while
+    tolerating n - k backend failures.
     """
 
-    def __init__(self, backends: list[StorageBackend]):
+    # Added to the latency sample of a failed read so that failing
+    # backends sort behind healthy ones.
+    READ_FAILURE_PENALTY = 1.0
+
+    def __init__(
+        self,
+        backends: list[StorageBackend],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        health: Optional[HealthTracker] = None,
+    ):
+        """
+        Args:
+            backends: The storage backends to replicate across.
+            max_workers: Size of the thread pool shared by uploads and
+                         downloads. Defaults to enough threads for two
+                         concurrent fan-outs.
+            timeout: Default per-backend timeout in seconds. A backend that
+                     has not acknowledged in time does not count towards
+                     the quorum and is charged a failure. None waits
+                     indefinitely.
+            health: Circuit breakers and health scores, one per backend.
+                    Defaults to a fresh tracker.
+        """
         self.backends = backends
+        self.timeout = timeout
+        self.health = health or HealthTracker([backend_name(backend) for backend in backends])
+        if len(self.health) != len(backends):
+            raise ValueError("The health tracker must have one entry per backend.")
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(4, 2 * len(backends)),
+            thread_name_prefix="replication",
+        )
+        self.read_latency = [LatencyTracker() for _ in backends]
+        self._background = set()
+        self._background_lock = threading.Lock()
+
+    @staticmethod
+    def checksum(data: bytes) -> str:
+        """
+        Returns the checksum used to verify downloaded replicas.
+        """
+        return hashlib.sha256(data).hexdigest()
+
+    def _fan_out(
+        self,
+        calls: list[Callable[[], str]],
+        quorum: int,
+        timeout: Optional[float],
+        on_late_ack: Optional[Callable[[int, str], None]] = None,
+    ) -> list[Optional[str]]:
+        """
+        Runs one call per backend concurrently and waits for `quorum` acks.
+
+        Calls that are still running once the quorum is reached (or the
+        timeout expires) keep running in the background. If they succeed,
+        `on_late_ack` is called with the backend index and its locator.
+
+        Returns:
+            The locator from each backend, in backend order, with None for
+            backends that failed or have not acknowledged yet.
+
+        Raises:
+            QuorumNotReachedError: If fewer than `quorum` calls succeed.
+        """
+        # Each outcome is recorded once: by the call, or by a timeout charge
+        outcomes = [RecordOnce() for _ in calls]
+        futures = {
+            self._executor.submit(self.health[i].call, call, outcomes[i]): i for i, call in enumerate(calls)
+        }
+        locators = [None] * len(calls)
+        errors = {}
+        acks = 0
+        pending = set(futures)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while pending and acks < quorum:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                # Timed out waiting for the remaining backends; charge them a
+                # failure so that a hung backend eventually trips its circuit.
+                # Their late completion is then not recorded again.
+                for future in pending:
+                    index = futures[future]
+                    if outcomes[index].claim():
+                        self.health[index].record(None, False)
+                break
+            for future in done:
+                index = futures[future]
+                try:
+                    locators[index] = future.result()
+                    acks += 1
+                except Exception as e:
+                    errors[index] = e
+            if acks + len(pending) < quorum:
+                break  # The quorum can no longer be reached
+
+        for future in pending:
+            self._track_background(future, futures[future], on_late_ack)
+
+        if acks < quorum:
+            message = f"Write quorum not reached: {acks} of {quorum} required acknowledgements"
+            first_error = next(iter(errors.values()), None)
+            raise QuorumNotReachedError(message, locators, errors) from first_error
+        return locators
+
+    def _track_background(
+        self,
+        future: Future,
+        index: int,
+        on_late_ack: Optional[Callable[[int, str], None]],
+    ) -> None:
+        """
+        Keeps a reference to a write that outlived its fan-out.
+        """
+        with self._background_lock:
+            self._background.add(future)
+
+        def done(f: Future) -> None:
+            with self._background_lock:
+                self._background.discard(f)
+            if on_late_ack and not f.cancelled() and f.exception() is None:
+                on_late_ack(index, f.result())
+
+        future.add_done_callback(done)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for background writes left over from quorum uploads.
+
+        Returns:
+            True if all background writes finished within the timeout.
+        """
+        with self._background_lock:
+            pending = set(self._background)
+        _, not_done = wait(pending, timeout=timeout)
+        return not not_done
+
+    def close(self) -> None:
+        """
+        Waits for outstanding operations and shuts down the thread pool.
+        """
+        self._executor.shutdown(wait=True)
 
-    def replicate_upload(self, session_id: str, encrypted_data: bytes) -> list[str]:
+    def replicate_upload(
+        self,
+        session_id: str,
+        encrypted_data: bytes,
+        write_quorum: Optional[int] = None,
+        timeout: Optional[float] = None,
+        on_late_ack: Optional[Callable[[int, str], None]] = None,
+    ) -> list[Optional[str]]:
         """
         Replicates the upload of data to all configured backends.
 
         Args:
             session_id: The ID of the session.
             encrypted_data: The encrypted session data.
+            write_quorum: Number of backends that must acknowledge before
+                          returning. Defaults to all of them. The remaining
+                          uploads finish in the background.
+            timeout: Per-backend timeout in seconds, overriding the default.
+            on_late_ack: Called with (backend index, locator) for uploads
+                         that complete after this method has returned.
 
         Returns:
-            A list of locators from each backend.
+            A list of locators from each backend, with None for backends that
+            had not acknowledged when the quorum was reached.
         """
-        locators = []
-        for backend in self.backends:
-            locator = backend.upload(session_id, encrypted_data)
-            locators.append(locator)
-        return locators
+        quorum = len(self.backends) if write_quorum is None else write_quorum
+        if not 1 <= quorum <= len(self.backends):
+            raise ValueError("Write quorum must be between 1 and the number of backends.")
+
+        calls = [
+            lambda backend=backend: backend.upload(session_id, encrypted_data)
+            for backend in self.backends
+        ]
+        return self._fan_out(
+            calls, quorum, self.timeout if timeout is None else timeout, on_late_ack
+        )
 
     def shard_upload(
-        self, session_id: str, encrypted_data: bytes, threshold: int
-    ) -> list[str]:
+        self,
+        session_id: str,
+        encrypted_data: bytes,
+        threshold: int,
+        write_quorum: Optional[int] = None,
+        timeout: Optional[float] = None,
+        on_late_ack: Optional[Callable[[int, str], None]] = None,
+    ) -> list[Optional[str]]:
         """
         Splits data into shards and uploads each shard to a different backend.
 
+        Shards are binary GF(256) Shamir shares (see `create_binary_shards`)
+        and can be recombined with `reconstruct_from_binary_shards`.
+
         Args:
             session_id: The ID of the session.
             encrypted_data: The encrypted session data.
             threshold: The number of shards required to reconstruct the data.
+            write_quorum: Number of shard uploads that must succeed before
+                          returning. Defaults to all backends and may not be
+                          lower than `threshold`.
+            timeout: Per-backend timeout in seconds, overriding the default.
+            on_late_ack: Called with (backend index, locator) for uploads
+                         that complete after this method has returned.
 
         Returns:
-            A list of locators for each shard.
+            A list of locators for each shard, with None for shards that had
+            not been acknowledged when the quorum was reached.
         """
         num_backends = len(self.backends)
-        shards = create_shards(encrypted_data, num_backends, threshold)
-        locators = []
-        for i, backend in enumerate(self.backends):
-            shard_data = shards[i].encode("utf-8")
-            locator = backend.upload(session_id, shard_data)
-            locators.append(locator)
-        return locators
+        quorum = num_backends if write_quorum is None else write_quorum
+        if not threshold <= quorum <= num_backends:
+            raise ValueError("Write quorum must be between the threshold and the number of backends.")
+
+        shards = create_binary_shards(encrypted_data, num_backends, threshold)
+        calls = [
+            lambda backend=backend, shard=shard: backend.upload(session_id, shard)
+            for backend, shard in zip(self.backends, shards)
+        ]
+        return self._fan_out(
+            calls, quorum, self.timeout if timeout is None else timeout, on_late_ack
+        )
+
+    def _timed_download(self, index: int, locator: str) -> bytes:
+        """
+        Downloads from one backend and records the read latency.
+        """
+        start = time.monotonic()
+        try:
+            data = self.health[index].call(lambda: self.backends[index].download(locator))
+        except CircuitOpenError:
+            raise
+        except Exception:
+            self.read_latency[index].record(time.monotonic() - start + self.READ_FAILURE_PENALTY)
+            raise
+        self.read_latency[index].record(time.monotonic() - start)
+        return data
+
+    def _read_candidates(self, locators: list[Optional[str]]) -> tuple[list[int], dict]:
+        """
+        Orders the backends holding a locator for reading, best first.
+
+        Returns:
+            The candidate indices, and an error for each backend skipped
+            because its circuit is open.
+        """
+        stored = [i for i, locator in enumerate(locators) if locator is not None]
+        # Unmeasured backends score 0 so they get probed
+        candidates = self.health.order(stored, latency=lambda i: self.read_latency[i].ewma or 0.0)
+        errors = {
+            i: CircuitOpenError(f"Circuit open for backend {i}") for i in stored if i not in candidates
+        }
+        return candidates, errors
+
+    def replicate_download(
+        self,
+        locators: list[Optional[str]],
+        checksum: Optional[str] = None,
+        hedge_delay: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bytes:
+        """
+        Downloads replicated data, hedging across backends.
+
+        The read is sent to the healthy backend with the lowest score (its
+        read latency EWMA plus a penalty for recent errors). If it
+        has not answered within its p95 latency (or `hedge_delay`), the read
+        is also sent to the next fastest backend, and so on. A failed or
+        corrupt response triggers the next backend immediately. The first
+        response that matches `checksum` wins; slower reads finish in the
+        background and still update the latency statistics.
+
+        Args:
+            locators: Locators in backend order, as returned by
+                      `replicate_upload`. None entries are skipped.
+            checksum: Expected `checksum()` of the data. If None, the first
+                      successful response is returned unverified.
+            hedge_delay: Fixed hedge delay in seconds, overriding the
+                         per-backend p95 estimate.
+            timeout: Overall timeout in seconds, defaulting to the manager's.
+
+        Returns:
+            The downloaded data.
+
+        Raises:
+            ReplicaReadError: If no replica returned valid data in time.
+        """
+        candidates, errors = self._read_candidates(locators)
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        in_flight = {}
+
+        def launch_next():
+            index = candidates.pop(0)
+            future = self._executor.submit(self._timed_download, index, locators[index])
+            in_flight[future] = index
+            return hedge_delay if hedge_delay is not None else self.read_latency[index].p95()
+
+        delay = launch_next() if candidates else None
+        while in_flight:
+            wait_for = delay if candidates else None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+                wait_for = remaining if wait_for is None else min(wait_for, remaining)
+            done, _ = wait(set(in_flight), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                delay = launch_next()  # Primary is slow; hedge to the next replica
+                continue
+
+            failed = False
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    errors[index] = e
+                    failed = True
+                    continue
+                if checksum is None or self.checksum(data) == checksum:
+                    return data
+                errors[index] = ValueError(f"Checksum mismatch from backend {index}")
+                failed = True
+
+            if failed and candidates:
+                delay = launch_next()
+
+        raise ReplicaReadError(
+            f"No valid replica returned after trying {len(errors)} backend(s)", errors
+        )
+
+    def erasure_upload(
+        self,
+        session_id: str,
+        encrypted_data: bytes,
+        data_shards: int,
+        write_quorum: Optional[int] = None,
+        timeout: Optional[float] = None,
+        on_late_ack: Optional[Callable[[int, str], None]] = None,
+    ) -> list[Optional[str]]:
+        """
+        Erasure-codes data and uploads one shard to each backend.
+
+        With n backends and k data shards, any k shards rebuild the data, so
+        the upload stores and sends n/k times the data size and survives the
+        loss of n - k backends. Unlike `shard_upload` it provides no secrecy
+        on its own, so the data should already be encrypted.
+
+        Args:
+            session_id: The ID of the session.
+            encrypted_data: The encrypted session data.
+            data_shards: The number of shards (k) required to rebuild the data.
+            write_quorum: Number of shard uploads that must succeed before
+                          returning. Defaults to all backends and may not be
+                          lower than `data_shards`.
+            timeout: Per-backend timeout in seconds, overriding the default.
+            on_late_ack: Called with (backend index, locator) for uploads
+                         that complete after this method has returned.
+
+        Returns:
+            A list of locators for each shard, with None for shards that had
+            not been acknowledged when the quorum was reached.
+        """
+        num_backends = len(self.backends)
+        quorum = num_backends if write_quorum is None else write_quorum
+        if not data_shards <= quorum <= num_backends:
+            raise ValueError("Write quorum must be between the data shard count and the number of backends.")
+
+        shards = erasure.encode(encrypted_data, data_shards, num_backends)
+        calls = [
+            lambda backend=backend, shard=shard: backend.upload(session_id, shard)
+            for backend, shard in zip(self.backends, shards)
+        ]
+        return self._fan_out(
+            calls, quorum, self.timeout if timeout is None else timeout, on_late_ack
+        )
+
+    def erasure_download(
+        self,
+        locators: list[Optional[str]],
+        data_shards: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> bytes:
+        """
+        Downloads erasure-coded data from any k backends.
+
+        With `data_shards` given, shards are requested from the k fastest
+        known backends at once. Otherwise k is only learnt from the first
+        shard header, so a single request goes out first and the read
+        widens to k once it has returned. Every failed or corrupt shard
+        triggers a request to the next backend, and decoding starts as soon
+        as k shards pass their checksums.
+
+        Args:
+            locators: Locators in backend order, as returned by
+                      `erasure_upload`. None entries are skipped.
+            data_shards: The `data_shards` passed to `erasure_upload`, if
+                         known. Shard headers are authoritative; this only
+                         sizes the first wave of requests.
+            timeout: Overall timeout in seconds, defaulting to the manager's.
+
+        Returns:
+            The reconstructed data.
+
+        Raises:
+            ReplicaReadError: If fewer than k valid shards could be fetched.
+        """
+        candidates, errors = self._read_candidates(locators)
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        in_flight = {}
+        shards = []
+        needed = None
+
+        def launch_next():
+            index = candidates.pop(0)
+            future = self._executor.submit(self._timed_download, index, locators[index])
+            in_flight[future] = index
+
+        # Without a known shard count, start with one request and widen to k
+        # once a header has been read.
+        while candidates and len(in_flight) < (data_shards or 1):
+            launch_next()
+        while in_flight:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = wait(set(in_flight), timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    shard = future.result()
+                except Exception as e:
+                    errors[index] = e
+                    continue
+                if not erasure.verify_shard(shard):
+                    errors[index] = ValueError(f"Corrupt shard from backend {index}")
+                    continue
+                shards.append(shard)
+                if needed is None:
+                    needed = erasure.parse_header(shard).data_shards
+
+            if needed is not None and len(shards) >= needed:
+                return erasure.decode(shards)
+            outstanding = (needed or data_shards or 1) - len(shards)
+            while candidates and len(in_flight) < outstanding:
+                launch_next()
+
+        raise ReplicaReadError(
+            f"Only {len(shards)} valid shard(s) could be read after {len(errors)} failure(s)", errors
+        )
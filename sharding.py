@@ -9,10 +9,13 @@
 
 import os
 import six
+from functools import lru_cache
 from six.moves import range
 
+import numpy as np
 from binascii import hexlify, unhexlify
-from primes import get_large_enough_prime
+from primes import get_large_enough_prime, mersenne_exponent, mersenne_prime
+import gf256
 
 def random_polynomial(degree, intercept, upper_bound):
     """ Generates a random polynomial with positive coefficients.
@@ -32,29 +35,114 @@ def random_polynomial(degree, intercept, upper_bound):
 
 def get_polynomial_points(coefficients, num_points, upper_bound):
     """ Calculates the first n points on a given polynomial.
+
+    Each point is evaluated with Horner's rule, reducing after every step so
+    intermediate values stay below upper_bound squared.
     """
     if num_points < 1:
         raise ValueError('Number of points must be a positive number.')
 
     points = []
     for x in range(1, num_points + 1):
-        # start with y = 0
         y = 0
-        # add the intercept
-        y += coefficients[0]
-        # add the remaining terms
-        for i in range(1, len(coefficients)):
-            y += coefficients[i] * (x**i)
-        # wrap the result
-        y %= upper_bound
+        for coefficient in reversed(coefficients):
+            y = (y * x + coefficient) % upper_bound
         points.append((x, y))
     return points
 
+def get_polynomial_points_batch(coefficients, num_points, upper_bound):
+    """ Evaluates many polynomials at x = 1..n at once.
+
+    Args:
+        coefficients: An int64 array of shape (degree + 1, m) holding one
+                      polynomial per column, intercepts in the first row.
+        num_points: The number of points (shares) to evaluate.
+        upper_bound: A prime below 2^31, so that Horner's y * x + c fits
+                     in int64 for every x < upper_bound.
+
+    Returns:
+        An int64 array of shape (num_points, m) with the y-values at each x.
+    """
+    if num_points < 1:
+        raise ValueError('Number of points must be a positive number.')
+    if upper_bound >= 2 ** 31:
+        raise ValueError('Batched evaluation requires a prime below 2^31.')
+
+    points = np.empty((num_points, coefficients.shape[1]), dtype=np.int64)
+    for x in range(1, num_points + 1):
+        y = points[x - 1]
+        y[:] = coefficients[-1]
+        # Reduce lazily: only take the remainder when the next Horner step
+        # could overflow int64, which for small x saves most reductions.
+        bound = upper_bound
+        for coefficient in coefficients[-2::-1]:
+            if bound * x + upper_bound >= 2 ** 63:
+                np.remainder(y, upper_bound, out=y)
+                bound = upper_bound
+            np.multiply(y, x, out=y)
+            y += coefficient
+            bound = bound * x + upper_bound
+        np.remainder(y, upper_bound, out=y)
+    return points
+
 def modular_inverse(a, b):
     """ Returns the modular inverse of a with respect to b.
     """
     return pow(a, -1, b)
 
+def batch_modular_inverse(values, prime):
+    """ Returns the modular inverses of all values using a single inversion.
+
+    Montgomery's trick: multiply the values together, invert the product
+    once, then walk back through the prefix products to peel off each
+    individual inverse.
+    """
+    prefix_products = []
+    accumulator = 1
+    for value in values:
+        accumulator = (accumulator * value) % prime
+        prefix_products.append(accumulator)
+
+    inverse = modular_inverse(accumulator, prime)
+    inverses = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        inverses[i] = (inverse * prefix_products[i - 1]) % prime
+        inverse = (inverse * values[i]) % prime
+    if values:
+        inverses[0] = inverse
+    return inverses
+
+@lru_cache(maxsize=256)
+def lagrange_basis_at_zero(x_values, prime):
+    """ Returns the Lagrange basis coefficients at x=0 for a set of x-coordinates.
+
+    The result depends only on the x-coordinates and the prime, so it is
+    cached: recovering many secrets from the same subset of shares reduces
+    to a dot product of the cached coefficients with the y-values.
+    """
+    numerators = []
+    denominators = []
+    for i, x_i in enumerate(x_values):
+        numerator = 1
+        denominator = 1
+        for j, x_j in enumerate(x_values):
+            if i == j:
+                continue
+            numerator = (numerator * -x_j) % prime
+            denominator = (denominator * (x_i - x_j)) % prime
+        numerators.append(numerator)
+        denominators.append(denominator)
+
+    inverses = batch_modular_inverse(denominators, prime)
+    return tuple((n * d) % prime for n, d in zip(numerators, inverses))
+
+def recover_free_coefficient(points, prime):
+    """ Evaluates the interpolating polynomial at x=0 using the cached basis.
+    """
+    x_values, y_values = zip(*points)
+    basis = lagrange_basis_at_zero(tuple(x_values), prime)
+    return sum(b * y for b, y in zip(basis, y_values)) % prime
+
 def lagrange_interpolate(x, points, prime):
     """ Calculates the lagrange basis polynomial for a given set of points.
     """
@@ -82,6 +170,63 @@ def lagrange_interpolate(x, points, prime):
         f_x += y_values[i] * lagrange_polynomial
     return f_x % prime
 
+# Field used for batched sharing: the Mersenne prime 2^31 - 1 keeps every
+# Horner step inside int64 arithmetic.
+BATCH_PRIME = mersenne_prime(31)
+
+def split_secrets_batch(secrets, share_threshold, num_shares, prime=BATCH_PRIME):
+    """ Splits many field elements into shares with one vectorized pass.
+
+    Args:
+        secrets: A 1-D array of integers below `prime`.
+        share_threshold: The number of shares required for recovery.
+        num_shares: The number of shares to create for every secret.
+        prime: The field prime; must be below 2^31.
+
+    Returns:
+        An int64 array of shape (num_shares, len(secrets)); row i holds the
+        shares at x = i + 1.
+    """
+    if share_threshold < 2:
+        raise ValueError("Share threshold must be >= 2.")
+    if share_threshold > num_shares:
+        raise ValueError("Share threshold must be less than or equal to the number of shares.")
+
+    secrets = np.asarray(secrets, dtype=np.int64)
+    if secrets.size and (secrets.min() < 0 or secrets.max() >= prime):
+        raise ValueError("Secrets must be non-negative and below the field prime.")
+
+    coefficients = np.empty((share_threshold, len(secrets)), dtype=np.int64)
+    coefficients[0] = secrets
+    # 31 random bits per coefficient; the single value equal to the prime
+    # folds to zero, a bias of 2^-31.
+    random_words = np.frombuffer(
+        os.urandom(4 * (share_threshold - 1) * len(secrets)), dtype=np.uint32
+    ).reshape(share_threshold - 1, len(secrets))
+    coefficients[1:] = random_words & np.uint32(0x7fffffff)
+    np.remainder(coefficients[1:], prime, out=coefficients[1:])
+    return get_polynomial_points_batch(coefficients, num_shares, prime)
+
+def recover_secrets_batch(x_values, y_values, prime=BATCH_PRIME):
+    """ Recovers many secrets shared with `split_secrets_batch`.
+
+    Args:
+        x_values: The x-coordinates of the shares being combined.
+        y_values: An array of shape (len(x_values), m) with the share values.
+        prime: The field prime used for splitting.
+
+    Returns:
+        An int64 array with the m recovered secrets.
+    """
+    basis = lagrange_basis_at_zero(tuple(int(x) for x in x_values), prime)
+    secrets = np.zeros(np.shape(y_values)[1], dtype=np.int64)
+    for coefficient, y in zip(basis, y_values):
+        term = np.multiply(y, coefficient, dtype=np.int64)
+        np.remainder(term, prime, out=term)
+        secrets += term
+    np.remainder(secrets, prime, out=secrets)
+    return secrets
+
 class SecretSharer(object):
     """ A secret sharer that can be used to split and recover secrets.
     """
@@ -107,9 +252,12 @@ class SecretSharer(object):
         coefficients = random_polynomial(share_threshold - 1, secret_int, prime)
         points = get_polynomial_points(coefficients, num_shares, prime)
 
+        # Shares are 'x-y-e' in hex, where e is the exponent of the Mersenne
+        # prime 2^e - 1 used as the field, so recovery never has to guess it.
+        exponent = hex(mersenne_exponent(prime))[2:]
         shares = []
         for point in points:
-            shares.append(hex(point[0])[2:] + '-' + hex(point[1])[2:])
+            shares.append(hex(point[0])[2:] + '-' + hex(point[1])[2:] + '-' + exponent)
         return shares
 
     @classmethod
@@ -118,19 +266,28 @@ class SecretSharer(object):
             raise ValueError("Shares must be a list of at least two shares.")
 
         for share in shares:
-            if not isinstance(share, str) or '-' not in share:
-                raise ValueError("Each share must be a string of the format 'x-y'.")
+            if not isinstance(share, str) or share.count('-') not in (1, 2):
+                raise ValueError("Each share must be a string of the format 'x-y-e' or 'x-y'.")
 
         points = []
+        exponents = set()
         for share in shares:
-            x, y = share.split('-')
-            points.append((int(x, 16), int(y, 16)))
+            parts = share.split('-')
+            points.append((int(parts[0], 16), int(parts[1], 16)))
+            if len(parts) == 3:
+                exponents.add(int(parts[2], 16))
 
-        prime = get_large_enough_prime([p[1] for p in points])
-        if not prime:
-            raise Exception("Could not find a prime number large enough to accommodate the secret. Please report this issue.")
+        if len(exponents) > 1:
+            raise ValueError("Shares were created with different primes.")
+        if exponents:
+            prime = mersenne_prime(exponents.pop())
+        else:
+            # Legacy 'x-y' shares do not record the prime, so derive it
+            prime = get_large_enough_prime([p[1] for p in points])
+            if not prime:
+                raise Exception("Could not find a prime number large enough to accommodate the secret. Please report this issue.")
 
-        free_coefficient = lagrange_interpolate(0, points, prime)
+        free_coefficient = recover_free_coefficient(points, prime)
         secret_hex = hex(free_coefficient)[2:]
         return secret_hex
 
@@ -183,3 +340,32 @@ def reconstruct_from_shards(shards: list[str]) -> bytes:
     sharer = PlaintextToHexSecretSharer()
     secret_hex = sharer.recover_secret(shards)
     return bytes.fromhex(secret_hex)
+
+def create_binary_shards(data: bytes, num_backends: int, threshold: int) -> list[bytes]:
+    """
+    Splits data into binary shards using byte-wise Shamir sharing over GF(256).
+
+    Unlike `create_shards`, this works for payloads of any size and each
+    shard is only one byte larger than the data.
+
+    Args:
+        data: The data to be split.
+        num_backends: The number of shards to create.
+        threshold: The number of shards required to reconstruct the data.
+
+    Returns:
+        A list of binary shards.
+    """
+    return gf256.split_secret(data, threshold, num_backends)
+
+def reconstruct_from_binary_shards(shards: list[bytes]) -> bytes:
+    """
+    Reconstructs the original data from binary shards.
+
+    Args:
+        shards: At least `threshold` shards from `create_binary_shards`.
+
+    Returns:
+        The reconstructed data.
+    """
+    return gf256.recover_secret(shards)
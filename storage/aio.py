@@ -0,0 +1,252 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from storage.base import StorageBackend
+from storage.health import CircuitOpenError, HealthTracker
+from storage.local import LocalNetworkStorage
+
+class AsyncStorageBackend(ABC):
+    """
+    Abstract base class for an asyncio storage backend.
+
+    Mirrors StorageBackend with coroutine methods, so a single event loop
+    can keep many object operations in flight at once.
+    """
+
+    @abstractmethod
+    async def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        """
+        Uploads session data to the storage backend.
+
+        Args:
+            session_id: The ID of the session.
+            encrypted_data: The encrypted session data.
+
+        Returns:
+            A unique string locator for the uploaded data.
+        """
+        pass
+
+    @abstractmethod
+    async def download(self, locator: str) -> bytes:
+        """
+        Downloads data from the storage backend.
+
+        Args:
+            locator: The unique locator for the data.
+
+        Returns:
+            The downloaded data.
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, locator: str) -> bool:
+        """
+        Deletes data from the storage backend.
+
+        Args:
+            locator: The unique locator for the data.
+
+        Returns:
+            True if the deletion was successful, False otherwise.
+        """
+        pass
+
+    @abstractmethod
+    async def list_all(self) -> list[str]:
+        """
+        Lists all locators managed by the backend.
+
+        Returns:
+            A list of all locators.
+        """
+        pass
+
+class SyncBackendAdapter(AsyncStorageBackend):
+    """
+    Runs a synchronous StorageBackend on a thread pool.
+
+    Each call is handed to the executor and awaited, so blocking SDK or
+    file calls never stall the event loop. `max_concurrency` bounds the
+    calls in flight for this backend independently of the pool size.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        executor: Optional[ThreadPoolExecutor] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.backend = backend
+        self.executor = executor
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            return await loop.run_in_executor(self.executor, func, *args)
+        async with self._semaphore:
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        return await self._run(self.backend.upload, session_id, encrypted_data)
+
+    async def download(self, locator: str) -> bytes:
+        return await self._run(self.backend.download, locator)
+
+    async def delete(self, locator: str) -> bool:
+        return await self._run(self.backend.delete, locator)
+
+    async def list_all(self) -> list[str]:
+        return await self._run(self.backend.list_all)
+
+class AsyncLocalStorage(SyncBackendAdapter):
+    """
+    An asyncio backend for a local network share.
+
+    File I/O has no portable non-blocking API, so operations run on a
+    dedicated thread pool sized for disk concurrency rather than on the
+    loop's shared default executor. The on-disk layout is that of
+    LocalNetworkStorage, so both can be used on the same directory.
+    """
+
+    def __init__(self, base_path: str, max_workers: int = 32):
+        super().__init__(
+            LocalNetworkStorage(base_path),
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aio-local"),
+        )
+        self.base_path = base_path
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+class AsyncS3Storage(AsyncStorageBackend):
+    """
+    An asyncio backend for S3, using an aiobotocore client.
+
+    The client is created by the caller, for example with
+    `session.create_client("s3")` from aiobotocore, and must stay open for
+    the lifetime of the backend. Objects use the same keys as S3Storage.
+    """
+
+    def __init__(self, s3_client, bucket_name: str):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+
+    async def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        locator = f"tsm_sessions/{uuid.uuid4()}.session"
+        await self.s3_client.put_object(Bucket=self.bucket_name, Key=locator, Body=encrypted_data)
+        return locator
+
+    async def download(self, locator: str) -> bytes:
+        response = await self.s3_client.get_object(Bucket=self.bucket_name, Key=locator)
+        async with response["Body"] as stream:
+            return await stream.read()
+
+    async def delete(self, locator: str) -> bool:
+        await self.s3_client.delete_object(Bucket=self.bucket_name, Key=locator)
+        return True
+
+    async def list_all(self) -> list[str]:
+        locators = []
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=self.bucket_name, Prefix="tsm_sessions/"):
+            for obj in page.get("Contents", []):
+                locators.append(obj["Key"])
+        return locators
+
+class AsyncGCSStorage(AsyncStorageBackend):
+    """
+    An asyncio backend for Google Cloud Storage, using a gcloud-aio-storage
+    `Storage` client. Locators have the same form as those of GCSStorage.
+    """
+
+    def __init__(self, storage_client, bucket_name: str):
+        self.storage_client = storage_client
+        self.bucket_name = bucket_name
+
+    def _blob_name(self, locator: str) -> str:
+        return locator.replace(f"gcs://{self.bucket_name}/", "")
+
+    async def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        await self.storage_client.upload(self.bucket_name, session_id, encrypted_data)
+        return f"gcs://{self.bucket_name}/{session_id}"
+
+    async def download(self, locator: str) -> bytes:
+        return await self.storage_client.download(self.bucket_name, self._blob_name(locator))
+
+    async def delete(self, locator: str) -> bool:
+        try:
+            await self.storage_client.delete(self.bucket_name, self._blob_name(locator))
+            return True
+        except Exception:
+            return False
+
+    async def list_all(self) -> list[str]:
+        locators = []
+        params = {}
+        while True:
+            response = await self.storage_client.list_objects(self.bucket_name, params=params)
+            for item in response.get("items", []):
+                locators.append(f"gcs://{self.bucket_name}/{item['name']}")
+            token = response.get("nextPageToken")
+            if not token:
+                return locators
+            params = {"pageToken": token}
+
+def as_async(backend) -> AsyncStorageBackend:
+    """
+    Returns an async backend, wrapping synchronous backends in an adapter.
+    """
+    if isinstance(backend, AsyncStorageBackend):
+        return backend
+    return SyncBackendAdapter(backend)
+
+async def store_with_failover(
+    backends: list,
+    session_id: str,
+    encrypted_data: bytes,
+    health: Optional[HealthTracker] = None,
+) -> tuple[int, str]:
+    """
+    Stores session data on the first backend that accepts it.
+
+    Args:
+        backends: Backends in order of preference, sync or async.
+        session_id: The ID of the session.
+        encrypted_data: The encrypted session data.
+        health: Optional health tracker with one entry per backend. When
+                given, backends are tried best score first, backends with an
+                open circuit are skipped without being called, and every
+                attempt is recorded.
+
+    Returns:
+        The index of the backend that stored the data and its locator.
+
+    Raises:
+        IOError: If every backend fails.
+    """
+    errors = {}
+    if health is None:
+        for index, backend in enumerate(backends):
+            try:
+                return index, await as_async(backend).upload(session_id, encrypted_data)
+            except Exception as e:
+                errors[index] = e
+        raise IOError(f"All {len(backends)} backends failed: {errors}")
+
+    order = health.order()
+    for index in range(len(backends)):
+        if index not in order:
+            errors[index] = CircuitOpenError(f"Circuit open for backend {index}")
+    for index in order:
+        backend = as_async(backends[index])
+        try:
+            return index, await health[index].call_async(lambda: backend.upload(session_id, encrypted_data))
+        except Exception as e:
+            errors[index] = e
+    raise IOError(f"All {len(backends)} backends failed: {errors}")
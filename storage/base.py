@@ -1,4 +1,14 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+@dataclass(frozen=True)
+class InventoryEntry:
+    """One object found by an inventory scan."""
+    locator: str
+    size: Optional[int] = None
+    etag: Optional[str] = None
+    modified: Optional[float] = None  # Last modification, as a Unix timestamp
 
 class StorageBackend(ABC):
     """
@@ -45,6 +55,25 @@ class StorageBackend(ABC):
         """
         pass
 
+    def delete_many(self, locators: list[str]) -> list[str]:
+        """
+        Deletes several objects, using a bulk API where the backend has one.
+
+        Args:
+            locators: The locators to delete.
+
+        Returns:
+            The locators that could not be deleted.
+        """
+        failed = []
+        for locator in locators:
+            try:
+                if not self.delete(locator):
+                    failed.append(locator)
+            except Exception:
+                failed.append(locator)
+        return failed
+
     @abstractmethod
     def list_all(self) -> list[str]:
         """
@@ -55,12 +84,23 @@ class StorageBackend(ABC):
         """
         pass
 
-    async def store_with_failover(self, session_data):
+    def inventory_partitions(self) -> list:
         """
-        Stores session data with failover to another backend.
+        Splits the backend's keyspace into partitions that can be scanned
+        in parallel. Together the partitions must cover every locator
+        exactly once.
+
+        Returns:
+            Opaque partition values for `scan_inventory`.
         """
-        for backend in self.backends:
-            try:
-                return await backend.store(session_data)
-            except Exception:
-                continue
+        return [None]
+
+    def scan_inventory(self, partition=None) -> Iterator[InventoryEntry]:
+        """
+        Yields the objects in one partition of the backend.
+
+        Backends that can list sizes and native checksums cheaply override
+        this; the default only reports locators.
+        """
+        for locator in self.list_all():
+            yield InventoryEntry(locator)
@@ -0,0 +1,224 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Iterator, Optional
+from storage.base import InventoryEntry, StorageBackend
+
+log = logging.getLogger(__name__)
+
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+class CachedStorage(StorageBackend):
+    """
+    A read-through, write-through local disk cache in front of a backend.
+
+    Recently used objects are kept as files in `cache_dir`, bounded by
+    `max_bytes` with least-recently-used eviction, so repeated reads of hot
+    sessions are served at local disk speed instead of from the remote
+    service. Each cache file starts with the SHA-256 of its payload and is
+    verified on every hit; a corrupt entry is dropped and refetched.
+    Concurrent misses for the same object share a single remote download.
+
+    Uploads always go to the remote backend first, because the remote
+    backend assigns the locator, and the cache is then populated from the
+    uploaded bytes. Only write-through is offered: a write-back cache would
+    have no locator to return until the deferred upload ran, and would
+    acknowledge data that exists on a single local disk. The cache
+    survives restarts: existing files are indexed on startup in order of
+    their last use.
+
+    `StorageFactory` wraps remote backends in this class when the storage
+    configuration has a "cache" section.
+    """
+
+    def __init__(self, backend: StorageBackend, cache_dir: str, max_bytes: int, cache_on_upload: bool = True):
+        """
+        Args:
+            backend: The remote backend.
+            cache_dir: The directory holding cached objects.
+            max_bytes: The cache capacity in payload bytes.
+            cache_on_upload: Whether uploads also populate the cache.
+        """
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_on_upload = cache_on_upload
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # cache key -> payload size, oldest first
+        self._size = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def _key(locator: str) -> str:
+        return hashlib.sha256(locator.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.cache")
+
+    def _load_index(self) -> None:
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".cache"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(".cache")], stat.st_size - DIGEST_SIZE))
+                elif entry.name.startswith(".tmp-"):
+                    os.remove(entry.path)
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+        self._evict(0)
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._size
+
+    def _evict(self, incoming: int) -> None:
+        """
+        Removes least recently used entries until `incoming` more bytes fit.
+        Must be called with the lock held.
+        """
+        while self._entries and self._size + incoming > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _discard(self, key: str) -> None:
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._size -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _store(self, key: str, data: bytes) -> None:
+        """
+        Adds an object to the cache, evicting old entries to make room.
+        """
+        if len(data) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(hashlib.sha256(data).digest())
+                f.write(data)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous
+            self._evict(len(data))
+            os.replace(tmp_path, self._path(key))
+            self._entries[key] = len(data)
+            self._size += len(data)
+
+    def _read_cached(self, key: str) -> Optional[bytes]:
+        """
+        Returns a verified cached object, or None on a miss or corrupt entry.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                content = f.read()
+            # Record the use so LRU order survives restarts
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            self._discard(key)
+            return None
+        payload = memoryview(content)[DIGEST_SIZE:]
+        if hashlib.sha256(payload).digest() != content[:DIGEST_SIZE]:
+            self._discard(key)
+            return None
+        return content[DIGEST_SIZE:]
+
+    def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        """
+        Uploads to the remote backend and populates the cache.
+        """
+        locator = self.backend.upload(session_id, encrypted_data)
+        if self.cache_on_upload:
+            self._store(self._key(locator), encrypted_data)
+        return locator
+
+    def download(self, locator: str) -> bytes:
+        """
+        Serves an object from the cache, fetching it from the remote
+        backend on a miss. Failing to cache the fetched object does not
+        fail the read.
+        """
+        key = self._key(locator)
+        data = self._read_cached(key)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        self.misses += 1
+        try:
+            data = self.backend.download(locator)
+            future.set_result(data)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        try:
+            self._store(key, data)
+        except Exception as e:
+            log.warning(f"Could not cache {locator}: {e}")
+        return data
+
+    def delete(self, locator: str) -> bool:
+        """
+        Deletes from the remote backend and drops the cached copy.
+        """
+        self._discard(self._key(locator))
+        return self.backend.delete(locator)
+
+    def delete_many(self, locators: list[str]) -> list[str]:
+        """
+        Bulk-deletes from the remote backend and drops the cached copies.
+        """
+        for locator in locators:
+            self._discard(self._key(locator))
+        return self.backend.delete_many(locators)
+
+    def list_all(self) -> list[str]:
+        """
+        Lists all locators of the remote backend.
+        """
+        return self.backend.list_all()
+
+    def inventory_partitions(self) -> list:
+        return self.backend.inventory_partitions()
+
+    def scan_inventory(self, partition=None) -> Iterator[InventoryEntry]:
+        return self.backend.scan_inventory(partition)
@@ -0,0 +1,51 @@
+import uuid
+from chunkstore import ChunkStore
+from storage.base import StorageBackend
+
+class DedupStorage(StorageBackend):
+    """
+    A storage backend that keeps uploads in a deduplicating chunk store.
+
+    Every upload is split into content-defined chunks and only chunks that
+    are not already stored are written, so repeated uploads of mostly
+    unchanged data cost only the changed chunks. Data that is encrypted
+    with a fresh nonce per upload shares no chunks with earlier uploads;
+    deduplication pays off for plaintext or deterministically encoded data.
+    """
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self.store = ChunkStore(base_path)
+
+    def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        """
+        Stores the new chunks of the data and commits a manifest for them.
+        """
+        locator = str(uuid.uuid4())
+        result = self.store.store_bytes(encrypted_data)
+        self.store.add_manifest(locator, {
+            "session_id": session_id,
+            "size": result.size,
+            "sha256": result.sha256,
+            "chunks": result.chunks,
+        })
+        return locator
+
+    def download(self, locator: str) -> bytes:
+        """
+        Reassembles the data from its chunks.
+        """
+        manifest = self.store.get_manifest(locator)
+        return b"".join(self.store.read_chunks(manifest["chunks"]))
+
+    def delete(self, locator: str) -> bool:
+        """
+        Deletes the manifest and frees chunks no other upload references.
+        """
+        return self.store.delete_manifest(locator) is not None
+
+    def list_all(self) -> list[str]:
+        """
+        Lists all locators in the chunk store.
+        """
+        return self.store.list_manifests()
@@ -1,22 +1,285 @@
+import hashlib
 import json
+import os
+import re
+import threading
 from storage.base import StorageBackend
+from storage.cache import CachedStorage
 from storage.local import LocalNetworkStorage
 from storage.s3 import S3Storage
-from storage.gcs import GCSStorage
 from storage.ipfs import IPFSStorage
 # Import other storage backends here
 # from storage.minio import MinIOStorage
 # from storage.ceph import CephStorage
 
+# Defaults for the shared HTTP connection pools, overridable per file under
+# a top-level "connection_pool" key and per backend under the same key.
+DEFAULT_POOL_SETTINGS = {
+    "max_connections": 32,
+    "keep_alive": True,
+    "retries": 3,
+    "connect_timeout": 5.0,
+    "read_timeout": 60.0,
+}
+
+# Settings of the local read cache put in front of remote backends. The
+# cache is enabled by a top-level "cache" section with at least a "dir",
+# and can be overridden per backend with its own "cache" section or
+# turned off with "cache": false. Each backend caches in its own
+# subdirectory of "dir".
+DEFAULT_CACHE_SETTINGS = {
+    "max_bytes": 1024 * 1024 * 1024,
+    "cache_on_upload": True,
+}
+
+# Backend types that are already on local disk and are never cached
+UNCACHED_TYPES = {"local"}
+
+class ClientCache:
+    """
+    Builds and shares SDK clients, one per endpoint and credential set.
+
+    Each client owns a pooled HTTP session with keep-alive, so backends on
+    the same endpoint reuse warm TCP/TLS connections instead of opening new
+    ones per call. Clients are thread-safe and are created lazily.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: tuple, build):
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = build()
+            return client
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def s3_client(self, config: dict, pool: dict):
+        """
+        Returns a boto3 S3 client for an endpoint, creating it on first use.
+        """
+        endpoint = config.get("endpoint") or config.get("endpoint_url")
+        if endpoint and "://" not in endpoint:
+            endpoint = f"{'https' if config.get('secure', False) else 'http'}://{endpoint}"
+        access_key = config.get("access_key") or os.environ.get(config.get("access_key_env", ""), None)
+        secret_key = config.get("secret_key") or os.environ.get(config.get("secret_key_env", ""), None)
+        region = config.get("region", "us-east-1")
+        key = ("s3", endpoint, region, access_key, tuple(sorted(pool.items())))
+
+        def build():
+            import boto3
+            from botocore.config import Config
+
+            client_config = Config(
+                max_pool_connections=pool["max_connections"],
+                tcp_keepalive=pool["keep_alive"],
+                retries={"max_attempts": pool["retries"], "mode": "adaptive"},
+                connect_timeout=pool["connect_timeout"],
+                read_timeout=pool["read_timeout"],
+            )
+            return boto3.session.Session().client(
+                "s3",
+                endpoint_url=endpoint,
+                region_name=region,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                config=client_config,
+            )
+
+        return self._get(key, build)
+
+    def gcs_client(self, config: dict, pool: dict):
+        """
+        Returns a google-cloud-storage client whose authorized session
+        uses a pooled, retrying HTTP adapter.
+        """
+        credentials_file = config.get("credentials_file")
+        project = config.get("project")
+        key = ("gcs", project, credentials_file, tuple(sorted(pool.items())))
+
+        def build():
+            import google.auth
+            from google.auth.transport.requests import AuthorizedSession
+            from google.cloud import storage
+            from google.oauth2 import service_account
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            scopes = ["https://www.googleapis.com/auth/devstorage.read_write"]
+            if credentials_file:
+                credentials = service_account.Credentials.from_service_account_file(credentials_file, scopes=scopes)
+            else:
+                credentials, _ = google.auth.default(scopes=scopes)
+            session = AuthorizedSession(credentials)
+            adapter = HTTPAdapter(
+                pool_connections=pool["max_connections"],
+                pool_maxsize=pool["max_connections"],
+                max_retries=Retry(total=pool["retries"], backoff_factor=0.5,
+                                  status_forcelist=(429, 500, 502, 503, 504)),
+            )
+            session.mount("https://", adapter)
+            if not pool["keep_alive"]:
+                session.headers["Connection"] = "close"
+            return storage.Client(project=project, credentials=credentials, _http=session)
+
+        return self._get(key, build)
+
+    def ipfs_client(self, config: dict, pool: dict):
+        """
+        Returns an ipfshttpclient client with a persistent session.
+        """
+        address = config.get("endpoint", "/dns/localhost/tcp/5001/http")
+        key = ("ipfs", address, tuple(sorted(pool.items())))
+
+        def build():
+            import ipfshttpclient
+
+            return ipfshttpclient.connect(
+                address,
+                session=pool["keep_alive"],
+                timeout=(pool["connect_timeout"], pool["read_timeout"]),
+            )
+
+        return self._get(key, build)
+
 class StorageFactory:
     """
     Factory for creating storage backend instances.
     """
 
+    # Shared by all factories so every backend on an endpoint uses one client
+    shared_clients = ClientCache()
+
+    def __init__(self, clients: ClientCache = None):
+        self.clients = clients if clients is not None else self.shared_clients
+
     @staticmethod
-    def load_from_config(path: str) -> list[StorageBackend]:
+    def _read_file(path: str) -> dict:
+        """
+        Reads a JSON or YAML storage configuration into a mapping with a
+        "backends" list.
         """
-        Loads storage backends from a JSON configuration file.
+        with open(path, 'r') as f:
+            if path.endswith((".yaml", ".yml")):
+                import yaml
+                config = yaml.safe_load(f)
+            else:
+                config = json.load(f)
+
+        if isinstance(config, list):
+            return {"backends": config}
+        if not isinstance(config, dict) or not isinstance(config.get("backends", []), list):
+            raise ValueError(f"Invalid storage configuration in {path}")
+        return config
+
+    @classmethod
+    def read_config(cls, path: str) -> tuple[list[dict], dict]:
+        """
+        Reads a JSON or YAML storage configuration.
+
+        Both a bare list of backends and a mapping with a "backends" list
+        (and optional "connection_pool" and "cache" sections) are accepted.
+
+        Returns:
+            The backend entries and the file-wide pool settings.
+        """
+        config = cls._read_file(path)
+        return config.get("backends", []), config.get("connection_pool", {})
+
+    @staticmethod
+    def cache_settings(backend_config: dict, cache_settings: dict = None) -> dict:
+        """
+        Returns the read cache settings of a backend, or None if it is not
+        cached.
+
+        Raises:
+            ValueError: If a cache is configured without a "dir".
+        """
+        if backend_config.get("type") in UNCACHED_TYPES:
+            return None
+        own = backend_config.get("cache")
+        if own is False or (own is None and not cache_settings):
+            return None
+        settings = {**DEFAULT_CACHE_SETTINGS, **(cache_settings or {}), **(own if isinstance(own, dict) else {})}
+        if not settings.get("dir"):
+            raise ValueError("The storage cache requires a 'dir'.")
+        return settings
+
+    def create_backend(
+        self,
+        backend_config: dict,
+        pool_settings: dict = None,
+        cache_settings: dict = None,
+    ) -> StorageBackend:
+        """
+        Builds one backend, with its client taken from the client cache.
+
+        Remote backends are wrapped in a `CachedStorage` when a cache is
+        configured (see `cache_settings`).
+
+        Args:
+            backend_config: The backend entry.
+            pool_settings: The file-wide "connection_pool" section.
+            cache_settings: The file-wide "cache" section.
+
+        Raises:
+            ValueError: If the backend type is unknown or required fields are missing.
+        """
+        backend = self._create_uncached(backend_config, pool_settings)
+        cache = self.cache_settings(backend_config, cache_settings)
+        if cache is None:
+            return backend
+        return CachedStorage(
+            backend,
+            os.path.join(os.path.expanduser(cache["dir"]), self._cache_name(backend_config)),
+            int(cache["max_bytes"]),
+            cache_on_upload=bool(cache["cache_on_upload"]),
+        )
+
+    @staticmethod
+    def _cache_name(backend_config: dict) -> str:
+        """
+        Returns a directory name for a backend's cache, from its ID or, for
+        entries without one, a hash of its settings.
+        """
+        if backend_config.get("id"):
+            return re.sub(r"[^A-Za-z0-9._-]", "_", str(backend_config["id"]))
+        canonical = json.dumps(backend_config, sort_keys=True, default=str)
+        return f"{backend_config.get('type', 'backend')}-{hashlib.sha256(canonical.encode()).hexdigest()[:8]}"
+
+    def _create_uncached(self, backend_config: dict, pool_settings: dict = None) -> StorageBackend:
+        """
+        Builds one backend without a read cache.
+        """
+        pool = {**DEFAULT_POOL_SETTINGS, **(pool_settings or {}), **backend_config.get("connection_pool", {})}
+        backend_type = backend_config.get("type")
+        if backend_type == "local":
+            path = backend_config.get("base_path") or backend_config.get("path")
+            if not path:
+                raise ValueError("Local storage requires a 'base_path'.")
+            return LocalNetworkStorage(path)
+        elif backend_type == "s3":
+            return S3Storage(self.clients.s3_client(backend_config, pool), backend_config["bucket"])
+        elif backend_type == "gcs":
+            # Imported here so the google-cloud SDK is only needed when used
+            from storage.gcs import GCSStorage
+            return GCSStorage(self.clients.gcs_client(backend_config, pool), backend_config["bucket"])
+        elif backend_type == "ipfs":
+            return IPFSStorage(self.clients.ipfs_client(backend_config, pool))
+        # Add other backends here
+        # elif backend_type == "minio":
+        #     ...
+        # elif backend_type == "ceph":
+        #     ...
+        raise ValueError(f"Unknown storage backend type: {backend_type}")
+
+    def load_from_config(self, path: str) -> list[StorageBackend]:
+        """
+        Loads storage backends from a JSON or YAML configuration file.
 
         Args:
             path: The path to the configuration file.
@@ -24,33 +287,8 @@ class StorageFactory:
         Returns:
             A list of initialized storage backend instances.
         """
-        with open(path, 'r') as f:
-            config = json.load(f)
-
-        backends = []
-        for backend_config in config:
-            backend_type = backend_config.get("type")
-            if backend_type == "local":
-                instance = LocalNetworkStorage(backend_config["base_path"])
-                backends.append(instance)
-            elif backend_type == "s3":
-                # Note: This requires a pre-configured s3_client
-                # In a real application, you would initialize the client here
-                # based on the config (e.g., access key, secret key, region)
-                # For this example, we assume a client is passed in.
-                pass
-            elif backend_type == "gcs":
-                # Note: This requires a pre-configured storage_client
-                # In a real application, you would initialize the client here
-                # based on the config (e.g., credentials JSON)
-                pass
-            elif backend_type == "ipfs":
-                # Note: This requires a pre-configured ipfs_client
-                pass
-            # Add other backends here
-            # elif backend_type == "minio":
-            #     ...
-            # elif backend_type == "ceph":
-            #     ...
-
-        return backends
+        config = self._read_file(path)
+        return [
+            self.create_backend(backend_config, config.get("connection_pool"), config.get("cache"))
+            for backend_config in config.get("backends", [])
+        ]
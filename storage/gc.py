@@ -0,0 +1,175 @@
+"""
+Garbage collection of orphaned storage objects.
+
+An object is an orphan when no session references its locator any more:
+the session was deleted, or the object is a shard left behind by an
+upload that failed before its session was committed. The collector lists
+each backend (from the inventory index when there is one), subtracts the
+referenced locators and deletes the rest with the backends' bulk delete
+APIs, several batches at a time.
+
+Objects younger than the grace period are never collected, because their
+session may not have been committed yet. The referenced set is read after
+the backends have been listed, so a session committed during the listing
+still protects its objects.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from storage.base import StorageBackend
+from storage.inventory import InventoryIndex
+from storage.transfer import map_bounded
+
+log = logging.getLogger(__name__)
+
+DEFAULT_GRACE_PERIOD = 24 * 60 * 60
+DEFAULT_BATCH_SIZE = 1000
+
+@dataclass
+class GCReport:
+    """The outcome of a garbage collection pass."""
+    dry_run: bool = True
+    scanned: int = 0
+    referenced: int = 0
+    too_recent: int = 0
+    orphans: dict[str, list[str]] = field(default_factory=dict)
+    deleted: int = 0
+    failed: dict[str, list[str]] = field(default_factory=dict)
+
+    @property
+    def orphan_count(self) -> int:
+        return sum(len(locators) for locators in self.orphans.values())
+
+class GarbageCollector:
+    """
+    Finds and deletes objects that no session references.
+    """
+
+    def __init__(
+        self,
+        backends: dict[str, StorageBackend],
+        inventory: Optional[InventoryIndex] = None,
+        grace_period: float = DEFAULT_GRACE_PERIOD,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_workers: int = 8,
+    ):
+        """
+        Args:
+            backends: The backends to collect, by backend ID.
+            inventory: If given, backends are listed from the index instead
+                       of being scanned. Index entries are dated by the
+                       backend's modification time, or when the index first
+                       saw the object, neither of which is earlier than
+                       the object's creation.
+            grace_period: Minimum age in seconds of a collected object.
+                          Objects of unknown age are only collected with a
+                          grace period of 0.
+            batch_size: Locators per bulk delete call.
+            max_workers: Listing and deletion calls run concurrently.
+        """
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1.")
+        self.backends = backends
+        self.inventory = inventory
+        self.grace_period = grace_period
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def _list_backend(self, backend_id: str) -> list[tuple[str, Optional[float]]]:
+        """
+        Returns (locator, timestamp) pairs for every object of a backend.
+        """
+        if self.inventory is not None:
+            return [(record.locator, record.modified) for record in self.inventory.records(backend_id)]
+
+        backend = self.backends[backend_id]
+        partitions = backend.inventory_partitions()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(partitions))),
+                                thread_name_prefix="gc-scan") as executor:
+            scans = executor.map(lambda p: [(e.locator, e.modified) for e in backend.scan_inventory(p)], partitions)
+            return [item for scan in scans for item in scan]
+
+    def find_orphans(self, referenced: Callable[[], Iterable[str]], report: Optional[GCReport] = None) -> GCReport:
+        """
+        Lists the backends and returns the unreferenced objects old enough
+        to be collected, without deleting anything.
+
+        Args:
+            referenced: Returns every locator still referenced by a session.
+                        Called after the listing.
+        """
+        report = report or GCReport()
+        listings = {backend_id: self._list_backend(backend_id) for backend_id in self.backends}
+        keep = set(referenced())
+        report.referenced = len(keep)
+        cutoff = time.time() - self.grace_period
+
+        for backend_id, objects in listings.items():
+            report.scanned += len(objects)
+            orphans = []
+            for locator, timestamp in objects:
+                if locator in keep:
+                    continue
+                if self.grace_period > 0 and (timestamp is None or timestamp > cutoff):
+                    report.too_recent += 1
+                    continue
+                orphans.append(locator)
+            if orphans:
+                report.orphans[backend_id] = orphans
+        return report
+
+    def collect(self, referenced: Callable[[], Iterable[str]], dry_run: bool = True) -> GCReport:
+        """
+        Deletes unreferenced objects from every backend.
+
+        Args:
+            referenced: Returns every locator still referenced by a session.
+            dry_run: Only report what would be deleted.
+
+        Returns:
+            A report of the orphans found and what was deleted.
+
+        Raises:
+            ValueError: If objects would be deleted while no locator at all
+                        is referenced. That is what a broken or missing
+                        reference source looks like, and collecting then
+                        would delete everything.
+        """
+        report = self.find_orphans(referenced, GCReport(dry_run=dry_run))
+        log.info(f"Found {report.orphan_count} orphaned objects in {report.scanned} scanned")
+        if dry_run or not report.orphans:
+            return report
+        if not report.referenced:
+            raise ValueError(
+                f"Refusing to delete {report.orphan_count} objects: no session references any locator."
+            )
+
+        jobs = [
+            (backend_id, locators[start:start + self.batch_size])
+            for backend_id, locators in report.orphans.items()
+            for start in range(0, len(locators), self.batch_size)
+        ]
+
+        def delete_batch(index: int, job: tuple[str, list[str]]) -> list[str]:
+            backend_id, batch = job
+            try:
+                return self.backends[backend_id].delete_many(batch)
+            except Exception as e:
+                log.error(f"Bulk delete of {len(batch)} objects on {backend_id} failed: {e}")
+                return batch
+
+        results = map_bounded(delete_batch, jobs, self.max_workers)
+        for (backend_id, batch), failed in zip(jobs, results):
+            if failed:
+                report.failed.setdefault(backend_id, []).extend(failed)
+            failed_set = set(failed)
+            deleted = [locator for locator in batch if locator not in failed_set]
+            report.deleted += len(deleted)
+            if self.inventory is not None and deleted:
+                self.inventory.remove_many(backend_id, deleted)
+        log.info(f"Deleted {report.deleted} orphaned objects")
+        return report
@@ -1,6 +1,15 @@
-from storage.base import StorageBackend
+from typing import Iterator
+from storage.base import InventoryEntry, StorageBackend
+from storage.transfer import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE, RangeWriter, byte_ranges, iter_parts, map_bounded
 from google.cloud import storage
 
+# A compose request accepts at most 32 source objects.
+MAX_COMPOSE_SOURCES = 32
+# Name boundaries that split a bucket into ranges listed concurrently.
+INVENTORY_BOUNDARIES = "123456789abcdef"
+# A JSON API batch request carries at most 100 calls.
+MAX_DELETE_BATCH = 100
+
 class GCSStorage(StorageBackend):
     """
     Google Cloud Storage backend for session data.
@@ -19,6 +28,72 @@ class GCSStorage(StorageBackend):
         blob.upload_from_string(encrypted_data)
         return f"gcs://{self.bucket_name}/{session_id}"
 
+    def upload_stream(
+        self,
+        session_id: str,
+        source,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> str:
+        """
+        Uploads session data from a stream as a parallel composite upload.
+
+        Parts are uploaded concurrently as temporary objects and then
+        composed into the final object, 32 at a time, after which the
+        temporary objects are deleted. A source that fits in one part is
+        uploaded directly. Composite objects carry a CRC32C but no MD5.
+
+        Args:
+            session_id: The ID of the session.
+            source: A file-like object, bytes or an iterable of bytes.
+            part_size: The size of each part.
+            max_concurrency: The number of parts uploaded in parallel.
+
+        Returns:
+            The locator of the uploaded object.
+        """
+        parts = iter_parts(source, part_size)
+        first = next(parts, b"")
+        second = next(parts, None)
+        if second is None:
+            self.bucket.blob(session_id).upload_from_string(first)
+            return f"gcs://{self.bucket_name}/{session_id}"
+
+        prefix = f"{session_id}.parts/"
+
+        def upload_part(index: int, body: bytes) -> storage.Blob:
+            blob = self.bucket.blob(f"{prefix}{index:06d}")
+            blob.upload_from_string(body)
+            return blob
+
+        def all_parts():
+            yield first
+            yield second
+            yield from parts
+
+        temporary = []
+        try:
+            components = map_bounded(upload_part, all_parts(), max_concurrency)
+            temporary.extend(components)
+            level = 0
+            while len(components) > MAX_COMPOSE_SOURCES:
+                merged = []
+                for start in range(0, len(components), MAX_COMPOSE_SOURCES):
+                    blob = self.bucket.blob(f"{prefix}compose-{level}-{start:06d}")
+                    blob.compose(components[start:start + MAX_COMPOSE_SOURCES])
+                    merged.append(blob)
+                temporary.extend(merged)
+                components = merged
+                level += 1
+            self.bucket.blob(session_id).compose(components)
+        finally:
+            for blob in temporary:
+                try:
+                    blob.delete()
+                except Exception:
+                    pass
+        return f"gcs://{self.bucket_name}/{session_id}"
+
     def download(self, locator: str) -> bytes:
         """
         Downloads data from GCS.
@@ -27,6 +102,44 @@ class GCSStorage(StorageBackend):
         blob = self.bucket.blob(blob_name)
         return blob.download_as_bytes()
 
+    def download_into(
+        self,
+        locator: str,
+        target,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> int:
+        """
+        Downloads an object with parallel ranged reads into a preallocated target.
+
+        Args:
+            locator: The locator of the object.
+            target: A path, an open file or a writable buffer at least as
+                    large as the object.
+            part_size: The size of each ranged request.
+            max_concurrency: The number of ranges fetched in parallel.
+
+        Returns:
+            The object size in bytes.
+        """
+        blob_name = locator.replace(f"gcs://{self.bucket_name}/", "")
+        blob = self.bucket.get_blob(blob_name)
+        if blob is None:
+            raise FileNotFoundError(locator)
+        size, generation = blob.size, blob.generation
+
+        with RangeWriter(target, size) as writer:
+            def fetch(index: int, byte_range: tuple[int, int]) -> None:
+                start, end = byte_range
+                # Pinning the generation keeps every range from the same object version
+                data = blob.download_as_bytes(start=start, end=end, if_generation_match=generation)
+                if len(data) != end - start + 1:
+                    raise IOError(f"Short read for bytes {start}-{end} of {locator}.")
+                writer.write(start, data)
+
+            map_bounded(fetch, byte_ranges(size, part_size), max_concurrency)
+        return size
+
     def delete(self, locator: str) -> bool:
         """
         Deletes data from GCS.
@@ -39,9 +152,51 @@ class GCSStorage(StorageBackend):
         except Exception:
             return False
 
+    def delete_many(self, locators: list[str]) -> list[str]:
+        """
+        Deletes blobs with batched JSON API requests of up to 100 calls.
+        A batch that fails is retried one blob at a time to find the
+        failures.
+
+        Returns:
+            The locators that could not be deleted.
+        """
+        failed = []
+        for start in range(0, len(locators), MAX_DELETE_BATCH):
+            batch = locators[start:start + MAX_DELETE_BATCH]
+            try:
+                with self.storage_client.batch():
+                    for locator in batch:
+                        self.bucket.blob(locator.replace(f"gcs://{self.bucket_name}/", "")).delete()
+            except Exception:
+                failed.extend(super().delete_many(batch))
+        return failed
+
     def list_all(self) -> list[str]:
         """
         Lists all locators in the GCS bucket.
         """
         blobs = self.storage_client.list_blobs(self.bucket_name)
         return [f"gcs://{self.bucket_name}/{blob.name}" for blob in blobs]
+
+    def inventory_partitions(self) -> list[tuple]:
+        """
+        Splits the bucket into contiguous name ranges. Together they cover
+        every possible name, whatever the session IDs look like.
+        """
+        bounds = [None, *INVENTORY_BOUNDARIES, None]
+        return list(zip(bounds, bounds[1:]))
+
+    def scan_inventory(self, partition=None) -> Iterator[InventoryEntry]:
+        """
+        Yields the blobs in one name range, page by page.
+        """
+        start, end = partition or (None, None)
+        blobs = self.storage_client.list_blobs(self.bucket_name, start_offset=start, end_offset=end)
+        for blob in blobs:
+            yield InventoryEntry(
+                f"gcs://{self.bucket_name}/{blob.name}",
+                blob.size,
+                blob.md5_hash or blob.crc32c,
+                blob.updated.timestamp() if blob.updated else None,
+            )
@@ -0,0 +1,304 @@
+"""
+Circuit breakers and health scores for storage backends.
+
+Each backend gets a circuit breaker and exponentially weighted moving
+averages of its latency and error rate. A backend that keeps failing has
+its circuit opened and is skipped without being called, instead of
+costing every request a full timeout; after a cool-down a limited number
+of probe calls are let through, and the circuit closes again once one
+succeeds. The averages order backends so reads and failover writes go to
+the fastest, most reliable backend first.
+"""
+
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(IOError):
+    """
+    Raised instead of calling a backend whose circuit is open.
+    """
+
+class CircuitBreaker:
+    """
+    A thread-safe three-state circuit breaker.
+
+    The circuit opens after `failure_threshold` consecutive failures.
+    While open, calls are rejected until `reset_timeout` seconds have
+    passed; it then turns half-open and admits up to `half_open_max_calls`
+    concurrent probes. A successful probe closes the circuit, a failed one
+    opens it again for another `reset_timeout`.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("Failure threshold must be at least 1.")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """
+        Returns the current state. An open circuit whose cool-down has
+        passed reports as half-open.
+        """
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Returns True if a call may proceed. A True result in the half-open
+        state reserves a probe slot, so the caller must report the outcome
+        with `record_success` or `record_failure`.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+                self._probes = 0
+            if self._probes >= self.half_open_max_calls:
+                return False
+            self._probes += 1
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probes = 0
+
+class RecordOnce:
+    """
+    Lets only the first of several parties record the outcome of a call,
+    such as the call itself and a caller that gave up waiting for it.
+    """
+
+    def __init__(self):
+        self._claimed = False
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        """
+        Returns True the first time it is called, False afterwards.
+        """
+        with self._lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
+
+class BackendHealth:
+    """
+    The circuit breaker and latency and error-rate averages of one backend.
+    """
+
+    # Seconds of expected latency charged per unit of error rate, so a
+    # backend failing half its calls ranks behind one that is 0.5s slower.
+    ERROR_PENALTY = 1.0
+
+    def __init__(self, name: str, alpha: float = 0.2, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.alpha = alpha
+        self.breaker = breaker or CircuitBreaker()
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.rejections = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: Optional[float], ok: bool) -> None:
+        """
+        Records the outcome of a call and updates the breaker.
+
+        Args:
+            seconds: The call's duration, or None if it is unknown, e.g.
+                     for a call abandoned after a timeout.
+            ok: Whether the call succeeded.
+        """
+        with self._lock:
+            if seconds is not None:
+                if self.latency_ewma is None:
+                    self.latency_ewma = seconds
+                else:
+                    self.latency_ewma = self.alpha * seconds + (1 - self.alpha) * self.latency_ewma
+            self.error_ewma = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_ewma
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def available(self) -> bool:
+        """
+        Returns True unless the circuit is open. Does not reserve a probe.
+        """
+        return self.breaker.state != OPEN
+
+    def score(self, latency: Optional[float] = None) -> float:
+        """
+        Returns the expected cost of a call in seconds; lower is better.
+        Backends without samples score 0 so that they get probed.
+
+        Args:
+            latency: A latency estimate to use instead of the overall
+                     average, such as a read-only average.
+        """
+        if latency is None:
+            latency = self.latency_ewma
+        return (latency or 0.0) + self.error_ewma * self.ERROR_PENALTY
+
+    def call(self, func: Callable[[], T], once: Optional[RecordOnce] = None) -> T:
+        """
+        Runs `func` through the breaker, recording its latency and outcome.
+
+        Args:
+            func: The call to make.
+            once: If given, the outcome is only recorded if `once` has not
+                  been claimed yet, e.g. by a caller that charged the call
+                  a timeout.
+
+        Raises:
+            CircuitOpenError: If the circuit is open; `func` is not called.
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejections += 1
+            raise CircuitOpenError(f"Circuit open for storage backend {self.name}")
+        start = time.monotonic()
+        try:
+            result = func()
+        except Exception:
+            if once is None or once.claim():
+                self.record(time.monotonic() - start, False)
+            raise
+        if once is None or once.claim():
+            self.record(time.monotonic() - start, True)
+        return result
+
+    async def call_async(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Awaits `func()` through the breaker, like `call`.
+
+        Raises:
+            CircuitOpenError: If the circuit is open; `func` is not called.
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejections += 1
+            raise CircuitOpenError(f"Circuit open for storage backend {self.name}")
+        start = time.monotonic()
+        try:
+            result = await func()
+        except Exception:
+            self.record(time.monotonic() - start, False)
+            raise
+        self.record(time.monotonic() - start, True)
+        return result
+
+    def snapshot(self) -> dict:
+        """
+        Returns the health figures for reporting.
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.breaker.state,
+                "latency_ms": (self.latency_ewma or 0.0) * 1000,
+                "error_rate": self.error_ewma,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejections": self.rejections,
+            }
+
+class HealthTracker:
+    """
+    Health of a fixed list of backends, addressed by index.
+    """
+
+    def __init__(self, names: list[str], previous: Optional["HealthTracker"] = None, **breaker_options):
+        """
+        Args:
+            names: A display name per backend.
+            previous: A tracker whose entries are kept for backends with the
+                      same name, so health survives topology changes.
+            breaker_options: Passed to each backend's `CircuitBreaker`.
+        """
+        known = {health.name: health for health in previous.backends} if previous else {}
+        self.backends = [
+            known.get(name) or BackendHealth(name, breaker=CircuitBreaker(**breaker_options)) for name in names
+        ]
+
+    def __getitem__(self, index: int) -> BackendHealth:
+        return self.backends[index]
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def order(self, indices=None, latency: Optional[Callable[[int], Optional[float]]] = None) -> list[int]:
+        """
+        Returns the available backends, best first, skipping those whose
+        circuit is open.
+
+        Args:
+            indices: The candidate backend indices; defaults to all.
+            latency: Optional per-index latency estimate to score with.
+        """
+        if indices is None:
+            indices = range(len(self.backends))
+        available = [i for i in indices if self.backends[i].available()]
+        return sorted(
+            available,
+            key=lambda i: self.backends[i].score(None if latency is None else latency(i)),
+        )
+
+    def snapshot(self) -> list[dict]:
+        return [health.snapshot() for health in self.backends]
+
+def backend_name(backend) -> str:
+    """
+    Returns a readable name for a backend instance.
+    """
+    if getattr(backend, "backend_id", None):
+        return backend.backend_id
+    name = type(backend).__name__
+    for attribute in ("bucket_name", "base_path"):
+        value = getattr(backend, attribute, None)
+        if value:
+            return f"{name}:{value}"
+    return name
@@ -0,0 +1,359 @@
+"""
+A persistent local index of the objects held by each storage backend.
+
+Listing a bucket is slow and is the only way a backend can tell what it
+holds, so the index records every object as it is uploaded or deleted and
+answers existence, placement and listing queries with local lookups. A
+reconciliation scan lists the backends, one keyspace partition per thread,
+and brings the index back in line with objects written or removed behind
+its back.
+"""
+
+import argparse
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from storage.base import InventoryEntry, StorageBackend
+
+log = logging.getLogger(__name__)
+
+# Rows written per transaction during a reconciliation scan.
+RECONCILE_BATCH_SIZE = 1000
+RECORD_COLUMNS = "backend, locator, size, checksum, etag, seen_at, modified"
+
+@dataclass(frozen=True)
+class InventoryRecord:
+    """One indexed object."""
+    backend: str
+    locator: str
+    size: Optional[int]
+    checksum: Optional[str]
+    etag: Optional[str]
+    seen_at: float
+    # When the object was last modified according to the backend, or when
+    # the index first saw it if the backend does not say. Unlike seen_at it
+    # is not moved forward by rescans.
+    modified: Optional[float] = None
+
+@dataclass
+class ReconcileReport:
+    """The outcome of a reconciliation scan."""
+    scanned: int = 0
+    added: int = 0
+    removed: int = 0
+    partitions: int = 0
+
+def _prefix_end(prefix: str) -> Optional[str]:
+    """
+    Returns the smallest string greater than every string starting with
+    `prefix`, or None if there is none.
+    """
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+class InventoryIndex:
+    """
+    A SQLite index of locator -> backend, size and checksum.
+
+    `checksum` is the SHA-256 of the data when it was uploaded through
+    `IndexedStorage`; `etag` is whatever native checksum the backend
+    reported during the last scan (an S3 ETag, a GCS MD5, ...). All methods
+    are thread-safe.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "backend TEXT NOT NULL, locator TEXT NOT NULL, size INTEGER, checksum TEXT, etag TEXT, "
+            "seen_at REAL NOT NULL, modified REAL, PRIMARY KEY (backend, locator))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(objects)")}
+        if "modified" not in columns:
+            # Indexes created before objects were dated; rows are dated by
+            # their next scan
+            self._conn.execute("ALTER TABLE objects ADD COLUMN modified REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS objects_locator ON objects (locator)")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def record(self, backend: str, locator: str, size: Optional[int] = None, checksum: Optional[str] = None) -> None:
+        """
+        Records an object as present on a backend, dated now.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects (backend, locator, size, checksum, etag, seen_at, modified) "
+                "VALUES (?, ?, ?, ?, NULL, ?, ?)",
+                (backend, locator, size, checksum, now, now),
+            )
+
+    def remove(self, backend: str, locator: str) -> bool:
+        """
+        Forgets an object. Returns True if it was indexed.
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM objects WHERE backend = ? AND locator = ?", (backend, locator))
+            return cursor.rowcount > 0
+
+    def remove_many(self, backend: str, locators: list[str]) -> int:
+        """
+        Forgets several objects in one transaction. Returns how many were indexed.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.executemany(
+                    "DELETE FROM objects WHERE backend = ? AND locator = ?", [(backend, l) for l in locators]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+    def records(self, backend: str) -> list[InventoryRecord]:
+        """
+        Returns every indexed object of a backend.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {RECORD_COLUMNS} FROM objects WHERE backend = ? ORDER BY locator",
+                (backend,),
+            ).fetchall()
+        return [InventoryRecord(*row) for row in rows]
+
+    def get(self, backend: str, locator: str) -> Optional[InventoryRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {RECORD_COLUMNS} FROM objects WHERE backend = ? AND locator = ?",
+                (backend, locator),
+            ).fetchone()
+        return InventoryRecord(*row) if row else None
+
+    def exists(self, locator: str, backend: Optional[str] = None) -> bool:
+        """
+        Returns True if the locator is indexed, on `backend` if given.
+        """
+        if backend is not None:
+            return self.get(backend, locator) is not None
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM objects WHERE locator = ? LIMIT 1", (locator,)).fetchone()
+        return row is not None
+
+    def placement(self, locator: str) -> list[InventoryRecord]:
+        """
+        Returns every backend holding the locator.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {RECORD_COLUMNS} FROM objects WHERE locator = ? ORDER BY backend",
+                (locator,),
+            ).fetchall()
+        return [InventoryRecord(*row) for row in rows]
+
+    def list_prefix(self, backend: str, prefix: str = "") -> list[str]:
+        """
+        Lists the indexed locators of a backend that start with `prefix`,
+        in sorted order, using a range scan of the primary key.
+        """
+        end = _prefix_end(prefix)
+        query = "SELECT locator FROM objects WHERE backend = ? AND locator >= ?"
+        params = [backend, prefix]
+        if end is not None:
+            query += " AND locator < ?"
+            params.append(end)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY locator", params).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self, backend: Optional[str] = None) -> int:
+        with self._lock:
+            if backend is None:
+                return self._conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM objects WHERE backend = ?", (backend,)).fetchone()[0]
+
+    def backends(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT backend FROM objects ORDER BY backend")]
+
+    def _apply_scan(self, backend: str, entries: list[InventoryEntry], seen_at: float) -> None:
+        """
+        Upserts a batch of scanned objects. The upload-time checksum is kept
+        unless the object's size changed, in which case it is stale. The
+        modification time reported by the backend replaces the stored one;
+        without one, the stored date is kept, or the scan time is used for
+        objects not dated yet.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO objects (backend, locator, size, checksum, etag, seen_at, modified) "
+                    "VALUES (:backend, :locator, :size, NULL, :etag, :seen_at, COALESCE(:modified, :seen_at)) "
+                    "ON CONFLICT (backend, locator) DO UPDATE SET "
+                    "checksum = CASE WHEN excluded.size IS NULL OR objects.size IS excluded.size "
+                    "THEN objects.checksum ELSE NULL END, "
+                    "size = COALESCE(excluded.size, objects.size), etag = excluded.etag, seen_at = excluded.seen_at, "
+                    "modified = COALESCE(:modified, objects.modified, :seen_at)",
+                    [
+                        {"backend": backend, "locator": e.locator, "size": e.size, "etag": e.etag,
+                         "seen_at": seen_at, "modified": e.modified}
+                        for e in entries
+                    ],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def reconcile(self, backend_id: str, backend: StorageBackend, max_workers: int = 8) -> ReconcileReport:
+        """
+        Rescans a backend and makes the index match it.
+
+        The backend's keyspace partitions are listed concurrently and
+        upserted in batches. Only once every partition has been listed are
+        rows that the scan did not see removed; rows recorded after the
+        scan started are kept, so uploads racing the scan are not lost. An
+        object deleted while its partition is being listed may be re-added
+        and is dropped by the next scan. If any partition fails, nothing is
+        removed and the error is raised.
+
+        Returns:
+            A report of what changed.
+        """
+        report = ReconcileReport()
+        before = self.count(backend_id)
+        started = time.time()
+        partitions = backend.inventory_partitions()
+        report.partitions = len(partitions)
+
+        def scan(partition) -> int:
+            scanned = 0
+            batch = []
+            for entry in backend.scan_inventory(partition):
+                batch.append(entry)
+                if len(batch) >= RECONCILE_BATCH_SIZE:
+                    self._apply_scan(backend_id, batch, started)
+                    scanned += len(batch)
+                    batch = []
+            if batch:
+                self._apply_scan(backend_id, batch, started)
+                scanned += len(batch)
+            return scanned
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(partitions))),
+                                thread_name_prefix="inventory") as executor:
+            report.scanned = sum(executor.map(scan, partitions))
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM objects WHERE backend = ? AND seen_at < ?", (backend_id, started)
+            )
+            report.removed = cursor.rowcount
+        report.added = self.count(backend_id) - (before - report.removed)
+        log.info(f"Reconciled inventory of {backend_id}: {report}")
+        return report
+
+class IndexedStorage(StorageBackend):
+    """
+    Keeps an `InventoryIndex` up to date for a wrapped backend.
+
+    Uploads and deletes are recorded as they happen, and `list_all`,
+    `list_prefix` and `exists` are answered from the index instead of
+    listing the backend. Run `reconcile()` periodically to pick up changes
+    made by other writers.
+    """
+
+    def __init__(self, backend: StorageBackend, index: InventoryIndex, backend_id: str):
+        self.backend = backend
+        self.index = index
+        self.backend_id = backend_id
+
+    def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        """
+        Uploads to the wrapped backend and indexes the new object.
+        """
+        locator = self.backend.upload(session_id, encrypted_data)
+        self.index.record(self.backend_id, locator, len(encrypted_data), hashlib.sha256(encrypted_data).hexdigest())
+        return locator
+
+    def download(self, locator: str) -> bytes:
+        return self.backend.download(locator)
+
+    def delete(self, locator: str) -> bool:
+        """
+        Deletes from the wrapped backend and drops the index entry.
+        """
+        deleted = self.backend.delete(locator)
+        if deleted:
+            self.index.remove(self.backend_id, locator)
+        return deleted
+
+    def delete_many(self, locators: list[str]) -> list[str]:
+        """
+        Bulk-deletes from the wrapped backend and drops the deleted entries.
+        """
+        failed = self.backend.delete_many(locators)
+        if len(failed) < len(locators):
+            not_deleted = set(failed)
+            self.index.remove_many(self.backend_id, [l for l in locators if l not in not_deleted])
+        return failed
+
+    def exists(self, locator: str) -> bool:
+        return self.index.exists(locator, self.backend_id)
+
+    def list_all(self) -> list[str]:
+        """
+        Lists all indexed locators of the backend.
+        """
+        return self.index.list_prefix(self.backend_id)
+
+    def list_prefix(self, prefix: str) -> list[str]:
+        return self.index.list_prefix(self.backend_id, prefix)
+
+    def inventory_partitions(self) -> list:
+        return self.backend.inventory_partitions()
+
+    def scan_inventory(self, partition=None) -> Iterator[InventoryEntry]:
+        return self.backend.scan_inventory(partition)
+
+    def reconcile(self, max_workers: int = 8) -> ReconcileReport:
+        return self.index.reconcile(self.backend_id, self.backend, max_workers)
+
+if __name__ == "__main__":
+    from storage.factory import StorageFactory
+    from storage.topology import backend_id
+
+    parser = argparse.ArgumentParser(description="Rebuild the storage inventory index from the configured backends.")
+    parser.add_argument("config", help="Storage configuration file (JSON or YAML)")
+    parser.add_argument("index", help="Path of the inventory database")
+    parser.add_argument("--workers", type=int, default=8, help="Partitions listed in parallel per backend")
+    args = parser.parse_args()
+
+    factory = StorageFactory()
+    entries, pool = factory.read_config(args.config)
+    index = InventoryIndex(args.index)
+    try:
+        for entry in entries:
+            report = index.reconcile(backend_id(entry), factory.create_backend(entry, pool), args.workers)
+            print(f"{backend_id(entry)}: {report.scanned} objects, {report.added} added, {report.removed} removed")
+    finally:
+        index.close()
@@ -1,52 +1,351 @@
+import argparse
+import hashlib
+import io
+import mmap
 import os
+import tempfile
 import uuid
-from storage.base import StorageBackend
+from contextlib import contextmanager
+from typing import Iterator
+from storage.base import InventoryEntry, StorageBackend
+
+SESSION_SUFFIX = ".session"
+STREAM_CHUNK_SIZE = 1024 * 1024
 
 class LocalNetworkStorage(StorageBackend):
     """
     A storage backend that saves data to a local network share.
+
+    Files live under two levels of directories named after the first four
+    hex digits of the SHA-256 of their locator, e.g.
+    `<base>/3f/a2/<locator>.session`, so no directory grows beyond a few
+    thousand entries even with millions of objects. Files left in the flat
+    layout of older versions are still read, listed and deleted, and can be
+    moved with `migrate_flat_layout()`.
     """
 
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, durable: bool = True):
+        """
+        Args:
+            base_path: The root directory of the store.
+            durable: Whether to fsync files and directories on upload, so an
+                     acknowledged upload survives a crash or power loss.
+        """
         self.base_path = base_path
+        self.durable = durable
         if not os.path.exists(self.base_path):
             os.makedirs(self.base_path)
 
+    @staticmethod
+    def _shard(locator: str) -> tuple[str, str]:
+        digest = hashlib.sha256(locator.encode()).hexdigest()
+        return digest[:2], digest[2:4]
+
+    @staticmethod
+    def _check_locator(locator: str) -> None:
+        """
+        Rejects locators that could address a file outside the store.
+
+        Raises:
+            ValueError: If the locator is empty or contains a path separator
+                        or "..".
+        """
+        if not locator or ".." in locator or any(sep in locator for sep in (os.sep, os.altsep, "/") if sep):
+            raise ValueError(f"Invalid locator: {locator!r}")
+
+    def _path(self, locator: str) -> str:
+        """
+        Returns the sharded path of a locator.
+        """
+        self._check_locator(locator)
+        return os.path.join(self.base_path, *self._shard(locator), f"{locator}{SESSION_SUFFIX}")
+
+    def _flat_path(self, locator: str) -> str:
+        self._check_locator(locator)
+        return os.path.join(self.base_path, f"{locator}{SESSION_SUFFIX}")
+
+    def _existing_path(self, locator: str) -> str:
+        """
+        Returns the path holding a locator, preferring the sharded layout.
+        """
+        path = self._path(locator)
+        if not os.path.exists(path):
+            flat_path = self._flat_path(locator)
+            if os.path.exists(flat_path):
+                return flat_path
+        return path
+
+    @staticmethod
+    def _fsync_dir(path: str) -> None:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        """
+        Writes a file via a temporary file and rename, so readers never see
+        a partial file and a crash leaves either the old or the new content.
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.durable:
+            self._fsync_dir(directory)
+
     def upload(self, session_id: str, encrypted_data: bytes) -> str:
         """
         Uploads session data to the local network share.
         """
         locator = str(uuid.uuid4())
-        file_path = os.path.join(self.base_path, f"{locator}.session")
-        with open(file_path, "wb") as f:
-            f.write(encrypted_data)
+        self._write_atomic(self._path(locator), encrypted_data)
         return locator
 
+    def exists(self, locator: str) -> bool:
+        """
+        Returns True if the share holds data for the locator.
+        """
+        return os.path.exists(self._existing_path(locator))
+
     def download(self, locator: str) -> bytes:
         """
         Downloads data from the local network share.
         """
-        file_path = os.path.join(self.base_path, f"{locator}.session")
-        with open(file_path, "rb") as f:
+        with open(self._existing_path(locator), "rb") as f:
             return f.read()
 
+    @contextmanager
+    def open_mapped(self, locator: str) -> Iterator[memoryview]:
+        """
+        Maps a session file read-only and yields a memoryview over it.
+
+        The data is paged in by the kernel on access and never copied into
+        a Python object. The view must not be used after the block exits.
+        """
+        with open(self._existing_path(locator), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                # Empty files cannot be mapped
+                yield memoryview(b"")
+                return
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        try:
+            yield view
+        finally:
+            view.release()
+            mapping.close()
+
+    def iter_chunks(self, locator: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[memoryview]:
+        """
+        Yields a session file as memoryview slices of its mapping.
+
+        Each slice is only valid until the next one is requested, so a
+        consumer must finish with (or copy) a chunk before advancing.
+        """
+        with self.open_mapped(locator) as view:
+            for start in range(0, len(view), chunk_size):
+                chunk = view[start:start + chunk_size]
+                try:
+                    yield chunk
+                finally:
+                    chunk.release()
+
+    def download_into(self, locator: str, target) -> int:
+        """
+        Downloads a session file into a caller-provided target without
+        intermediate Python objects.
+
+        Args:
+            locator: The unique locator for the data.
+            target: A writable buffer at least as large as the file, which
+                    is filled with readinto and can be reused across calls;
+                    an object with a file descriptor (a file or socket),
+                    which receives the data with os.sendfile; or any other
+                    writable stream, such as io.BytesIO, written in chunks.
+
+        Returns:
+            The number of bytes written.
+        """
+        try:
+            fd = target.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            fd = None
+        with open(self._existing_path(locator), "rb", buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            if fd is not None:
+                if hasattr(target, "flush"):
+                    target.flush()
+                return _sendfile(fd, f.fileno(), size)
+            if hasattr(target, "write"):
+                return _copy_to_stream(f, target)
+
+            view = memoryview(target).cast("B")
+            if len(view) < size:
+                raise ValueError(f"Buffer of {len(view)} bytes cannot hold {size} bytes.")
+            read = 0
+            while read < size:
+                count = f.readinto(view[read:size])
+                if not count:
+                    raise IOError(f"Unexpected end of file for {locator}.")
+                read += count
+            return read
+
     def delete(self, locator: str) -> bool:
         """
         Deletes data from the local network share.
         """
         try:
-            file_path = os.path.join(self.base_path, f"{locator}.session")
-            os.remove(file_path)
+            os.remove(self._existing_path(locator))
             return True
         except FileNotFoundError:
             return False
 
+    def iter_all(self) -> Iterator[str]:
+        """
+        Yields all locators in the local network share without building a
+        list, walking the shard directories with os.scandir.
+        """
+        with os.scandir(self.base_path) as top:
+            for first in top:
+                if first.is_dir(follow_symlinks=False):
+                    with os.scandir(first.path) as middle:
+                        for second in middle:
+                            if second.is_dir(follow_symlinks=False):
+                                yield from _scan_locators(second.path)
+                elif first.name.endswith(SESSION_SUFFIX):
+                    yield first.name[:-len(SESSION_SUFFIX)]
+
     def list_all(self) -> list[str]:
         """
         Lists all locators in the local network share.
         """
-        locators = []
-        for filename in os.listdir(self.base_path):
-            if filename.endswith(".session"):
-                locators.append(filename.replace(".session", ""))
-        return locators
+        return list(self.iter_all())
+
+    def inventory_partitions(self) -> list[str]:
+        """
+        Partitions the store by top-level shard directory; the empty
+        partition holds files left in the flat layout.
+        """
+        with os.scandir(self.base_path) as top:
+            return [""] + sorted(entry.name for entry in top if entry.is_dir(follow_symlinks=False))
+
+    def scan_inventory(self, partition=None) -> Iterator[InventoryEntry]:
+        """
+        Yields the files of one top-level shard directory with their sizes,
+        or of the whole store if no partition is given.
+        """
+        if partition is None:
+            for name in self.inventory_partitions():
+                yield from self.scan_inventory(name)
+        elif partition == "":
+            yield from _scan_entries(self.base_path)
+        else:
+            with os.scandir(os.path.join(self.base_path, partition)) as middle:
+                for second in middle:
+                    if second.is_dir(follow_symlinks=False):
+                        yield from _scan_entries(second.path)
+
+    def migrate_flat_layout(self) -> int:
+        """
+        Moves files from the flat layout into their shard directories.
+
+        Each file is renamed, which is atomic within a filesystem, so the
+        store stays readable throughout and the migration can be rerun
+        after an interruption.
+
+        Returns:
+            The number of files moved.
+        """
+        moved = 0
+        touched = set()
+        with os.scandir(self.base_path) as entries:
+            flat = [entry.name for entry in entries if entry.is_file() and entry.name.endswith(SESSION_SUFFIX)]
+        for name in flat:
+            locator = name[:-len(SESSION_SUFFIX)]
+            target = self._path(locator)
+            directory = os.path.dirname(target)
+            os.makedirs(directory, exist_ok=True)
+            os.replace(os.path.join(self.base_path, name), target)
+            touched.add(directory)
+            moved += 1
+        if self.durable and moved:
+            for directory in touched:
+                self._fsync_dir(directory)
+            self._fsync_dir(self.base_path)
+        return moved
+
+def _sendfile(out_fd: int, in_fd: int, size: int) -> int:
+    """
+    Copies `size` bytes between descriptors in the kernel, falling back to
+    a buffered copy where sendfile does not support the descriptors.
+    """
+    sent = 0
+    try:
+        while sent < size:
+            count = os.sendfile(out_fd, in_fd, sent, size - sent)
+            if count == 0:
+                break
+            sent += count
+        return sent
+    except OSError:
+        if sent:
+            raise
+    buffer = bytearray(STREAM_CHUNK_SIZE)
+    view = memoryview(buffer)
+    os.lseek(in_fd, 0, os.SEEK_SET)
+    while sent < size:
+        count = os.readv(in_fd, [view[:min(len(view), size - sent)]])
+        if not count:
+            break
+        written = 0
+        while written < count:
+            written += os.write(out_fd, view[written:count])
+        sent += count
+    return sent
+
+def _copy_to_stream(f, target) -> int:
+    """
+    Copies an open file into a writable stream through one reused buffer.
+    """
+    buffer = bytearray(STREAM_CHUNK_SIZE)
+    view = memoryview(buffer)
+    written = 0
+    while True:
+        count = f.readinto(buffer)
+        if not count:
+            return written
+        target.write(view[:count])
+        written += count
+
+def _scan_locators(path: str) -> Iterator[str]:
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.endswith(SESSION_SUFFIX) and not entry.name.startswith("."):
+                yield entry.name[:-len(SESSION_SUFFIX)]
+
+def _scan_entries(path: str) -> Iterator[InventoryEntry]:
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.endswith(SESSION_SUFFIX) and not entry.name.startswith(".") and entry.is_file():
+                stat = entry.stat()
+                yield InventoryEntry(entry.name[:-len(SESSION_SUFFIX)], stat.st_size, modified=stat.st_mtime)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a flat local session store to the sharded layout.")
+    parser.add_argument("base_path", help="Root directory of the local store")
+    args = parser.parse_args()
+    count = LocalNetworkStorage(args.base_path).migrate_flat_layout()
+    print(f"Moved {count} session files into the sharded layout.")
@@ -1,5 +1,15 @@
 import uuid
-from storage.base import StorageBackend
+from typing import Iterator
+from storage.base import InventoryEntry, StorageBackend
+from storage.transfer import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE, RangeWriter, byte_ranges, iter_parts, map_bounded
+
+# S3 rejects multipart parts below 5 MiB, except the last one.
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+READ_BUFFER_SIZE = 1024 * 1024
+# DeleteObjects accepts at most 1000 keys per request.
+MAX_DELETE_BATCH = 1000
+KEY_PREFIX = "tsm_sessions/"
 
 class S3Storage(StorageBackend):
     """
@@ -20,6 +30,69 @@ class S3Storage(StorageBackend):
         )
         return locator
 
+    def upload_stream(
+        self,
+        session_id: str,
+        source,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> str:
+        """
+        Uploads session data from a stream with a parallel multipart upload.
+
+        At most `max_concurrency` parts are read ahead and uploading at once,
+        so memory use stays around (max_concurrency + 1) * part_size no matter
+        how large the object is. A source that fits in one part is sent with
+        a single put_object. The multipart upload is aborted on failure.
+
+        Args:
+            session_id: The ID of the session.
+            source: A file-like object, bytes or an iterable of bytes.
+            part_size: The size of each part, at least 5 MiB.
+            max_concurrency: The number of parts uploaded in parallel.
+
+        Returns:
+            The locator of the uploaded object.
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError("S3 multipart parts must be at least 5 MiB.")
+        locator = f"tsm_sessions/{uuid.uuid4()}.session"
+        parts = iter_parts(source, part_size)
+        first = next(parts, b"")
+        second = next(parts, None)
+        if second is None:
+            self.s3_client.put_object(Bucket=self.bucket_name, Key=locator, Body=first)
+            return locator
+
+        upload_id = self.s3_client.create_multipart_upload(
+            Bucket=self.bucket_name, Key=locator
+        )["UploadId"]
+
+        def upload_part(index: int, body: bytes) -> dict:
+            if index >= MAX_PARTS:
+                raise ValueError(f"Object needs more than {MAX_PARTS} parts; increase the part size.")
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket_name, Key=locator, UploadId=upload_id,
+                PartNumber=index + 1, Body=body,
+            )
+            return {"PartNumber": index + 1, "ETag": response["ETag"]}
+
+        def all_parts():
+            yield first
+            yield second
+            yield from parts
+
+        try:
+            completed = map_bounded(upload_part, all_parts(), max_concurrency)
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=locator, UploadId=upload_id,
+                MultipartUpload={"Parts": completed},
+            )
+        except BaseException:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=locator, UploadId=upload_id)
+            raise
+        return locator
+
     def download(self, locator: str) -> bytes:
         """
         Downloads data from S3.
@@ -27,6 +100,46 @@ class S3Storage(StorageBackend):
         response = self.s3_client.get_object(Bucket=self.bucket_name, Key=locator)
         return response["Body"].read()
 
+    def download_into(
+        self,
+        locator: str,
+        target,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> int:
+        """
+        Downloads an object with parallel ranged GETs into a preallocated target.
+
+        Args:
+            locator: The key of the object.
+            target: A path, an open file or a writable buffer at least as
+                    large as the object.
+            part_size: The size of each ranged request.
+            max_concurrency: The number of ranges fetched in parallel.
+
+        Returns:
+            The object size in bytes.
+        """
+        head = self.s3_client.head_object(Bucket=self.bucket_name, Key=locator)
+        size, etag = head["ContentLength"], head["ETag"]
+
+        with RangeWriter(target, size) as writer:
+            def fetch(index: int, byte_range: tuple[int, int]) -> None:
+                start, end = byte_range
+                # IfMatch fails the download if the object is replaced midway
+                body = self.s3_client.get_object(
+                    Bucket=self.bucket_name, Key=locator, Range=f"bytes={start}-{end}", IfMatch=etag,
+                )["Body"]
+                offset = start
+                for piece in iter(lambda: body.read(READ_BUFFER_SIZE), b""):
+                    writer.write(offset, piece)
+                    offset += len(piece)
+                if offset != end + 1:
+                    raise IOError(f"Short read for bytes {start}-{end} of {locator}.")
+
+            map_bounded(fetch, byte_ranges(size, part_size), max_concurrency)
+        return size
+
     def delete(self, locator: str) -> bool:
         """
         Deletes data from S3.
@@ -34,14 +147,51 @@ class S3Storage(StorageBackend):
         self.s3_client.delete_object(Bucket=self.bucket_name, Key=locator)
         return True
 
+    def delete_many(self, locators: list[str]) -> list[str]:
+        """
+        Deletes objects with DeleteObjects, 1000 keys per request.
+
+        Returns:
+            The locators that could not be deleted.
+        """
+        failed = []
+        for start in range(0, len(locators), MAX_DELETE_BATCH):
+            batch = locators[start:start + MAX_DELETE_BATCH]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            except Exception:
+                failed.extend(batch)
+                continue
+            failed.extend(error["Key"] for error in response.get("Errors", []))
+        return failed
+
     def list_all(self) -> list[str]:
         """
         Lists all locators in the S3 bucket.
         """
         locators = []
         paginator = self.s3_client.get_paginator("list_objects_v2")
-        pages = paginator.paginate(Bucket=self.bucket_name, Prefix="tsm_sessions/")
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=KEY_PREFIX)
         for page in pages:
             for obj in page.get("Contents", []):
                 locators.append(obj["Key"])
         return locators
+
+    def inventory_partitions(self) -> list[str]:
+        """
+        Splits the bucket by the first hex digit of the UUID in each key,
+        so the 16 prefixes can be paginated concurrently.
+        """
+        return [f"{KEY_PREFIX}{digit:x}" for digit in range(16)]
+
+    def scan_inventory(self, partition=None) -> Iterator[InventoryEntry]:
+        """
+        Yields the objects under one key prefix, page by page.
+        """
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=partition or KEY_PREFIX):
+            for obj in page.get("Contents", []):
+                yield InventoryEntry(obj["Key"], obj["Size"], obj["ETag"].strip('"'), obj["LastModified"].timestamp())
@@ -0,0 +1,291 @@
+"""
+A live, versioned view of the configured storage backends.
+
+The topology is an immutable snapshot that is replaced as a whole
+(copy-on-write) whenever backends are added or removed, whether through
+the API or by editing the configuration file. Readers take the current
+snapshot with a single attribute read and never lock; writers are
+serialized, persist the new configuration atomically and only then
+publish the new snapshot. Backends whose configuration did not change are
+carried over into the new snapshot instead of being rebuilt.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from storage.base import StorageBackend
+from storage.factory import StorageFactory
+from storage.inventory import IndexedStorage, InventoryIndex
+
+log = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class TopologySnapshot:
+    """One immutable version of the storage topology."""
+    version: int
+    configs: tuple
+    backends: tuple
+    cache: Optional[dict] = None  # The file-wide read cache settings
+
+    def find(self, backend_id: str) -> Optional[StorageBackend]:
+        for config, backend in zip(self.configs, self.backends):
+            if config["id"] == backend_id:
+                return backend
+        return None
+
+def backend_id(config: dict) -> str:
+    """
+    Returns the ID of a backend entry: its "id" field, or a stable hash of
+    its settings for entries written without one.
+    """
+    if config.get("id"):
+        return str(config["id"])
+    canonical = json.dumps({k: v for k, v in config.items() if k != "id"}, sort_keys=True, default=str)
+    return f"{config.get('type', 'backend')}-{hashlib.sha256(canonical.encode()).hexdigest()[:8]}"
+
+class StorageTopology:
+    """
+    Owns the storage configuration file and the live backend snapshot.
+    """
+
+    def __init__(
+        self,
+        config_path: str,
+        factory: Optional[StorageFactory] = None,
+        inventory: Optional[InventoryIndex] = None,
+    ):
+        """
+        Args:
+            config_path: The JSON or YAML storage configuration file.
+            factory: Builds backends from configuration entries.
+            inventory: If given, every backend is wrapped in `IndexedStorage`
+                       under its backend ID.
+        """
+        self.config_path = config_path
+        self.factory = factory or StorageFactory()
+        self.inventory = inventory
+        self._write_lock = threading.Lock()
+        self._listeners = []
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._file_shape = "list"
+        self._file_extra = {}
+        self._file_stat = None
+        self.current = TopologySnapshot(0, (), ())
+        with self._write_lock:
+            self._swap(self._load())
+
+    def add_listener(self, listener: Callable[[TopologySnapshot, TopologySnapshot], None]) -> None:
+        """
+        Registers `listener(old, new)`, called after each snapshot swap.
+        """
+        self._listeners.append(listener)
+
+    def _read_file(self) -> tuple[str, dict, list[dict]]:
+        """
+        Reads the configuration file and records that this version of it
+        was seen.
+
+        Returns:
+            The file's layout ("list" or "mapping"), its sections other
+            than "backends", and the backend entries.
+        """
+        stat = os.stat(self.config_path)
+        self._file_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with open(self.config_path, "r") as f:
+            raw = f.read()
+        if self._is_yaml():
+            import yaml
+            data = yaml.safe_load(raw)
+        else:
+            data = json.loads(raw)
+        if isinstance(data, list):
+            return "list", {}, data
+        if isinstance(data, dict) and isinstance(data.get("backends", []), list):
+            return "mapping", {k: v for k, v in data.items() if k != "backends"}, data.get("backends", [])
+        raise ValueError(f"Invalid storage configuration in {self.config_path}")
+
+    def _load(self) -> TopologySnapshot:
+        """
+        Builds a snapshot from the configuration file. Its layout and extra
+        sections are only kept, for writing the file back, once the
+        snapshot has been built. Must be called with the write lock held.
+        """
+        shape, extra, entries = self._read_file()
+        snapshot = self._build(entries, extra)
+        self._file_shape, self._file_extra = shape, extra
+        return snapshot
+
+    def _is_yaml(self) -> bool:
+        return self.config_path.endswith((".yaml", ".yml"))
+
+    def _write_file(self, entries: list[dict]) -> None:
+        """
+        Atomically replaces the configuration file with new entries.
+        """
+        if self._file_shape == "list":
+            data = entries
+        else:
+            data = {**self._file_extra, "backends": entries}
+        directory = os.path.dirname(os.path.abspath(self.config_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                if self._is_yaml():
+                    import yaml
+                    yaml.safe_dump(data, f, sort_keys=False)
+                else:
+                    json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(self.config_path)
+        self._file_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _build(self, entries: list[dict], extra: Optional[dict] = None) -> TopologySnapshot:
+        """
+        Builds the next snapshot for `entries` without publishing it. Must
+        be called with the write lock held.
+
+        Args:
+            entries: The backend entries.
+            extra: The file's other sections, defaulting to the current ones.
+
+        Raises:
+            ValueError: If a backend cannot be built or IDs collide.
+        """
+        extra = self._file_extra if extra is None else extra
+        old = self.current
+        cache = copy.deepcopy(extra.get("cache"))
+        # A changed cache section changes how remote backends are wrapped
+        reusable = {} if cache != old.cache else {
+            config["id"]: (config, backend) for config, backend in zip(old.configs, old.backends)
+        }
+        configs, backends = [], []
+        for entry in entries:
+            config = copy.deepcopy(entry)
+            config["id"] = backend_id(config)
+            if config["id"] in {c["id"] for c in configs}:
+                raise ValueError(f"Duplicate storage backend ID: {config['id']}")
+            previous = reusable.get(config["id"])
+            if previous is not None and previous[0] == config:
+                backend = previous[1]
+            else:
+                backend = self.factory.create_backend(config, extra.get("connection_pool"), cache)
+                if self.inventory is not None:
+                    backend = IndexedStorage(backend, self.inventory, config["id"])
+            configs.append(config)
+            backends.append(backend)
+
+        return TopologySnapshot(old.version + 1, tuple(configs), tuple(backends), cache)
+
+    def _swap(self, new: TopologySnapshot) -> TopologySnapshot:
+        """
+        Publishes a snapshot and notifies the listeners.
+        """
+        old = self.current
+        self.current = new
+        for listener in self._listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                log.error(f"Storage topology listener failed: {e}")
+        return new
+
+    def _entries(self) -> list[dict]:
+        return [copy.deepcopy(config) for config in self.current.configs]
+
+    def add_backend(self, config: dict) -> TopologySnapshot:
+        """
+        Adds a backend, persists the configuration and publishes it.
+
+        Returns:
+            The new snapshot.
+        """
+        with self._write_lock:
+            # Build first so an invalid backend never reaches the file, and
+            # persist before publishing so the file never lags the snapshot
+            snapshot = self._build(self._entries() + [dict(config)])
+            self._write_file(list(snapshot.configs))
+            return self._swap(snapshot)
+
+    def remove_backend(self, backend_id: str) -> TopologySnapshot:
+        """
+        Removes the backends with the given ID, or of the given type if no
+        ID matches, then persists and publishes the configuration.
+
+        Raises:
+            KeyError: If nothing matches.
+        """
+        with self._write_lock:
+            entries = self._entries()
+            remaining = [c for c in entries if c["id"] != backend_id]
+            if len(remaining) == len(entries):
+                remaining = [c for c in entries if c.get("type") != backend_id]
+            if len(remaining) == len(entries):
+                raise KeyError(backend_id)
+            snapshot = self._build(remaining)
+            self._write_file(list(snapshot.configs))
+            return self._swap(snapshot)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Re-reads the configuration file if it changed since it was last
+        read or written.
+
+        Returns:
+            True if a new snapshot was published.
+        """
+        with self._write_lock:
+            try:
+                stat = os.stat(self.config_path)
+            except FileNotFoundError:
+                return False
+            if not force and (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._file_stat:
+                return False
+            try:
+                self._swap(self._load())
+            except Exception as e:
+                # Keep serving the last good topology
+                log.error(f"Ignoring invalid storage configuration: {e}")
+                return False
+            log.info(f"Reloaded storage configuration (version {self.current.version})")
+            return True
+
+    def start_watching(self, interval: float = 2.0) -> None:
+        """
+        Polls the configuration file in a background thread and reloads it
+        when it changes on disk.
+        """
+        if self._watch_thread is not None:
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(
+            target=self._watch_loop, args=(interval,), name="storage-topology-watch", daemon=True
+        )
+        self._watch_thread.start()
+
+    def stop_watching(self) -> None:
+        """
+        Stops the background watcher.
+        """
+        if self._watch_thread is None:
+            return
+        self._watch_stop.set()
+        self._watch_thread.join()
+        self._watch_thread = None
+
+    def _watch_loop(self, interval: float) -> None:
+        while not self._watch_stop.wait(interval):
+            self.reload()
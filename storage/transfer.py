@@ -0,0 +1,143 @@
+"""
+Helpers for streaming, multi-part object transfers.
+
+Uploads read their source one part at a time and keep at most a bounded
+number of parts in flight, so memory use is independent of object size.
+Ranged downloads write each part straight to its offset in a preallocated
+buffer or file.
+"""
+
+import os
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CONCURRENCY = 4
+
+def iter_parts(source, part_size: int) -> Iterator[bytes]:
+    """
+    Yields a source as parts of exactly `part_size` bytes, except the last.
+
+    Args:
+        source: A bytes-like object, a readable file-like object or an
+                iterable of bytes-like pieces of any size.
+        part_size: The size of every part but the last.
+    """
+    if part_size <= 0:
+        raise ValueError("Part size must be positive.")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), part_size):
+            yield bytes(view[start:start + part_size])
+        return
+    if hasattr(source, "read"):
+        while True:
+            part = source.read(part_size)
+            # Streams such as sockets may return short reads before EOF
+            while part and len(part) < part_size:
+                more = source.read(part_size - len(part))
+                if not more:
+                    break
+                part += more
+            if not part:
+                return
+            yield bytes(part)
+            if len(part) < part_size:
+                return
+
+    buffer = bytearray()
+    for piece in source:
+        buffer += piece
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
+def map_bounded(func: Callable, items: Iterable, max_in_flight: int) -> list:
+    """
+    Applies `func(index, item)` on a thread pool with bounded in-flight work.
+
+    Items are pulled from the iterable only when a slot frees up, so a lazy
+    iterable of parts is never read far ahead of the uploads.
+
+    Returns:
+        The results in item order.
+
+    Raises:
+        The first exception raised by `func`; pending calls are cancelled.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="transfer") as executor:
+        pending = {}
+        try:
+            for index, item in enumerate(items):
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_EXCEPTION)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+                pending[executor.submit(func, index, item)] = index
+            for future in list(pending):
+                results[pending.pop(future)] = future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return [results[index] for index in range(len(results))]
+
+def byte_ranges(size: int, part_size: int) -> list[tuple[int, int]]:
+    """
+    Splits an object into inclusive (start, end) byte ranges.
+    """
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+class RangeWriter:
+    """
+    Writes parts of a download at their offsets into a preallocated target.
+
+    The target may be a path, an open file with a file descriptor or a
+    writable buffer such as a bytearray of at least the object size. Files
+    are extended to the object size up front and written with pwrite, so
+    parts can land from several threads in any order.
+    """
+
+    def __init__(self, target, size: int):
+        self._owned_fd = None
+        self._fd = None
+        self._view = None
+        if isinstance(target, (str, os.PathLike)):
+            self._owned_fd = os.open(target, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+            self._fd = self._owned_fd
+        elif hasattr(target, "fileno"):
+            target.flush()
+            self._fd = target.fileno()
+        else:
+            self._view = memoryview(target).cast("B")
+            if len(self._view) < size:
+                raise ValueError(f"Buffer of {len(self._view)} bytes cannot hold {size} bytes.")
+        if self._fd is not None:
+            os.ftruncate(self._fd, size)
+
+    def write(self, offset: int, data) -> None:
+        if self._view is not None:
+            self._view[offset:offset + len(data)] = data
+            return
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self._fd, view, offset)
+            view = view[written:]
+            offset += written
+
+    def close(self) -> None:
+        if self._owned_fd is not None:
+            os.close(self._owned_fd)
+            self._owned_fd = None
+        if self._view is not None:
+            self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -33,8 +33,10 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import errno
 import gzip
 import hashlib
+import io
 import json
 import logging
 import os
@@ -63,6 +65,12 @@ from rich.progress import Progress, SpinnerColumn, BarColumn, TimeRemainingColum
 from rich.table import Table
 from rich.panel import Panel
 from tsm_ai_security import SessionSecurityAI, SecurityReport
+from chunkstore import ChunkStore, manifest_tree_digest
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; incremental backups fall back to hardlinks
+    fcntl = None
 
 # ---------------------------------------------------------------------------#
 #  Configuration & Constants
@@ -78,11 +86,20 @@ DEFAULT_CONFIG = {
     "verify_after_copy": True,
     "auto_cleanup": True,
     "audit_log_dir": "~/telegram_logs",
-    "metrics_enabled": True
+    "metrics_enabled": True,
+    "dedup_backups": False,
+    "chunk_store_dir": "",
+    "incremental_backups": False
 }
 
 EXCLUDED_FILES = {'.DS_Store', 'Thumbs.db', 'desktop.ini', '.localized'}
 CRITICAL_FILES = {'key_data', 'settings', 'configs'}
+MANIFEST_FILE = '.manifest.json'
+JOURNAL_FILE = '.journal.json'
+# Files modified this close to the previous journal are rehashed, since a
+# same-size rewrite within the mtime granularity would otherwise be missed.
+JOURNAL_RACE_WINDOW_NS = 2_000_000_000
+FICLONE = 0x40049409
 
 # ---------------------------------------------------------------------------#
 #  Enhanced Logging Setup
@@ -168,6 +185,8 @@ class OperationMetrics:
     end_time: float = 0.0
     bytes_processed: int = 0
     files_processed: int = 0
+    files_linked: int = 0
+    bytes_linked: int = 0
     errors: List[str] = field(default_factory=list)
     
     @property
@@ -351,6 +370,10 @@ class SessionDatabase:
             rows = conn.execute("SELECT * FROM sessions ORDER BY created DESC").fetchall()
             return [self.get_session(row['name']) for row in rows]
     
+    def delete_session(self, name: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE name = ?", (name,))
+    
     def log_operation(self, operation: str, status: str, duration_ms: int, details: str = "") -> None:
         with self._connect() as conn:
             conn.execute("""
@@ -422,7 +445,7 @@ class EnhancedFileOps:
                 return
         
         # Copy with temporary file for atomicity
-        tmp = dst.with_suffix('.tmp')
+        tmp = dst.with_name(dst.name + '.tmp')
         try:
             shutil.copy2(src, tmp)
             tmp.replace(dst)
@@ -431,9 +454,167 @@ class EnhancedFileOps:
                 tmp.unlink()
             raise
     
-    def verify_tree_digest(self, path: Path) -> str:
-        """Compute tree digest with parallel hashing."""
-        files = sorted(p for p in path.rglob("*") if p.is_file())
+    def incremental_copy(self, src: Path, dst: Path, previous: Optional[Path] = None,
+                         progress_callback=None, verify: bool = False) -> Tuple[OperationMetrics, Dict[str, Any]]:
+        """Copy directory, sharing unchanged files with a previous backup.
+        
+        Files whose size and mtime match the previous backup's journal are
+        reflinked (or hardlinked where reflinks are unsupported) from that
+        backup instead of copied, so only changed files are read and written.
+        A shared file that had to be copied after all must match the hash
+        the journal recorded for it. With verify, each copied file is read
+        back and checked against the digest taken while copying, and each
+        linked file against the size the journal recorded, so verifying
+        also costs time in proportion to the changed data only.
+        Returns the metrics and the journal for the new backup.
+        """
+        metrics = OperationMetrics(operation="incremental_copy", start_time=time.time())
+        journal = {"created_ns": time.time_ns(), "files": {}}
+        
+        prev_files = {}
+        prev_created_ns = 0
+        if previous is not None and (previous / JOURNAL_FILE).exists():
+            try:
+                prev_journal = json.loads((previous / JOURNAL_FILE).read_text())
+                prev_files = prev_journal["files"]
+                prev_created_ns = prev_journal["created_ns"]
+            except (ValueError, KeyError) as e:
+                log.warning(f"Ignoring unreadable journal in {previous}: {e}")
+        
+        files = [p for p in src.rglob("*") if p.is_file() and p.name not in EXCLUDED_FILES]
+        stats = {f: f.stat() for f in files}
+        total_bytes = sum(st.st_size for st in stats.values())
+        
+        futures = []
+        for f in files:
+            rel = f.relative_to(src).as_posix()
+            st = stats[f]
+            target = dst / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            
+            entry = prev_files.get(rel)
+            unchanged = (
+                entry is not None
+                and entry["size"] == st.st_size
+                and entry["mtime_ns"] == st.st_mtime_ns
+                and st.st_mtime_ns < prev_created_ns - JOURNAL_RACE_WINDOW_NS
+            )
+            if unchanged:
+                future = self.executor.submit(self._link_file, previous / rel, target)
+            else:
+                future = self.executor.submit(self._copy_verified if verify else self._copy_and_hash, f, target)
+            futures.append((future, rel, st, entry if unchanged else None))
+        
+        bytes_done = 0
+        for future, rel, st, entry in futures:
+            try:
+                # Linked files return None; copies return their hash
+                digest = future.result()
+                if entry is not None:
+                    if digest is not None and digest != entry["sha256"]:
+                        raise IOError(f"{rel} in {previous} does not match its journal")
+                    if digest is None:
+                        if verify and (dst / rel).stat().st_size != entry["size"]:
+                            raise IOError(f"{rel} in {previous} does not match its journal")
+                        metrics.files_linked += 1
+                        metrics.bytes_linked += st.st_size
+                    digest = entry["sha256"]
+                journal["files"][rel] = {
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "sha256": digest
+                }
+                bytes_done += st.st_size
+                metrics.files_processed += 1
+                if progress_callback:
+                    progress_callback(bytes_done, total_bytes)
+            except Exception as e:
+                metrics.errors.append(str(e))
+                log.error(f"Copy failed: {e}")
+        
+        metrics.bytes_processed = bytes_done
+        metrics.end_time = time.time()
+        return metrics, journal
+    
+    def _link_file(self, src: Path, dst: Path) -> Optional[str]:
+        """Share an unchanged file from a previous backup.
+        
+        Tries a copy-on-write reflink, then a hardlink, and copies as a last
+        resort. Returns the SHA-256 only when the file had to be copied.
+        """
+        if dst.exists():
+            dst.unlink()
+        if fcntl is not None:
+            try:
+                with src.open('rb') as s, dst.open('wb') as d:
+                    fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+                shutil.copystat(src, dst)
+                return None
+            except OSError:
+                if dst.exists():
+                    dst.unlink()
+        try:
+            os.link(src, dst)
+            return None
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+        return self._copy_and_hash(src, dst)
+    
+    def _copy_and_hash(self, src: Path, dst: Path, buf_size: int = 1 << 20) -> str:
+        """Copy a file atomically and return the SHA-256 of the data copied."""
+        h = hashlib.sha256()
+        # Append rather than replace the suffix: files sharing a stem
+        # (key.0, key.1, ...) are copied concurrently.
+        tmp = dst.with_name(dst.name + '.tmp')
+        try:
+            with src.open('rb') as s, tmp.open('wb') as d:
+                for chunk in iter(lambda: s.read(buf_size), b""):
+                    h.update(chunk)
+                    d.write(chunk)
+            shutil.copystat(src, tmp)
+            tmp.replace(dst)
+        except Exception:
+            if tmp.exists():
+                tmp.unlink()
+            raise
+        return h.hexdigest()
+    
+    def _copy_verified(self, src: Path, dst: Path) -> str:
+        """Copy a file and read the copy back to check it against the source digest."""
+        digest = self._copy_and_hash(src, dst)
+        if self.sha256_of_file(dst) != digest:
+            raise IOError(f"Copy of {src} does not match the source")
+        return digest
+    
+    @staticmethod
+    def journal_digest(journal: Dict[str, Any]) -> str:
+        """Tree digest as verify_tree_digest computes it, from journal hashes."""
+        h = hashlib.sha256()
+        for rel in sorted(journal["files"], key=Path):
+            h.update(journal["files"][rel]["sha256"].encode())
+        return h.hexdigest()
+    
+    @staticmethod
+    def unshare_hardlinks(path: Path) -> int:
+        """Give every hardlinked file under path its own copy.
+        
+        Incremental backups may share inodes with other backups; this must
+        run before a backup is used as a live tdata directory, or writes to
+        it would change the other backups too.
+        """
+        count = 0
+        for p in path.rglob("*"):
+            if p.is_file() and not p.is_symlink() and p.stat().st_nlink > 1:
+                tmp = p.with_suffix(p.suffix + '.unshare')
+                shutil.copy2(p, tmp)
+                tmp.replace(p)
+                count += 1
+        return count
+    
+    def verify_tree_digest(self, path: Path, exclude: Set[str] = frozenset()) -> str:
+        """Compute tree digest with parallel hashing, skipping excluded file names."""
+        files = sorted(p for p in path.rglob("*") if p.is_file() and p.name not in exclude)
         
         with ThreadPoolExecutor(max_workers=self.executor._max_workers) as executor:
             hashes = list(executor.map(self.sha256_of_file, files))
@@ -462,6 +643,11 @@ class TelegramSessionManager:
         self.db = SessionDatabase(self.backup_root / '.tsm_db' / 'sessions.db')
         self.file_ops = EnhancedFileOps(config.get('thread_workers', 4))
         self.crypto = None
+        self.chunk_store = None
+        
+        if config.get('dedup_backups'):
+            store_dir = config.get('chunk_store_dir') or self.backup_root / '.tsm_chunks'
+            self.chunk_store = ChunkStore(Path(store_dir).expanduser())
         
         if config.get('encryption_enabled'):
             password = os.getenv('TSM_ENCRYPTION_PASSWORD')
@@ -534,6 +720,12 @@ class TelegramSessionManager:
         
         log.info(f"Creating backup: {backup_name}")
         
+        if self.chunk_store:
+            return self._backup_dedup(backup_name, backup_path, notes, tags)
+        
+        journal = None
+        previous = self._latest_journaled_backup() if self.config.get('incremental_backups') else None
+        
         # Create progress bar
         with Progress(
             SpinnerColumn(),
@@ -550,17 +742,32 @@ class TelegramSessionManager:
                 if total > 0:
                     progress.update(task, completed=(copied / total) * 100)
             
-            # Perform parallel copy
-            metrics = self.file_ops.parallel_copy(
-                self.tdata_dir, 
-                backup_path,
-                progress_callback=update_progress
-            )
+            if self.config.get('incremental_backups'):
+                metrics, journal = self.file_ops.incremental_copy(
+                    self.tdata_dir,
+                    backup_path,
+                    previous=previous,
+                    progress_callback=update_progress,
+                    verify=bool(self.config.get('verify_after_copy'))
+                )
+            else:
+                # Perform parallel copy
+                metrics = self.file_ops.parallel_copy(
+                    self.tdata_dir, 
+                    backup_path,
+                    progress_callback=update_progress
+                )
         
         if metrics.errors:
             log.error(f"Backup completed with {len(metrics.errors)} errors")
             for error in metrics.errors[:5]:  # Show first 5 errors
                 log.error(f"  - {error}")
+            if journal is not None:
+                # Failed files are missing from the journal, so a later
+                # backup could not share them either
+                log.error("Incremental backup is incomplete! Removing it.")
+                shutil.rmtree(backup_path, ignore_errors=True)
+                return None
         
         # Create metadata
         metadata = SessionMetadata(
@@ -573,10 +780,10 @@ class TelegramSessionManager:
             tags=tags or []
         )
         
-        # Verify if enabled
-        if self.config.get('verify_after_copy'):
+        # Incremental copies were verified file by file while copying
+        if self.config.get('verify_after_copy') and journal is None:
             log.info("Verifying backup integrity...")
-            src_hash = self.file_ops.verify_tree_digest(self.tdata_dir)
+            src_hash = self.file_ops.verify_tree_digest(self.tdata_dir, exclude=EXCLUDED_FILES)
             dst_hash = self.file_ops.verify_tree_digest(backup_path)
             
             if src_hash != dst_hash:
@@ -587,6 +794,16 @@ class TelegramSessionManager:
             metadata.hash_digest = dst_hash
             log.info(f"Backup verified (hash: {dst_hash[:16]}...)")
         
+        if journal is not None:
+            # Changed files were hashed while copying and unchanged ones
+            # share the previous backup's data, so the journal holds the digest.
+            (backup_path / JOURNAL_FILE).write_text(json.dumps(journal))
+            metadata.hash_digest = self.file_ops.journal_digest(journal)
+            log.info(
+                f"Incremental backup: {metrics.files_linked} of {metrics.files_processed} files "
+                f"shared with {previous.name if previous else 'no previous backup'}"
+            )
+        
         # Save metadata
         self.db.add_session(metadata)
         self.db.log_operation(
@@ -596,7 +813,11 @@ class TelegramSessionManager:
             f"Files: {metrics.files_processed}, Size: {metrics.bytes_processed}"
         )
         
-        # Write canary file
+        self._finish_backup(metadata, notes)
+        return metadata
+    
+    def _finish_backup(self, metadata: SessionMetadata, notes: str) -> None:
+        """Write the canary file and prune old backups."""
         canary_data = {
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "hash": metadata.hash_digest,
@@ -604,14 +825,108 @@ class TelegramSessionManager:
             "size": metadata.size_bytes,
             "notes": notes
         }
-        (backup_path / ".sentinel").write_text(json.dumps(canary_data, indent=2))
+        (metadata.path / ".sentinel").write_text(json.dumps(canary_data, indent=2))
         
         # Auto-cleanup old backups
         if self.config.get('auto_cleanup'):
             self._cleanup_old_backups()
+    
+    def _backup_dedup(self, backup_name: str, backup_path: Path, notes: str,
+                      tags: Optional[List[str]]) -> Optional[SessionMetadata]:
+        """Back up the active session into the deduplicating chunk store.
+        
+        Only chunks that no earlier backup stored are written; the backup
+        directory holds just the manifest and the canary file.
+        """
+        metrics = OperationMetrics(operation="dedup_backup", start_time=time.time())
+        manifest, stats = self.chunk_store.backup_tree(
+            self.tdata_dir, backup_name,
+            executor=self.file_ops.executor,
+            exclude=EXCLUDED_FILES
+        )
+        metrics.bytes_processed = stats.bytes
+        metrics.files_processed = stats.files
+        metrics.errors = stats.errors
+        metrics.end_time = time.time()
         
+        if metrics.errors:
+            # A manifest missing files would restore an incomplete session
+            log.error(f"Backup failed with {len(metrics.errors)} errors. Discarding manifest.")
+            for error in metrics.errors[:5]:
+                log.error(f"  - {error}")
+            self.chunk_store.delete_manifest(backup_name)
+            return None
+        
+        if self.config.get('verify_after_copy'):
+            missing = self.chunk_store.missing_chunks(backup_name)
+            if missing:
+                log.error(f"Integrity check failed! {len(missing)} chunks missing.")
+                self.chunk_store.delete_manifest(backup_name)
+                return None
+            src_hash = self.file_ops.verify_tree_digest(self.tdata_dir, exclude=EXCLUDED_FILES)
+            if src_hash != manifest_tree_digest(manifest):
+                log.error("Integrity check failed! Manifest does not match the active session.")
+                self.chunk_store.delete_manifest(backup_name)
+                return None
+        
+        backup_path.mkdir(parents=True, exist_ok=True)
+        (backup_path / MANIFEST_FILE).write_text(json.dumps(manifest))
+        
+        metadata = SessionMetadata(
+            name=backup_name,
+            path=backup_path,
+            created=datetime.now(timezone.utc),
+            size_bytes=stats.bytes,
+            file_count=stats.files,
+            hash_digest=manifest_tree_digest(manifest),
+            notes=notes,
+            tags=tags or []
+        )
+        log.info(
+            f"Deduplicated backup: {stats.new_bytes / (1024 * 1024):.1f} MB new of "
+            f"{stats.bytes / (1024 * 1024):.1f} MB ({stats.new_chunks} new chunks)"
+        )
+        
+        self.db.add_session(metadata)
+        self.db.log_operation(
+            "backup_session",
+            "success",
+            int(metrics.duration * 1000),
+            f"Files: {stats.files}, Size: {stats.bytes}, New: {stats.new_bytes}"
+        )
+        self._finish_backup(metadata, notes)
         return metadata
     
+    def _latest_journaled_backup(self) -> Optional[Path]:
+        """Return the newest backup that has a file journal."""
+        for session in sorted(self.db.list_sessions(), key=lambda s: s.created, reverse=True):
+            if (session.path / JOURNAL_FILE).exists():
+                return session.path
+        return None
+    
+    def _is_dedup_backup(self, path: Path) -> bool:
+        return (path / MANIFEST_FILE).exists()
+    
+    @contextmanager
+    def _session_tree(self, metadata: SessionMetadata):
+        """Yield a directory with the session files, restoring chunked backups
+        into a temporary directory."""
+        if not self._is_dedup_backup(metadata.path):
+            yield metadata.path
+            return
+        if not self.chunk_store:
+            raise RuntimeError(f"'{metadata.name}' is a deduplicated backup but dedup_backups is disabled")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.chunk_store.restore_tree(metadata.name, tmpdir)
+            yield Path(tmpdir)
+    
+    def _remove_backup(self, session: SessionMetadata) -> None:
+        """Delete a backup directory and release its chunks."""
+        if self.chunk_store and self._is_dedup_backup(session.path):
+            self.chunk_store.delete_manifest(session.name)
+        shutil.rmtree(session.path, ignore_errors=True)
+        self.db.delete_session(session.name)
+    
     def switch_session(self, session_name: str) -> bool:
         """Switch to a different session."""
         metadata = self.db.get_session(session_name)
@@ -632,9 +947,20 @@ class TelegramSessionManager:
                 self.backup_active_session(notes="Auto-backup before switch")
                 shutil.rmtree(self.tdata_dir)
         
-        # Create symlink to selected session
         log.info(f"Switching to session: {session_name}")
-        self.tdata_dir.symlink_to(metadata.path)
+        if self._is_dedup_backup(metadata.path):
+            # Chunked backups have no file tree to link to; restore a copy
+            if not self.chunk_store:
+                log.error("Session is a deduplicated backup but dedup_backups is disabled")
+                return False
+            self.chunk_store.restore_tree(session_name, self.tdata_dir)
+        else:
+            if (metadata.path / JOURNAL_FILE).exists():
+                # Incremental backups may share files with other backups
+                self.file_ops.unshare_hardlinks(metadata.path)
+                (metadata.path / JOURNAL_FILE).unlink()
+            # Create symlink to selected session
+            self.tdata_dir.symlink_to(metadata.path)
         
         # Update last accessed time
         metadata.last_accessed = datetime.now(timezone.utc)
@@ -658,24 +984,25 @@ class TelegramSessionManager:
             log.error("One or both sessions not found")
             return {}
         
-        # Get file lists
-        files1 = {p.relative_to(meta1.path) for p in meta1.path.rglob("*") if p.is_file()}
-        files2 = {p.relative_to(meta2.path) for p in meta2.path.rglob("*") if p.is_file()}
-        
-        only_in_1 = files1 - files2
-        only_in_2 = files2 - files1
-        common = files1 & files2
-        
-        # Compare common files
-        different = []
-        for rel_path in common:
-            f1 = meta1.path / rel_path
-            f2 = meta2.path / rel_path
+        with self._session_tree(meta1) as path1, self._session_tree(meta2) as path2:
+            # Get file lists
+            files1 = {p.relative_to(path1) for p in path1.rglob("*") if p.is_file()}
+            files2 = {p.relative_to(path2) for p in path2.rglob("*") if p.is_file()}
+            
+            only_in_1 = files1 - files2
+            only_in_2 = files2 - files1
+            common = files1 & files2
             
-            if f1.stat().st_size != f2.stat().st_size:
-                different.append(rel_path)
-            elif self.file_ops.sha256_of_file(f1) != self.file_ops.sha256_of_file(f2):
-                different.append(rel_path)
+            # Compare common files
+            different = []
+            for rel_path in common:
+                f1 = path1 / rel_path
+                f2 = path2 / rel_path
+                
+                if f1.stat().st_size != f2.stat().st_size:
+                    different.append(rel_path)
+                elif self.file_ops.sha256_of_file(f1) != self.file_ops.sha256_of_file(f2):
+                    different.append(rel_path)
         
         return {
             'session1': session1,
@@ -702,9 +1029,9 @@ class TelegramSessionManager:
         try:
             # Create tar archive
             mode = 'w:gz' if compress else 'w'
-            with tarfile.open(output_path, mode) as tar:
+            with tarfile.open(output_path, mode) as tar, self._session_tree(metadata) as session_path:
                 # Add session files
-                tar.add(metadata.path, arcname=session_name)
+                tar.add(session_path, arcname=session_name)
                 
                 # Add metadata
                 meta_json = json.dumps(metadata.to_dict(), indent=2)
@@ -798,25 +1125,20 @@ class TelegramSessionManager:
             for session in sessions[max_backups:]:
                 if 'tdata_backup' in session.name:  # Only remove auto-backups
                     log.info(f"Removing old backup: {session.name}")
-                    shutil.rmtree(session.path, ignore_errors=True)
-                    # Remove from DB
-                    self.db._connect().execute(
-                        "DELETE FROM sessions WHERE name = ?", (session.name,)
-                    )
+                    self._remove_backup(session)
         
         # Remove by age
         cutoff_date = datetime.now(timezone.utc) - timedelta(days=max_age_days)
         for session in sessions:
             if session.created < cutoff_date and 'tdata_backup' in session.name:
                 log.info(f"Removing expired backup: {session.name}")
-                shutil.rmtree(session.path, ignore_errors=True)
-                self.db._connect().execute(
-                    "DELETE FROM sessions WHERE name = ?", (session.name,)
-                )
+                self._remove_backup(session)
     
     def cleanup(self):
         """Cleanup resources."""
         self.file_ops.cleanup()
+        if self.chunk_store:
+            self.chunk_store.close()
 
 
 # ---------------------------------------------------------------------------#
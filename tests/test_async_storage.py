@@ -0,0 +1,132 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from storage.aio import AsyncLocalStorage, AsyncS3Storage, SyncBackendAdapter, store_with_failover
+from storage.local import LocalNetworkStorage
+from test_replication import InMemoryStorage
+
+class FakeBody:
+
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self):
+        return self.data
+
+class FakePaginator:
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    async def paginate(self, Bucket, Prefix):
+        keys = [key for key in self.objects if key.startswith(Prefix)]
+        for start in range(0, len(keys), 2):
+            yield {"Contents": [{"Key": key} for key in keys[start:start + 2]]}
+
+class FakeAsyncS3Client:
+    """
+    The subset of the aiobotocore S3 client used by AsyncS3Storage.
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    async def put_object(self, Bucket, Key, Body):
+        await asyncio.sleep(0.01)
+        self.objects[Key] = Body
+
+    async def get_object(self, Bucket, Key):
+        return {"Body": FakeBody(self.objects[Key])}
+
+    async def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def get_paginator(self, name):
+        return FakePaginator(self.objects)
+
+class TestAsyncStorage(unittest.TestCase):
+
+    def test_adapter_runs_operations_concurrently(self):
+        executor = ThreadPoolExecutor(max_workers=200)
+        backend = SyncBackendAdapter(InMemoryStorage(delay=0.05), executor=executor)
+
+        async def run():
+            locators = await asyncio.gather(*(backend.upload(f"s{i}", b"data") for i in range(200)))
+            data = await asyncio.gather(*(backend.download(locator) for locator in locators))
+            return locators, data
+
+        start = time.monotonic()
+        locators, data = asyncio.run(run())
+        self.assertLess(time.monotonic() - start, 2.0)
+        self.assertEqual(len(set(locators)), 200)
+        self.assertEqual(set(data), {b"data"})
+        executor.shutdown()
+
+    def test_adapter_bounds_concurrency(self):
+        backend = SyncBackendAdapter(InMemoryStorage(delay=0.05), max_concurrency=2)
+
+        async def run():
+            await asyncio.gather(*(backend.upload("s", b"data") for _ in range(6)))
+
+        start = time.monotonic()
+        asyncio.run(run())
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_local_storage_shares_sync_layout(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            backend = AsyncLocalStorage(tmpdir)
+
+            async def run():
+                locator = await backend.upload("session", b"data")
+                return locator, await backend.list_all()
+
+            locator, listed = asyncio.run(run())
+            self.assertEqual(listed, [locator])
+            self.assertEqual(LocalNetworkStorage(tmpdir).download(locator), b"data")
+            self.assertTrue(asyncio.run(backend.delete(locator)))
+            backend.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_s3_round_trip(self):
+        client = FakeAsyncS3Client()
+        backend = AsyncS3Storage(client, "bucket")
+
+        async def run():
+            locators = await asyncio.gather(*(backend.upload("s", bytes([i])) for i in range(5)))
+            listed = await backend.list_all()
+            data = await backend.download(locators[3])
+            await backend.delete(locators[0])
+            return locators, listed, data
+
+        locators, listed, data = asyncio.run(run())
+        self.assertEqual(sorted(listed), sorted(locators))
+        self.assertEqual(data, bytes([3]))
+        self.assertNotIn(locators[0], client.objects)
+
+    def test_failover_skips_failed_backends(self):
+        failing, healthy = InMemoryStorage(fail=True), InMemoryStorage()
+        index, locator = asyncio.run(store_with_failover([failing, healthy], "s", b"data"))
+        self.assertEqual(index, 1)
+        self.assertEqual(healthy.download(locator), b"data")
+        with self.assertRaises(IOError):
+            asyncio.run(store_with_failover([failing], "s", b"data"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import errno
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from storage.cache import CachedStorage
+from test_replication import InMemoryStorage
+
+class CountingStorage(InMemoryStorage):
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(delay=delay)
+        self.downloads = 0
+
+    def download(self, locator: str) -> bytes:
+        self.downloads += 1
+        return super().download(locator)
+
+class TestCachedStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.remote = CountingStorage()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_hits_are_served_locally(self):
+        cache = CachedStorage(self.remote, self.cache_dir, max_bytes=1024, cache_on_upload=False)
+        locator = cache.upload("session", b"data")
+        self.assertEqual(cache.download(locator), b"data")
+        self.assertEqual(cache.download(locator), b"data")
+        self.assertEqual(self.remote.downloads, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_write_through_populates_cache(self):
+        cache = CachedStorage(self.remote, self.cache_dir, max_bytes=1024)
+        locator = cache.upload("session", b"data")
+        self.assertIn(locator, self.remote.objects)
+        self.assertEqual(cache.download(locator), b"data")
+        self.assertEqual(self.remote.downloads, 0)
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = CachedStorage(self.remote, self.cache_dir, max_bytes=300)
+        first = cache.upload("s", b"a" * 100)
+        second = cache.upload("s", b"b" * 100)
+        third = cache.upload("s", b"c" * 100)
+        cache.download(first)
+        cache.upload("s", b"d" * 100)
+        self.assertLessEqual(cache.cached_bytes, 300)
+        self.assertEqual(cache.evictions, 1)
+
+        cache.download(first)
+        cache.download(third)
+        self.assertEqual(self.remote.downloads, 0)
+        cache.download(second)
+        self.assertEqual(self.remote.downloads, 1)
+
+        cache.upload("s", b"x" * 400)  # larger than the cache, never stored
+        self.assertLessEqual(cache.cached_bytes, 300)
+
+    def test_corrupt_entry_is_refetched(self):
+        cache = CachedStorage(self.remote, self.cache_dir, max_bytes=1024)
+        locator = cache.upload("session", b"data")
+        with open(cache._path(cache._key(locator)), "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"X")
+        self.assertEqual(cache.download(locator), b"data")
+        self.assertEqual(self.remote.downloads, 1)
+        self.assertEqual(cache.download(locator), b"data")
+        self.assertEqual(self.remote.downloads, 1)
+
+    def test_index_survives_restart_and_delete_drops_entry(self):
+        cache = CachedStorage(self.remote, self.cache_dir, max_bytes=1024)
+        locator = cache.upload("session", b"data")
+        reopened = CachedStorage(self.remote, self.cache_dir, max_bytes=1024)
+        self.assertEqual(reopened.cached_bytes, 4)
+        self.assertEqual(reopened.download(locator), b"data")
+        self.assertEqual(self.remote.downloads, 0)
+
+        self.assertTrue(reopened.delete(locator))
+        self.assertEqual(reopened.cached_bytes, 0)
+        self.assertNotIn(locator, self.remote.objects)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        self.remote.delay = 0.1
+        locator = self.remote.upload("session", b"data")
+        cache = CachedStorage(self.remote, self.cache_dir, max_bytes=1024)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.download(locator))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [b"data"] * 8)
+        self.assertEqual(self.remote.downloads, 1)
+
+    def test_cache_write_failure_does_not_fail_reads(self):
+        self.remote.delay = 0.1
+        locator = self.remote.upload("session", b"data")
+        cache = CachedStorage(self.remote, self.cache_dir, max_bytes=1024)
+        results = []
+        with mock.patch.object(cache, "_store", side_effect=OSError(errno.ENOSPC, "No space left on device")):
+            threads = [threading.Thread(target=lambda: results.append(cache.download(locator))) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results, [b"data"] * 4)
+        self.assertEqual(cache.cached_bytes, 0)
+        self.assertEqual(cache.download(locator), b"data")
+        self.assertEqual(cache.cached_bytes, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chunkstore import ChunkStore, find_boundaries, iter_chunks, manifest_tree_digest
+from storage.dedup import DedupStorage
+
+class TestContentDefinedChunking(unittest.TestCase):
+
+    def test_chunk_sizes_respect_limits(self):
+        data = os.urandom(4 * 1024 * 1024)
+        boundaries = find_boundaries(data, 4096, 16384, 65536)
+        self.assertEqual(boundaries[-1], len(data))
+        sizes = [end - start for start, end in zip([0] + boundaries, boundaries)]
+        self.assertTrue(all(4096 <= size <= 65536 for size in sizes[:-1]))
+
+    def test_streaming_matches_whole_buffer(self):
+        data = os.urandom(3 * 1024 * 1024)
+        expected = find_boundaries(data, 4096, 16384, 65536)
+        chunks = list(iter_chunks(io.BytesIO(data), 4096, 16384, 65536, block_size=100_003))
+        self.assertEqual(b"".join(chunks), data)
+        offsets = []
+        total = 0
+        for chunk in chunks:
+            total += len(chunk)
+            offsets.append(total)
+        self.assertEqual(offsets, expected)
+
+    def test_insertion_only_changes_nearby_chunks(self):
+        data = os.urandom(2 * 1024 * 1024)
+        edited = data[:1_000_000] + b"inserted" + data[1_000_000:]
+
+        def chunk_set(buffer):
+            boundaries = find_boundaries(buffer, 4096, 16384, 65536)
+            return {buffer[start:end] for start, end in zip([0] + boundaries, boundaries)}
+
+        original, changed = chunk_set(data), chunk_set(edited)
+        self.assertGreater(len(original & changed), len(original) - 3)
+
+class TestChunkStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.store = ChunkStore(self.tmpdir / "store", 4096, 16384, 65536)
+        self.src = self.tmpdir / "tdata"
+        (self.src / "sub").mkdir(parents=True)
+        (self.src / "key_data").write_bytes(os.urandom(300_000))
+        (self.src / "sub" / "cache").write_bytes(os.urandom(500_000))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_repeat_backup_writes_only_new_chunks(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            manifest, first = self.store.backup_tree(self.src, "first", executor=executor)
+        self.assertEqual(first.new_bytes, first.bytes)
+
+        with (self.src / "sub" / "cache").open("r+b") as f:
+            f.seek(200_000)
+            f.write(b"changed")
+        _, second = self.store.backup_tree(self.src, "second")
+        self.assertEqual(second.bytes, first.bytes)
+        self.assertLess(second.new_bytes, 100_000)
+
+        restored = self.tmpdir / "restored"
+        self.store.restore_tree("second", restored)
+        for name in ("key_data", "sub/cache"):
+            self.assertEqual((restored / name).read_bytes(), (self.src / name).read_bytes())
+        self.assertEqual(manifest_tree_digest(manifest), manifest_tree_digest(self.store.get_manifest("first")))
+
+    def test_reference_counts_free_unshared_chunks(self):
+        self.store.backup_tree(self.src, "first")
+        (self.src / "key_data").write_bytes(os.urandom(300_000))
+        self.store.backup_tree(self.src, "second")
+        stored = self.store.stats()["stored_bytes"]
+
+        freed = self.store.delete_manifest("first")
+        self.assertGreater(freed, 0)
+        self.assertLess(self.store.stats()["stored_bytes"], stored)
+        self.assertEqual(self.store.missing_chunks("second"), [])
+        self.assertIsNone(self.store.delete_manifest("first"))
+
+        self.store.delete_manifest("second")
+        self.assertEqual(self.store.stats()["chunks"], 0)
+        self.assertEqual(self.store.collect_garbage(), 0)
+
+    def test_garbage_collection_and_corruption(self):
+        result = self.store.store_bytes(os.urandom(100_000))
+        self.assertEqual(self.store.collect_garbage(), len(set(result.chunks)))
+
+        self.store.backup_tree(self.src, "first")
+        digest = self.store.get_manifest("first")["files"][0]["chunks"][0]
+        self.store.chunk_path(digest).write_bytes(b"corrupt")
+        with self.assertRaises(ValueError):
+            self.store.get_chunk(digest)
+        with self.assertRaises(ValueError):
+            self.store.add_manifest("first", {"chunks": []})
+
+class TestDedupStorage(unittest.TestCase):
+
+    def test_uploads_share_chunks(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            storage = DedupStorage(tmpdir)
+            data = os.urandom(1024 * 1024)
+            first = storage.upload("session", data)
+            second = storage.upload("session", data[:500_000] + b"x" + data[500_000:])
+            stats = storage.store.stats()
+            self.assertLess(stats["stored_bytes"], 1.3 * len(data))
+            self.assertEqual(storage.download(first), data)
+            self.assertEqual(sorted(storage.list_all()), sorted([first, second]))
+            self.assertTrue(storage.delete(first))
+            self.assertFalse(storage.delete(first))
+            self.assertEqual(len(storage.download(second)), len(data) + 1)
+            storage.store.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import erasure
+
+class TestReedSolomon(unittest.TestCase):
+
+    def test_any_k_shards_decode(self):
+        data = os.urandom(10_001)
+        shards = erasure.encode(data, 3, 6)
+        for subset in itertools.combinations(shards, 3):
+            self.assertEqual(erasure.decode(list(subset)), data)
+
+    def test_storage_overhead(self):
+        data = os.urandom(30_000)
+        shards = erasure.encode(data, 3, 5)
+        payload_size = sum(len(shard) - erasure.HEADER_SIZE for shard in shards)
+        self.assertEqual(payload_size, 50_000)
+
+    def test_corrupt_shard_is_ignored(self):
+        data = os.urandom(4096)
+        shards = erasure.encode(data, 2, 4)
+        corrupted = bytearray(shards[0])
+        corrupted[-1] ^= 0xff
+        self.assertFalse(erasure.verify_shard(bytes(corrupted)))
+        self.assertEqual(erasure.decode([bytes(corrupted), None, shards[2], shards[3]]), data)
+
+    def test_too_few_shards(self):
+        shards = erasure.encode(b"session data", 3, 5)
+        with self.assertRaises(ValueError):
+            erasure.decode(shards[:2])
+
+    def test_empty_payload(self):
+        shards = erasure.encode(b"", 2, 3)
+        self.assertEqual(erasure.decode(shards[1:]), b"")
+
+if __name__ == '__main__':
+    unittest.main()
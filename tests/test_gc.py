@@ -0,0 +1,107 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from storage.gc import GarbageCollector
+from storage.inventory import IndexedStorage, InventoryIndex
+from storage.local import LocalNetworkStorage
+from storage.s3 import S3Storage
+
+class FakeS3Client:
+    """Records DeleteObjects calls and fails the keys it is told to."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        self.calls.append(keys)
+        return {"Errors": [{"Key": key, "Code": "AccessDenied"} for key in keys if key in self.failing]}
+
+class TestGarbageCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.backend = LocalNetworkStorage(os.path.join(self.tmpdir, "store"), durable=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _age(self, locator: str, seconds: float) -> None:
+        path = self.backend._path(locator)
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_dry_run_reports_without_deleting(self):
+        kept = self.backend.upload("s1", b"kept")
+        orphan = self.backend.upload("s2", b"orphan")
+        self._age(kept, 7200)
+        self._age(orphan, 7200)
+        collector = GarbageCollector({"local": self.backend}, grace_period=3600)
+        report = collector.collect(lambda: {kept})
+        self.assertTrue(report.dry_run)
+        self.assertEqual(report.orphans, {"local": [orphan]})
+        self.assertEqual(report.deleted, 0)
+        self.assertTrue(self.backend.exists(orphan))
+
+    def test_collects_old_orphans_only(self):
+        kept = self.backend.upload("s1", b"kept")
+        old = [self.backend.upload("s2", b"old") for _ in range(5)]
+        recent = self.backend.upload("s3", b"recent")
+        for locator in old + [kept]:
+            self._age(locator, 7200)
+        collector = GarbageCollector({"local": self.backend}, grace_period=3600, batch_size=2)
+        report = collector.collect(lambda: {kept}, dry_run=False)
+        self.assertEqual(report.deleted, 5)
+        self.assertEqual(report.too_recent, 1)
+        self.assertEqual(sorted(self.backend.list_all()), sorted([kept, recent]))
+
+    def test_uses_and_updates_the_inventory(self):
+        index = InventoryIndex(os.path.join(self.tmpdir, "inventory.db"))
+        storage = IndexedStorage(self.backend, index, "local")
+        kept = storage.upload("s1", b"kept")
+        orphan = storage.upload("s2", b"orphan")
+        collector = GarbageCollector({"local": storage}, inventory=index, grace_period=0)
+        report = collector.collect(lambda: [kept], dry_run=False)
+        self.assertEqual(report.deleted, 1)
+        self.assertFalse(self.backend.exists(orphan))
+        self.assertEqual(storage.list_all(), [kept])
+        index.close()
+
+    def test_refuses_to_delete_without_references(self):
+        orphan = self.backend.upload("s1", b"orphan")
+        self._age(orphan, 7200)
+        collector = GarbageCollector({"local": self.backend}, grace_period=3600)
+        self.assertEqual(collector.collect(set).orphan_count, 1)
+        with self.assertRaises(ValueError):
+            collector.collect(set, dry_run=False)
+        self.assertTrue(self.backend.exists(orphan))
+
+    def test_reconcile_does_not_reset_the_age(self):
+        index = InventoryIndex(os.path.join(self.tmpdir, "inventory.db"))
+        storage = IndexedStorage(self.backend, index, "local")
+        kept = storage.upload("s1", b"kept")
+        orphan = storage.upload("s2", b"orphan")
+        self._age(orphan, 7200)
+        index.reconcile("local", self.backend)
+        collector = GarbageCollector({"local": storage}, inventory=index, grace_period=3600)
+        report = collector.collect(lambda: [kept], dry_run=False)
+        self.assertEqual(report.deleted, 1)
+        self.assertEqual(storage.list_all(), [kept])
+        index.close()
+
+    def test_s3_bulk_delete_batches(self):
+        client = FakeS3Client(failing={"k1500"})
+        storage = S3Storage(client, "bucket")
+        failed = storage.delete_many([f"k{i}" for i in range(2500)])
+        self.assertEqual([len(call) for call in client.calls], [1000, 1000, 500])
+        self.assertEqual(failed, ["k1500"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gf256
+from sharding import create_binary_shards, reconstruct_from_binary_shards
+
+def reference_mul(a, b):
+    """ Carry-less multiplication modulo the AES polynomial.
+    """
+    result = 0
+    while b:
+        if b & 1:
+            result ^= a
+        a <<= 1
+        if a & 0x100:
+            a ^= 0x11b
+        b >>= 1
+    return result
+
+class TestGF256Arithmetic(unittest.TestCase):
+
+    def test_multiplication_table(self):
+        for a in range(256):
+            for b in range(0, 256, 7):
+                self.assertEqual(gf256.gf_mul(a, b), reference_mul(a, b))
+
+    def test_inverse(self):
+        for a in range(1, 256):
+            self.assertEqual(gf256.gf_mul(a, gf256.gf_inv(a)), 1)
+        with self.assertRaises(ZeroDivisionError):
+            gf256.gf_inv(0)
+
+class TestGF256Sharding(unittest.TestCase):
+
+    def test_any_threshold_subset_recovers(self):
+        secret = os.urandom(1000)
+        shares = gf256.split_secret(secret, 3, 5)
+        for subset in itertools.combinations(shares, 3):
+            self.assertEqual(gf256.recover_secret(list(subset)), secret)
+
+    def test_shares_are_input_sized(self):
+        secret = os.urandom(4096)
+        for share in gf256.split_secret(secret, 2, 3):
+            self.assertEqual(len(share), len(secret) + 1)
+
+    def test_below_threshold_does_not_recover(self):
+        secret = os.urandom(64)
+        shares = gf256.split_secret(secret, 3, 5)
+        self.assertNotEqual(gf256.recover_secret(shares[:2]), secret)
+
+    def test_large_payload(self):
+        secret = os.urandom(2 * 1024 * 1024)
+        shards = create_binary_shards(secret, 4, 2)
+        self.assertEqual(reconstruct_from_binary_shards([shards[3], shards[1]]), secret)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            gf256.split_secret(b"secret", 1, 3)
+        with self.assertRaises(ValueError):
+            gf256.split_secret(b"secret", 4, 3)
+        shares = gf256.split_secret(b"secret", 2, 3)
+        with self.assertRaises(ValueError):
+            gf256.recover_secret([shares[0], shares[0]])
+
+if __name__ == '__main__':
+    unittest.main()
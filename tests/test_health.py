@@ -0,0 +1,136 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from replication import QuorumNotReachedError, ReplicaReadError, ReplicationManager
+from storage.aio import store_with_failover
+from storage.health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, HealthTracker
+from test_replication import InMemoryStorage
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class CountingStorage(InMemoryStorage):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.uploads = 0
+
+    def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        self.uploads += 1
+        return super().upload(session_id, encrypted_data)
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=FakeClock())
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_half_open_probe(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        # Only one probe at a time
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+
+        clock.now = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+
+class TestHealthTracker(unittest.TestCase):
+
+    def test_order_skips_open_and_prefers_healthy(self):
+        health = HealthTracker(["a", "b", "c"], failure_threshold=2)
+        health[0].record(0.2, True)
+        health[1].record(0.05, True)
+        health[2].record(0.01, False)
+        health[2].record(0.01, False)
+        self.assertEqual(health.order(), [1, 0])
+        with self.assertRaises(CircuitOpenError):
+            health[2].call(lambda: None)
+        self.assertEqual(health[2].snapshot()["rejections"], 1)
+
+    def test_previous_entries_are_kept(self):
+        old = HealthTracker(["a", "b"])
+        new = HealthTracker(["b", "c"], previous=old)
+        self.assertIs(new[0], old[1])
+        self.assertIsNot(new[1], old[0])
+
+class TestHealthIntegration(unittest.TestCase):
+
+    def test_open_backend_is_not_called_on_upload(self):
+        dead = CountingStorage(fail=True)
+        backends = [CountingStorage(), dead]
+        manager = ReplicationManager(backends, health=HealthTracker(["ok", "dead"], failure_threshold=2))
+        for _ in range(2):
+            manager.replicate_upload("session", b"data", write_quorum=1)
+        manager.flush()
+        self.assertEqual(dead.uploads, 2)
+        manager.replicate_upload("session", b"data", write_quorum=1)
+        manager.flush()
+        self.assertEqual(dead.uploads, 2)
+        self.assertEqual(manager.health[1].breaker.state, OPEN)
+        manager.close()
+
+    def test_timed_out_upload_is_charged_once(self):
+        slow = CountingStorage(delay=0.3)
+        manager = ReplicationManager([CountingStorage(), slow], timeout=0.05,
+                                     health=HealthTracker(["fast", "slow"], failure_threshold=2))
+        with self.assertRaises(QuorumNotReachedError):
+            manager.replicate_upload("session", b"data")
+        manager.flush()
+        # The late success after the timeout charge is not recorded again
+        self.assertEqual((manager.health[1].failures, manager.health[1].successes), (1, 0))
+        self.assertEqual(manager.health[1].breaker.state, CLOSED)
+        manager.close()
+
+    def test_reads_skip_open_circuits(self):
+        slow, fast = InMemoryStorage(), InMemoryStorage()
+        manager = ReplicationManager([slow, fast], health=HealthTracker(["slow", "fast"], failure_threshold=1))
+        locators = manager.replicate_upload("session", b"data")
+        manager.read_latency[0].record(0.001)
+        manager.health[0].record(None, False)
+        slow.delay = 1.0
+        start = time.monotonic()
+        self.assertEqual(manager.replicate_download(locators), b"data")
+        self.assertLess(time.monotonic() - start, 0.5)
+
+        manager.health[1].record(None, False)
+        with self.assertRaises(ReplicaReadError):
+            manager.replicate_download(locators)
+        manager.close()
+
+    def test_failover_skips_open_circuit(self):
+        dead, spare = CountingStorage(fail=True), CountingStorage()
+        health = HealthTracker(["dead", "spare"], failure_threshold=1)
+        index, _ = asyncio.run(store_with_failover([dead, spare], "s", b"data", health))
+        self.assertEqual(index, 1)
+        index, _ = asyncio.run(store_with_failover([dead, spare], "s", b"data", health))
+        self.assertEqual(index, 1)
+        self.assertEqual(dead.uploads, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from storage.inventory import IndexedStorage, InventoryIndex
+from storage.local import LocalNetworkStorage
+
+class FailingPartitionStorage(LocalNetworkStorage):
+    """Local storage whose listing of one partition always fails."""
+
+    def scan_inventory(self, partition=None):
+        if partition == "":
+            raise IOError("listing failed")
+        return super().scan_inventory(partition)
+
+class TestInventoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.backend = LocalNetworkStorage(os.path.join(self.tmpdir, "store"), durable=False)
+        self.index = InventoryIndex(os.path.join(self.tmpdir, "inventory.db"))
+        self.storage = IndexedStorage(self.backend, self.index, "local-a")
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_upload_and_delete_update_the_index(self):
+        locator = self.storage.upload("s1", b"payload")
+        self.assertTrue(self.storage.exists(locator))
+        self.assertEqual(self.storage.list_all(), [locator])
+        record = self.index.get("local-a", locator)
+        self.assertEqual(record.size, 7)
+        self.assertEqual(len(record.checksum), 64)
+        self.assertEqual([r.backend for r in self.index.placement(locator)], ["local-a"])
+
+        self.assertTrue(self.storage.delete(locator))
+        self.assertFalse(self.index.exists(locator))
+        self.assertEqual(self.storage.list_all(), [])
+
+    def test_index_without_dates_is_migrated(self):
+        path = os.path.join(self.tmpdir, "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE objects (backend TEXT NOT NULL, locator TEXT NOT NULL, size INTEGER, checksum TEXT, "
+            "etag TEXT, seen_at REAL NOT NULL, PRIMARY KEY (backend, locator))"
+        )
+        conn.execute("INSERT INTO objects VALUES ('local-a', 'old', 3, NULL, NULL, 1.0)")
+        conn.commit()
+        conn.close()
+
+        index = InventoryIndex(path)
+        try:
+            self.assertIsNone(index.get("local-a", "old").modified)
+            locator = self.backend.upload("s1", b"payload")
+            index.reconcile("local-a", self.backend)
+            self.assertIsNone(index.get("local-a", "old"))
+            self.assertEqual(index.get("local-a", locator).modified, os.stat(self.backend._path(locator)).st_mtime)
+        finally:
+            index.close()
+
+    def test_list_prefix(self):
+        for locator in ["ab1", "ab2", "ac1", "b"]:
+            self.index.record("s3", locator, 1)
+        self.index.record("gcs", "ab3", 1)
+        self.assertEqual(self.index.list_prefix("s3", "ab"), ["ab1", "ab2"])
+        self.assertEqual(self.index.list_prefix("s3"), ["ab1", "ab2", "ac1", "b"])
+        self.assertEqual(self.index.backends(), ["gcs", "s3"])
+
+    def test_reconcile_finds_external_changes(self):
+        kept = self.storage.upload("s1", b"kept")
+        removed = self.storage.upload("s2", b"removed")
+        # Written and deleted behind the index's back
+        external = self.backend.upload("s3", b"external")
+        self.backend.delete(removed)
+
+        report = self.storage.reconcile(max_workers=4)
+        self.assertEqual(report.removed, 1)
+        self.assertEqual(report.added, 1)
+        self.assertEqual(report.scanned, 2)
+        self.assertEqual(sorted(self.storage.list_all()), sorted([kept, external]))
+        self.assertEqual(self.index.get("local-a", external).size, 8)
+        # The upload-time checksum survives a scan that reports the same size
+        self.assertIsNotNone(self.index.get("local-a", kept).checksum)
+
+    def test_failed_scan_removes_nothing(self):
+        backend = FailingPartitionStorage(os.path.join(self.tmpdir, "store"), durable=False)
+        self.index.record("local-a", "gone", 1)
+        with self.assertRaises(IOError):
+            self.index.reconcile("local-a", backend)
+        self.assertTrue(self.index.exists("gone"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import io
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from storage.local import LocalNetworkStorage
+
+class TestLocalNetworkStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.storage = LocalNetworkStorage(self.base_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_path)
+
+    def _write_flat(self, data: bytes) -> str:
+        locator = str(uuid.uuid4())
+        with open(os.path.join(self.base_path, f"{locator}.session"), "wb") as f:
+            f.write(data)
+        return locator
+
+    def test_uploads_use_sharded_layout(self):
+        locator = self.storage.upload("session", b"data")
+        relative = os.path.relpath(self.storage._path(locator), self.base_path)
+        self.assertEqual(len(relative.split(os.sep)), 3)
+        self.assertTrue(os.path.exists(self.storage._path(locator)))
+        self.assertEqual(self.storage.download(locator), b"data")
+        self.assertEqual(list(self.storage.iter_all()), [locator])
+        self.assertTrue(self.storage.delete(locator))
+        self.assertFalse(self.storage.delete(locator))
+
+    def test_no_temporary_files_are_left_or_listed(self):
+        storage = LocalNetworkStorage(self.base_path, durable=False)
+        locators = {storage.upload("session", os.urandom(64)) for _ in range(50)}
+        names = [name for _, _, files in os.walk(self.base_path) for name in files]
+        self.assertFalse([name for name in names if name.startswith(".tmp-")])
+        self.assertEqual(set(storage.list_all()), locators)
+
+    def test_flat_files_remain_readable(self):
+        flat = self._write_flat(b"legacy")
+        sharded = self.storage.upload("session", b"new")
+        self.assertEqual(self.storage.download(flat), b"legacy")
+        self.assertEqual(set(self.storage.list_all()), {flat, sharded})
+
+    def test_locators_cannot_leave_the_store(self):
+        outside = os.path.join(os.path.dirname(self.base_path), f"victim-{uuid.uuid4()}.session")
+        with open(outside, "wb") as f:
+            f.write(b"credentials")
+        self.addCleanup(os.remove, outside)
+        name = os.path.basename(outside)[:-len(".session")]
+        for locator in (f"../{name}", f"sub/../../{name}", os.path.join("..", name), "", ".."):
+            with self.assertRaises(ValueError):
+                self.storage.exists(locator)
+            with self.assertRaises(ValueError):
+                self.storage.download(locator)
+            with self.assertRaises(ValueError):
+                with self.storage.open_mapped(locator):
+                    pass
+
+    def test_migration_moves_flat_files(self):
+        flat = [self._write_flat(bytes([i])) for i in range(10)]
+        self.assertEqual(self.storage.migrate_flat_layout(), 10)
+        self.assertEqual(self.storage.migrate_flat_layout(), 0)
+        for i, locator in enumerate(flat):
+            self.assertTrue(os.path.exists(self.storage._path(locator)))
+            self.assertEqual(self.storage.download(locator), bytes([i]))
+        self.assertEqual(set(self.storage.list_all()), set(flat))
+
+    def test_migration_command(self):
+        locator = self._write_flat(b"legacy")
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        result = subprocess.run(
+            [sys.executable, "-m", "storage.local", self.base_path],
+            cwd=root, capture_output=True, text=True, check=True,
+        )
+        self.assertIn("Moved 1", result.stdout)
+        self.assertTrue(os.path.exists(self.storage._path(locator)))
+
+class TestLocalZeroCopyDownloads(unittest.TestCase):
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.storage = LocalNetworkStorage(self.base_path)
+        self.data = os.urandom(3 * 1024 * 1024 + 17)
+        self.locator = self.storage.upload("session", self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_path)
+
+    def test_mapped_view_and_chunks(self):
+        with self.storage.open_mapped(self.locator) as view:
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(view, self.data)
+        chunks = [bytes(chunk) for chunk in self.storage.iter_chunks(self.locator, chunk_size=1024 * 1024)]
+        self.assertEqual([len(chunk) for chunk in chunks], [1024 * 1024] * 3 + [17])
+        self.assertEqual(b"".join(chunks), self.data)
+
+        empty = self.storage.upload("session", b"")
+        self.assertEqual(list(self.storage.iter_chunks(empty)), [])
+
+    def test_download_into_reusable_buffer(self):
+        buffer = bytearray(4 * 1024 * 1024)
+        size = self.storage.download_into(self.locator, buffer)
+        self.assertEqual(buffer[:size], self.data)
+        with self.assertRaises(ValueError):
+            self.storage.download_into(self.locator, bytearray(10))
+
+    def test_download_into_in_memory_stream(self):
+        target = io.BytesIO()
+        self.assertEqual(self.storage.download_into(self.locator, target), len(self.data))
+        self.assertEqual(target.getvalue(), self.data)
+
+    def test_download_into_file_and_socket(self):
+        with tempfile.TemporaryFile() as f:
+            self.assertEqual(self.storage.download_into(self.locator, f), len(self.data))
+            f.seek(0)
+            self.assertEqual(f.read(), self.data)
+
+        small = self.storage.upload("session", b"over the socket")
+        sender, receiver = socket.socketpair()
+        with sender, receiver:
+            self.storage.download_into(small, sender)
+            self.assertEqual(receiver.recv(1024), b"over the socket")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from repair import RateLimiter, ShardRepairer
+from replication import ReplicationManager
+from storage.inventory import IndexedStorage, InventoryIndex
+from storage.local import LocalNetworkStorage
+from sharding import reconstruct_from_binary_shards
+from test_replication import InMemoryStorage
+
+class TestShardRepair(unittest.TestCase):
+
+    def setUp(self):
+        self.backends = [InMemoryStorage() for _ in range(4)]
+        self.manager = ReplicationManager(self.backends)
+        self.payloads = {f"session_{i}": os.urandom(2048) for i in range(5)}
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_rebuilds_only_missing_shamir_shards(self):
+        shard_map = {
+            session_id: self.manager.shard_upload(session_id, data, threshold=2)
+            for session_id, data in self.payloads.items()
+        }
+        # Lose backend 1 entirely and one shard on backend 3
+        self.backends[1].objects.clear()
+        lost_session = "session_0"
+        del self.backends[3].objects[shard_map[lost_session][3]]
+
+        repairer = ShardRepairer(self.backends)
+        report = repairer.repair(shard_map, threshold=2)
+
+        self.assertEqual(report.sessions_degraded, 5)
+        self.assertEqual(report.shards_rebuilt, 6)
+        self.assertEqual(report.unrecoverable, [])
+        for session_id, locators in report.shard_map.items():
+            shards = [self.backends[i].download(locators[i]) for i in (1, 3)]
+            self.assertEqual(reconstruct_from_binary_shards(shards), self.payloads[session_id])
+
+    def test_dry_run_and_healthy_sets(self):
+        shard_map = {
+            session_id: self.manager.shard_upload(session_id, data, threshold=2)
+            for session_id, data in self.payloads.items()
+        }
+        repairer = ShardRepairer(self.backends)
+        self.assertEqual(repairer.find_degraded(shard_map), {})
+        self.backends[0].objects.clear()
+        report = repairer.repair(shard_map, threshold=2, dry_run=True)
+        self.assertEqual(report.sessions_degraded, 5)
+        self.assertEqual(report.shards_rebuilt, 0)
+
+    def test_unrecoverable_below_threshold(self):
+        locators = self.manager.shard_upload("session", b"data", threshold=3)
+        for backend in self.backends[:2]:
+            backend.objects.clear()
+        report = ShardRepairer(self.backends).repair({"session": locators}, threshold=3)
+        self.assertEqual(report.unrecoverable, ["session"])
+
+    def test_rebuilds_erasure_shards(self):
+        data = os.urandom(10_000)
+        locators = self.manager.erasure_upload("session", data, data_shards=2)
+        self.backends[0].objects.clear()
+        report = ShardRepairer(self.backends, mode="erasure").repair({"session": locators})
+        self.assertEqual(report.shards_rebuilt, 1)
+        repaired = report.shard_map["session"]
+        self.backends[2].fail = True
+        self.backends[3].fail = True
+        self.assertEqual(self.manager.erasure_download(repaired), data)
+
+    def test_unlistable_backend_is_skipped(self):
+        shard_map = {
+            session_id: self.manager.shard_upload(session_id, data, threshold=2)
+            for session_id, data in self.payloads.items()
+        }
+        del self.backends[0].objects[shard_map["session_1"][0]]
+
+        def broken_listing():
+            raise IOError("listing timed out")
+        self.backends[2].list_all = broken_listing
+
+        report = ShardRepairer(self.backends).repair(shard_map, threshold=2)
+        self.assertEqual(report.unlistable_backends, [2])
+        self.assertEqual(report.sessions_degraded, 1)
+        self.assertEqual(report.shards_rebuilt, 1)
+        self.assertEqual(list(report.shard_map), ["session_1"])
+
+    def test_lost_shard_behind_an_index_is_found(self):
+        index = InventoryIndex(":memory:")
+        stores = [LocalNetworkStorage(os.path.join(self.tmpdir, f"store{i}"), durable=False) for i in range(3)]
+        backends = [IndexedStorage(store, index, f"local{i}") for i, store in enumerate(stores)]
+        manager = ReplicationManager(backends)
+        try:
+            locators = manager.shard_upload("session_0", self.payloads["session_0"], threshold=2)
+        finally:
+            manager.close()
+        # Lost on disk, but the index still lists it
+        stores[1].delete(locators[1])
+        self.assertIn(locators[1], backends[1].list_all())
+
+        report = ShardRepairer(backends).repair({"session_0": locators}, threshold=2)
+        self.assertEqual(report.sessions_degraded, 1)
+        self.assertEqual(report.shards_rebuilt, 1)
+        rebuilt = report.shard_map["session_0"]
+        shards = [stores[i].download(rebuilt[i]) for i in (0, 1)]
+        self.assertEqual(reconstruct_from_binary_shards(shards), self.payloads["session_0"])
+        index.close()
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_limits_rate(self):
+        limiter = RateLimiter(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+if __name__ == '__main__':
+    unittest.main()
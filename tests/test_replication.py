@@ -0,0 +1,183 @@
+import os
+import sys
+import threading
+import time
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from storage.base import StorageBackend
+from replication import QuorumNotReachedError, ReplicaReadError, ReplicationManager
+from sharding import reconstruct_from_binary_shards
+
+class InMemoryStorage(StorageBackend):
+    """
+    An in-memory backend with configurable latency and failures.
+    """
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def upload(self, session_id: str, encrypted_data: bytes) -> str:
+        time.sleep(self.delay)
+        if self.fail:
+            raise IOError("backend unavailable")
+        locator = str(uuid.uuid4())
+        with self._lock:
+            self.objects[locator] = bytes(encrypted_data)
+        return locator
+
+    def download(self, locator: str) -> bytes:
+        time.sleep(self.delay)
+        if self.fail:
+            raise IOError("backend unavailable")
+        return self.objects[locator]
+
+    def delete(self, locator: str) -> bool:
+        with self._lock:
+            return self.objects.pop(locator, None) is not None
+
+    def list_all(self) -> list[str]:
+        with self._lock:
+            return list(self.objects)
+
+class TestReplicationFanOut(unittest.TestCase):
+
+    def test_uploads_run_concurrently(self):
+        backends = [InMemoryStorage(delay=0.2) for _ in range(3)]
+        manager = ReplicationManager(backends)
+        start = time.monotonic()
+        locators = manager.replicate_upload("session", b"data")
+        elapsed = time.monotonic() - start
+        self.assertLess(elapsed, 0.5)
+        for backend, locator in zip(backends, locators):
+            self.assertEqual(backend.download(locator), b"data")
+        manager.close()
+
+    def test_write_quorum_returns_before_slow_backend(self):
+        backends = [InMemoryStorage(), InMemoryStorage(), InMemoryStorage(delay=0.5)]
+        manager = ReplicationManager(backends)
+        late_acks = []
+        start = time.monotonic()
+        locators = manager.replicate_upload(
+            "session", b"data", write_quorum=2,
+            on_late_ack=lambda index, locator: late_acks.append((index, locator)),
+        )
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertIsNotNone(locators[0])
+        self.assertIsNotNone(locators[1])
+        self.assertIsNone(locators[2])
+
+        self.assertTrue(manager.flush(timeout=2))
+        self.assertEqual(len(late_acks), 1)
+        self.assertEqual(late_acks[0][0], 2)
+        self.assertIn(late_acks[0][1], backends[2].objects)
+        manager.close()
+
+    def test_failed_quorum_raises(self):
+        backends = [InMemoryStorage(), InMemoryStorage(fail=True), InMemoryStorage(fail=True)]
+        manager = ReplicationManager(backends)
+        with self.assertRaises(QuorumNotReachedError) as ctx:
+            manager.replicate_upload("session", b"data", write_quorum=2)
+        self.assertEqual(len(ctx.exception.errors), 2)
+        manager.close()
+
+    def test_timeout_excludes_slow_backend(self):
+        backends = [InMemoryStorage(), InMemoryStorage(delay=0.5)]
+        manager = ReplicationManager(backends, timeout=0.1)
+        with self.assertRaises(QuorumNotReachedError):
+            manager.replicate_upload("session", b"data")
+        self.assertIsNotNone(manager.replicate_upload("session", b"data", write_quorum=1)[0])
+        manager.close()
+
+    def test_shard_quorum_must_cover_threshold(self):
+        manager = ReplicationManager([InMemoryStorage() for _ in range(3)])
+        with self.assertRaises(ValueError):
+            manager.shard_upload("session", b"data", threshold=2, write_quorum=1)
+        manager.close()
+
+    def test_shard_upload_round_trip(self):
+        backends = [InMemoryStorage() for _ in range(3)]
+        manager = ReplicationManager(backends)
+        data = os.urandom(100 * 1024)
+        locators = manager.shard_upload("session", data, threshold=2)
+        shards = [backends[i].download(locators[i]) for i in (0, 2)]
+        self.assertEqual(reconstruct_from_binary_shards(shards), data)
+        manager.close()
+
+    def test_erasure_round_trip_with_failed_backends(self):
+        backends = [InMemoryStorage() for _ in range(5)]
+        manager = ReplicationManager(backends)
+        data = os.urandom(100 * 1024)
+        locators = manager.erasure_upload("session", data, data_shards=3)
+        backends[0].fail = True
+        backends[3].fail = True
+        self.assertEqual(manager.erasure_download(locators), data)
+        backends[4].fail = True
+        with self.assertRaises(ReplicaReadError):
+            manager.erasure_download(locators)
+        manager.close()
+
+    def test_erasure_download_requests_k_shards_at_once(self):
+        backends = [InMemoryStorage() for _ in range(4)]
+        manager = ReplicationManager(backends)
+        data = os.urandom(64 * 1024)
+        locators = manager.erasure_upload("session", data, data_shards=3)
+        for backend in backends:
+            backend.delay = 0.2
+        start = time.monotonic()
+        self.assertEqual(manager.erasure_download(locators, data_shards=3), data)
+        # One round trip, not one for the first header and one for the rest
+        self.assertLess(time.monotonic() - start, 0.35)
+        manager.close()
+
+class TestReplicationHedgedReads(unittest.TestCase):
+
+    def test_download_verifies_checksum(self):
+        backends = [InMemoryStorage(), InMemoryStorage()]
+        manager = ReplicationManager(backends)
+        locators = manager.replicate_upload("session", b"data")
+        backends[0].objects[locators[0]] = b"corrupt"
+        data = manager.replicate_download(locators, checksum=ReplicationManager.checksum(b"data"))
+        self.assertEqual(data, b"data")
+        manager.close()
+
+    def test_hedges_when_primary_is_slow(self):
+        slow, fast = InMemoryStorage(), InMemoryStorage()
+        manager = ReplicationManager([slow, fast])
+        locators = manager.replicate_upload("session", b"data")
+        # Make the slow backend look fastest so it is chosen as primary
+        manager.read_latency[0].record(0.001)
+        manager.read_latency[1].record(0.01)
+        slow.delay = 1.0
+        start = time.monotonic()
+        data = manager.replicate_download(locators, hedge_delay=0.05)
+        self.assertEqual(data, b"data")
+        self.assertLess(time.monotonic() - start, 0.5)
+        manager.close()
+
+    def test_prefers_lowest_latency_backend(self):
+        backends = [InMemoryStorage(delay=0.05), InMemoryStorage()]
+        manager = ReplicationManager(backends)
+        locators = manager.replicate_upload("session", b"data")
+        for _ in range(3):
+            manager.replicate_download(locators, hedge_delay=1.0)
+        self.assertLess(manager.read_latency[1].ewma, manager.read_latency[0].ewma)
+        manager.close()
+
+    def test_all_replicas_failing_raises(self):
+        backends = [InMemoryStorage(), InMemoryStorage()]
+        manager = ReplicationManager(backends)
+        locators = manager.replicate_upload("session", b"data")
+        for backend in backends:
+            backend.fail = True
+        with self.assertRaises(ReplicaReadError):
+            manager.replicate_download(locators)
+        manager.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import pytest
 import grpc
 import time
@@ -11,15 +12,28 @@ import TSMService_pb2
 import TSMService_pb2_grpc
 from mock_server.server import TSMService
 from mock_server.database import Database
+from mock_server.ai_interceptor import AISecurityInterceptor
+from tsm_ai_security import SessionSecurityAI
 
 @pytest.fixture(scope="module")
-def grpc_server():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    TSMService_pb2_grpc.add_TSMServiceServicer_to_server(TSMService(), server)
+def grpc_server(tmp_path_factory):
+    # The service keeps its databases in the working directory
+    workdir = tmp_path_factory.mktemp("server")
+    (workdir / "storage_config.json").write_text(
+        json.dumps([{"id": "local", "type": "local", "base_path": str(workdir / "store")}])
+    )
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    security_ai = SessionSecurityAI()
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=10), interceptors=[AISecurityInterceptor(security_ai)]
+    )
+    TSMService_pb2_grpc.add_TSMServiceServicer_to_server(TSMService(security_ai=security_ai), server)
     server.add_insecure_port('[::]:50051')
     server.start()
     yield server
     server.stop(0)
+    os.chdir(cwd)
 
 @pytest.fixture(scope="module")
 def grpc_stub(grpc_server):
@@ -81,3 +95,111 @@ def test_ai_interceptor_denies_high_risk_request(grpc_stub, mocker):
 
     # Assert that the request was denied
     assert e.value.code() == grpc.StatusCode.PERMISSION_DENIED
+
+@pytest.fixture
+def storage_service(tmp_path, monkeypatch):
+    # A service whose storage topology is a single local backend under tmp_path
+    config = tmp_path / "storage_config.json"
+    config.write_text(json.dumps([{"id": "local", "type": "local", "base_path": str(tmp_path / "store")}]))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TSM_STORAGE_CONFIG", str(config))
+    monkeypatch.setenv("TSM_STORAGE_INVENTORY", str(tmp_path / "inventory.db"))
+    service = TSMService()
+    yield service
+    service.replication_manager.close()
+    service.storage_inventory.close()
+
+def test_backup_session_streams_the_stored_object(storage_service, mocker):
+    backend = storage_service.storage_topology.current.find("local")
+    locator = backend.upload("session_foxtrot", b"stored session")
+    storage_service.db.add_locators("session_foxtrot", [("local", locator)])
+
+    chunks = list(storage_service.BackupSession(TSMService_pb2.BackupRequest(session_id="session_foxtrot"), mocker.Mock()))
+    assert b"".join(chunk.data for chunk in chunks) == b"stored session"
+
+def test_backup_session_does_not_treat_the_request_as_a_path(storage_service, tmp_path, mocker):
+    (tmp_path / "secret").mkdir()
+    (tmp_path / "secret" / "victim.session").write_bytes(b"telegram credentials")
+    context = mocker.Mock()
+
+    request = TSMService_pb2.BackupRequest(session_id="../secret/victim")
+    chunks = list(storage_service.BackupSession(request, context))
+    assert chunks == []
+    context.set_code.assert_called_once_with(grpc.StatusCode.NOT_FOUND)
+
+def test_garbage_collection_keeps_stored_sessions(storage_service):
+    locators = storage_service.store_session_object("session_foxtrot", b"stored session")
+    backend = storage_service.storage_topology.current.find("local")
+    orphan = backend.upload("session_golf", b"never recorded")
+    # Written past the inventory index, so only a reconcile finds it
+    unindexed = backend.backend.upload("session_golf", b"never recorded")
+
+    report = storage_service.collect_storage_garbage(dry_run=False, grace_period=0)
+    assert report.deleted == 2
+    assert backend.download(locators[0]) == b"stored session"
+    assert storage_service.db.get_locators("session_foxtrot") == [("local", locators[0])]
+    assert orphan not in backend.backend.list_all()
+    assert unindexed not in backend.backend.list_all()
+
+def test_saved_sessions_are_stored_and_replaced(storage_service):
+    backend = storage_service.storage_topology.current.find("local")
+    sessions = storage_service.db.get_all_sessions()
+    for row in sessions:
+        [(backend_id, locator)] = storage_service.db.get_locators(row["id"])
+        assert backend.download(locator) == row["encrypted_data"]
+
+    session = TSMService_pb2.Session(id="session_alpha", name="Session Alpha", created_timestamp=1)
+    storage_service.save_session(session, b"new data")
+    [(backend_id, locator)] = storage_service.db.get_locators("session_alpha")
+    assert backend.download(locator) == b"new data"
+    # The replaced object is left for garbage collection
+    report = storage_service.collect_storage_garbage(dry_run=False, grace_period=0)
+    assert report.deleted == 1
+    assert len(backend.list_all()) == len(sessions)
+
+def test_analyze_sessions_bulk_streams_one_report_per_session(storage_service, mocker):
+    request = TSMService_pb2.AnalyzeSessionsBulkRequest(session_ids=["session_alpha", "session_charlie"])
+    reports = list(storage_service.AnalyzeSessionsBulk(request, mocker.Mock()))
+    assert sorted(report.session_id for report in reports) == ["session_alpha", "session_charlie"]
+    assert all(0.0 <= report.report.risk_score <= 1.0 and report.report.threats for report in reports)
+
+    reports = list(storage_service.AnalyzeSessionsBulk(TSMService_pb2.AnalyzeSessionsBulkRequest(), mocker.Mock()))
+    assert len(reports) == len(storage_service.db.get_all_sessions())
+
+def test_get_metrics_reports_backend_health(storage_service, mocker):
+    sessions = len(storage_service.db.get_all_sessions())
+    storage_service.store_session_object("session_foxtrot", b"stored session")
+    metrics = storage_service.GetMetrics(TSMService_pb2.Empty(), mocker.Mock())
+    assert [(h.backend_id, h.circuit_state, h.successes) for h in metrics.backend_health] == [
+        ("local", "closed", sessions + 1)
+    ]
+
+def test_add_and_remove_storage_backends(storage_service, tmp_path, mocker):
+    request = TSMService_pb2.AddStorageBackendRequest(backend=TSMService_pb2.BackendConfig(
+        type="local", parameters={"id": "second", "base_path": str(tmp_path / "second")},
+    ))
+    assert storage_service.AddStorageBackend(request, mocker.Mock()).success
+    configuration = storage_service.GetStorageConfiguration(TSMService_pb2.Empty(), mocker.Mock())
+    assert [backend.parameters["id"] for backend in configuration.backends] == ["local", "second"]
+    assert len(storage_service.replication_manager.backends) == 2
+    persisted = json.loads((tmp_path / "storage_config.json").read_text())
+    assert [entry["id"] for entry in persisted] == ["local", "second"]
+
+    remove = TSMService_pb2.RemoveStorageBackendRequest(backend_id="second")
+    assert storage_service.RemoveStorageBackend(remove, mocker.Mock()).success
+    assert len(storage_service.replication_manager.backends) == 1
+    assert not storage_service.RemoveStorageBackend(remove, mocker.Mock()).success
+
+def test_add_storage_backend_decodes_typed_parameters(storage_service, tmp_path, mocker):
+    request = TSMService_pb2.AddStorageBackendRequest(backend=TSMService_pb2.BackendConfig(
+        type="local", parameters={
+            "id": "007", "base_path": str(tmp_path / "second"), "cache": "false",
+            "durable": "True", "connection_pool": '{"retries": 5}',
+        },
+    ))
+    assert storage_service.AddStorageBackend(request, mocker.Mock()).success
+    added = json.loads((tmp_path / "storage_config.json").read_text())[1]
+    assert added == {
+        "id": "007", "base_path": str(tmp_path / "second"), "cache": False,
+        "durable": True, "connection_pool": {"retries": 5}, "type": "local",
+    }
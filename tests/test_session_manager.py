@@ -0,0 +1,262 @@
+import errno
+import importlib.util
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+spec = importlib.util.spec_from_file_location("tsm_enhanced", os.path.join(ROOT, "telegram-session-manager-enhanced.py"))
+tsm = importlib.util.module_from_spec(spec)
+sys.modules["tsm_enhanced"] = tsm
+spec.loader.exec_module(tsm)
+
+class SteppingDateTime(datetime):
+    """A clock that moves one second per call, so backup names never collide."""
+    current = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    @classmethod
+    def now(cls, tz=None):
+        SteppingDateTime.current += timedelta(seconds=1)
+        return cls.current if tz else cls.current.replace(tzinfo=None)
+
+sqlite3.register_adapter(SteppingDateTime, lambda value: value.isoformat(" "))
+
+class SessionManagerTestCase(unittest.TestCase):
+    """Runs a TelegramSessionManager against a scratch tdata directory."""
+
+    extra_config = {}
+
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.tdata = self.tmpdir / "tdata"
+        (self.tdata / "D877F783D5D3EF8C").mkdir(parents=True)
+        (self.tdata / "key_data").write_bytes(os.urandom(4096))
+        (self.tdata / "settings").write_bytes(os.urandom(1024))
+        (self.tdata / "D877F783D5D3EF8C" / "maps").write_bytes(os.urandom(200_000))
+
+        config = dict(tsm.DEFAULT_CONFIG)
+        config.update({
+            "backup_root": str(self.tmpdir / "backups"),
+            "tdata_dir": str(self.tdata),
+            "audit_log_dir": "",
+            "encryption_enabled": False,
+            "auto_cleanup": False,
+        })
+        config.update(self.extra_config)
+        patcher = mock.patch.object(tsm, "datetime", SteppingDateTime)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = tsm.TelegramSessionManager(config)
+
+    def tearDown(self):
+        self.manager.cleanup()
+        shutil.rmtree(self.tmpdir)
+
+    def snapshot(self, path: Path) -> dict:
+        return {p.relative_to(path).as_posix(): p.read_bytes() for p in sorted(path.rglob("*")) if p.is_file()}
+
+class TestDedupBackups(SessionManagerTestCase):
+
+    extra_config = {"dedup_backups": True}
+
+    def test_backup_and_switch(self):
+        original = self.snapshot(self.tdata)
+        backup = self.manager.backup_active_session()
+        self.assertIsNotNone(backup)
+        self.assertEqual(self.manager.chunk_store.list_manifests(), [backup.name])
+        self.assertEqual(backup.hash_digest, self.manager.file_ops.verify_tree_digest(self.tdata))
+
+        (self.tdata / "key_data").write_bytes(b"other account")
+        self.assertTrue(self.manager.switch_session(backup.name))
+        self.assertFalse(self.tdata.is_symlink())
+        self.assertEqual(self.snapshot(self.tdata), original)
+        # The session switched away from was backed up first
+        self.assertEqual(len(self.manager.chunk_store.list_manifests()), 2)
+
+    def test_backup_with_errors_is_rejected(self):
+        store_file = self.manager.chunk_store._store_file
+
+        def failing_store(root, path):
+            if path.name == "settings":
+                raise OSError("read error")
+            return store_file(root, path)
+
+        with mock.patch.object(self.manager.chunk_store, "_store_file", side_effect=failing_store):
+            self.assertIsNone(self.manager.backup_active_session())
+        self.assertEqual(self.manager.chunk_store.list_manifests(), [])
+        self.assertEqual(self.manager.db.list_sessions(), [])
+
+    def test_prune_releases_manifests(self):
+        self.manager.config["max_backups"] = 1
+        self.manager.config["auto_cleanup"] = True
+        first = self.manager.backup_active_session()
+        (self.tdata / "key_data").write_bytes(os.urandom(4096))
+        second = self.manager.backup_active_session()
+
+        self.assertEqual(self.manager.chunk_store.list_manifests(), [second.name])
+        self.assertFalse(first.path.exists())
+        self.assertIsNone(self.manager.db.get_session(first.name))
+        self.assertEqual(self.manager.chunk_store.missing_chunks(second.name), [])
+
+class TestEnhancedFileOps(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.src = self.tmpdir / "src"
+        self.src.mkdir()
+        self.ops = tsm.EnhancedFileOps(thread_workers=8)
+
+    def tearDown(self):
+        self.ops.cleanup()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name: str, data: bytes, age: float = 3600) -> Path:
+        path = self.src / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        past = time.time() - age
+        os.utime(path, (past, past))
+        return path
+
+    def test_incremental_copy_shares_unchanged_files(self):
+        for i in range(3):
+            self.write(f"file{i}", os.urandom(10_000))
+        metrics, journal = self.ops.incremental_copy(self.src, self.tmpdir / "first")
+        self.assertEqual(metrics.errors, [])
+        self.assertEqual(metrics.files_linked, 0)
+        (self.tmpdir / "first" / tsm.JOURNAL_FILE).write_text(tsm.json.dumps(journal))
+
+        self.write("file1", os.urandom(10_000), age=0)
+        second = self.tmpdir / "second"
+        metrics, journal = self.ops.incremental_copy(self.src, second, previous=self.tmpdir / "first")
+        self.assertEqual(metrics.errors, [])
+        self.assertEqual(metrics.files_linked, 2)
+        self.assertEqual(sorted(journal["files"]), ["file0", "file1", "file2"])
+        self.assertEqual(self.ops.journal_digest(journal), self.ops.verify_tree_digest(second))
+        for i in range(3):
+            self.assertEqual((second / f"file{i}").read_bytes(), (self.src / f"file{i}").read_bytes())
+
+    def test_parallel_copies_of_files_sharing_a_stem(self):
+        for i in range(40):
+            self.write(f"key.{i}", os.urandom(256 * 1024))
+        metrics, journal = self.ops.incremental_copy(self.src, self.tmpdir / "dst")
+        self.assertEqual(metrics.errors, [])
+        self.assertEqual(len(journal["files"]), 40)
+        self.assertEqual(sorted(p.name for p in (self.tmpdir / "dst").iterdir()), sorted(journal["files"]))
+
+    def test_link_file_falls_back_from_reflink_to_hardlink_to_copy(self):
+        src = self.write("key_data", b"secret")
+        unsupported = OSError(errno.EOPNOTSUPP, "reflinks not supported")
+
+        with mock.patch.object(tsm.fcntl, "ioctl") as ioctl:
+            self.assertIsNone(self.ops._link_file(src, self.tmpdir / "reflinked"))
+            ioctl.assert_called_once()
+            self.assertEqual(os.stat(self.tmpdir / "reflinked").st_nlink, 1)
+
+        with mock.patch.object(tsm.fcntl, "ioctl", side_effect=unsupported):
+            self.assertIsNone(self.ops._link_file(src, self.tmpdir / "linked"))
+            self.assertTrue(os.path.samefile(src, self.tmpdir / "linked"))
+
+            with mock.patch.object(tsm.os, "link", side_effect=OSError(errno.EXDEV, "cross-device link")):
+                digest = self.ops._link_file(src, self.tmpdir / "copied")
+        self.assertEqual(digest, tsm.hashlib.sha256(b"secret").hexdigest())
+        self.assertEqual((self.tmpdir / "copied").read_bytes(), b"secret")
+        self.assertFalse(os.path.samefile(src, self.tmpdir / "copied"))
+
+    def test_link_file_without_fcntl(self):
+        src = self.write("key_data", b"secret")
+        with mock.patch.object(tsm, "fcntl", None):
+            self.assertIsNone(self.ops._link_file(src, self.tmpdir / "linked"))
+        self.assertTrue(os.path.samefile(src, self.tmpdir / "linked"))
+
+    def test_unshare_hardlinks(self):
+        src = self.write("key_data", b"secret")
+        backup = self.tmpdir / "backup"
+        backup.mkdir()
+        os.link(src, backup / "key_data")
+        (backup / "settings").write_bytes(b"own copy")
+
+        self.assertEqual(self.ops.unshare_hardlinks(backup), 1)
+        (backup / "key_data").write_bytes(b"changed")
+        self.assertEqual(src.read_bytes(), b"secret")
+        self.assertEqual(sorted(p.name for p in backup.iterdir()), ["key_data", "settings"])
+
+class TestIncrementalBackups(SessionManagerTestCase):
+
+    extra_config = {"incremental_backups": True}
+
+    def test_backup_is_verified_against_the_source(self):
+        backup = self.manager.backup_active_session()
+        self.assertIsNotNone(backup)
+        self.assertEqual(backup.hash_digest, self.manager.file_ops.verify_tree_digest(self.tdata))
+        self.assertTrue((backup.path / tsm.JOURNAL_FILE).exists())
+
+    def test_backup_with_errors_is_removed(self):
+        copy = self.manager.file_ops._copy_and_hash
+
+        def failing_copy(src, dst, *args):
+            if src.name == "settings":
+                raise OSError("read error")
+            return copy(src, dst, *args)
+
+        with mock.patch.object(self.manager.file_ops, "_copy_and_hash", side_effect=failing_copy):
+            self.assertIsNone(self.manager.backup_active_session())
+        self.assertEqual(list((self.tmpdir / "backups").glob("tdata_backup_*")), [])
+        self.assertEqual(self.manager.db.list_sessions(), [])
+
+    def age_session(self):
+        past = time.time() - 3600
+        for path in self.tdata.rglob("*"):
+            os.utime(path, (past, past))
+
+    def test_only_copied_files_are_verified(self):
+        self.age_session()
+        first = self.manager.backup_active_session()
+        (self.tdata / "key_data").write_bytes(os.urandom(4096))
+        file_ops = self.manager.file_ops
+        with mock.patch.object(file_ops, "sha256_of_file", wraps=file_ops.sha256_of_file) as hashed:
+            second = self.manager.backup_active_session()
+        self.assertIsNotNone(second)
+        self.assertEqual([c.args[0] for c in hashed.call_args_list], [second.path / "key_data"])
+        self.assertEqual(second.hash_digest, file_ops.verify_tree_digest(self.tdata))
+        self.assertNotEqual(second.hash_digest, first.hash_digest)
+
+    def test_corrupt_copy_is_removed(self):
+        with mock.patch.object(self.manager.file_ops, "_copy_and_hash", return_value="0" * 64):
+            self.assertIsNone(self.manager.backup_active_session())
+        self.assertEqual(list((self.tmpdir / "backups").glob("tdata_backup_*")), [])
+
+    def test_shared_file_must_match_the_journal(self):
+        self.age_session()
+        first = self.manager.backup_active_session()
+        # Damaged in the previous backup without changing its size
+        (first.path / "settings").write_bytes(os.urandom(1024))
+        with mock.patch.object(tsm.fcntl, "ioctl", side_effect=OSError(errno.EOPNOTSUPP, "no reflinks")), \
+                mock.patch.object(tsm.os, "link", side_effect=OSError(errno.EXDEV, "cross-device link")):
+            self.assertIsNone(self.manager.backup_active_session())
+
+    def test_switch_unshares_the_backup(self):
+        past = time.time() - 3600
+        for path in self.tdata.rglob("*"):
+            os.utime(path, (past, past))
+        # Without reflinks the backups share inodes
+        with mock.patch.object(tsm.fcntl, "ioctl", side_effect=OSError(errno.EOPNOTSUPP, "no reflinks")):
+            first = self.manager.backup_active_session()
+            second = self.manager.backup_active_session()
+        self.assertTrue(os.path.samefile(first.path / "settings", second.path / "settings"))
+        self.assertTrue(self.manager.switch_session(first.name))
+        self.assertTrue(self.tdata.is_symlink())
+        (self.tdata / "settings").write_bytes(b"changed")
+        self.assertNotEqual((second.path / "settings").read_bytes(), b"changed")
+
+if __name__ == '__main__':
+    unittest.main()
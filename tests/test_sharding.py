@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from primes import mersenne_prime
+from sharding import (
+    BATCH_PRIME,
+    SecretSharer,
+    batch_modular_inverse,
+    create_shards,
+    get_polynomial_points,
+    get_polynomial_points_batch,
+    lagrange_basis_at_zero,
+    lagrange_interpolate,
+    reconstruct_from_shards,
+    recover_secrets_batch,
+    split_secrets_batch,
+)
+
+class TestLagrangeReconstruction(unittest.TestCase):
+
+    def test_batch_modular_inverse(self):
+        prime = mersenne_prime(61)
+        values = [3, 12345, prime - 1, 2 ** 40 + 7]
+        self.assertEqual(
+            batch_modular_inverse(values, prime),
+            [pow(v, -1, prime) for v in values],
+        )
+
+    def test_cached_basis_matches_interpolation(self):
+        prime = mersenne_prime(127)
+        points = [(1, 1234), (3, 98765), (4, 55555)]
+        basis = lagrange_basis_at_zero((1, 3, 4), prime)
+        dot = sum(b * y for b, y in zip(basis, (1234, 98765, 55555))) % prime
+        self.assertEqual(dot, lagrange_interpolate(0, points, prime))
+
+    def test_shares_record_prime(self):
+        shares = SecretSharer.split_secret("c0ffee", 2, 3)
+        for share in shares:
+            self.assertEqual(len(share.split('-')), 3)
+        self.assertEqual(SecretSharer.recover_secret(shares[1:]), "c0ffee")
+
+    def test_legacy_shares_still_recover(self):
+        shares = SecretSharer.split_secret("c0ffee", 2, 3)
+        legacy = ['-'.join(share.split('-')[:2]) for share in shares]
+        self.assertEqual(SecretSharer.recover_secret(legacy[:2]), "c0ffee")
+
+    def test_mixed_primes_rejected(self):
+        shares = SecretSharer.split_secret("c0ffee", 2, 3)
+        x, y, _ = shares[1].split('-')
+        with self.assertRaises(ValueError):
+            SecretSharer.recover_secret([shares[0], f"{x}-{y}-7f"])
+
+    def test_create_and_reconstruct_shards(self):
+        data = b"session key material"
+        shards = create_shards(data, 5, 3)
+        self.assertEqual(reconstruct_from_shards(shards[1:4]), data)
+
+class TestBatchedShareGeneration(unittest.TestCase):
+
+    def test_batch_matches_scalar_evaluation(self):
+        polynomials = [[5, 7, BATCH_PRIME - 1], [0, 1, 2], [123456, 0, 99]]
+        coefficients = np.array(polynomials, dtype=np.int64).T
+        batch = get_polynomial_points_batch(coefficients, 6, BATCH_PRIME)
+        for column, polynomial in enumerate(polynomials):
+            expected = [y for _, y in get_polynomial_points(polynomial, 6, BATCH_PRIME)]
+            self.assertEqual(batch[:, column].tolist(), expected)
+
+    def test_split_and_recover_many_secrets(self):
+        secrets = np.arange(0, 10_000, dtype=np.int64) * 214_748
+        shares = split_secrets_batch(secrets, 3, 5)
+        self.assertEqual(shares.shape, (5, len(secrets)))
+        recovered = recover_secrets_batch([2, 4, 5], shares[[1, 3, 4]])
+        np.testing.assert_array_equal(recovered, secrets)
+
+    def test_secrets_must_fit_field(self):
+        with self.assertRaises(ValueError):
+            split_secrets_batch([BATCH_PRIME], 2, 3)
+
+if __name__ == '__main__':
+    unittest.main()
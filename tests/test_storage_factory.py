@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from storage.cache import CachedStorage
+from storage.factory import ClientCache, StorageFactory
+from storage.local import LocalNetworkStorage
+from storage.s3 import S3Storage
+
+class TestStorageFactory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.factory = StorageFactory(ClientCache())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_legacy_json_list(self):
+        path = self._write("storage.json", json.dumps([
+            {"type": "local", "base_path": os.path.join(self.tmpdir, "store")},
+        ]))
+        backends = self.factory.load_from_config(path)
+        self.assertEqual(len(backends), 1)
+        self.assertIsInstance(backends[0], LocalNetworkStorage)
+
+    def test_yaml_builds_pooled_shared_s3_clients(self):
+        path = self._write("storage.yaml", f"""
+connection_pool:
+  max_connections: 64
+backends:
+  - type: s3
+    endpoint: minio.local:9000
+    bucket: first
+  - type: s3
+    endpoint: minio.local:9000
+    bucket: second
+  - type: s3
+    endpoint: https://other.example
+    bucket: third
+    connection_pool:
+      retries: 7
+  - type: local
+    path: {os.path.join(self.tmpdir, "store")}
+""")
+        backends = self.factory.load_from_config(path)
+        self.assertEqual([type(b) for b in backends], [S3Storage, S3Storage, S3Storage, LocalNetworkStorage])
+        first, second, third = backends[:3]
+        self.assertIs(first.s3_client, second.s3_client)
+        self.assertIsNot(first.s3_client, third.s3_client)
+        self.assertEqual(len(self.factory.clients), 2)
+
+        self.assertEqual(first.s3_client.meta.endpoint_url, "http://minio.local:9000")
+        self.assertEqual(first.s3_client.meta.config.max_pool_connections, 64)
+        self.assertTrue(first.s3_client.meta.config.tcp_keepalive)
+        # botocore counts the first attempt as well
+        self.assertEqual(third.s3_client.meta.config.retries["total_max_attempts"], 8)
+
+    def test_cache_section_wraps_remote_backends(self):
+        cache_dir = os.path.join(self.tmpdir, "cache")
+        path = self._write("storage.json", json.dumps({
+            "cache": {"dir": cache_dir, "max_bytes": 4096},
+            "backends": [
+                {"type": "s3", "id": "primary", "endpoint": "minio.local:9000", "bucket": "first"},
+                {"type": "s3", "endpoint": "minio.local:9000", "bucket": "second", "cache": {"max_bytes": 1024}},
+                {"type": "s3", "endpoint": "minio.local:9000", "bucket": "third", "cache": False},
+                {"type": "local", "base_path": os.path.join(self.tmpdir, "store")},
+            ],
+        }))
+        primary, second, third, local = self.factory.load_from_config(path)
+        self.assertIsInstance(primary, CachedStorage)
+        self.assertIsInstance(primary.backend, S3Storage)
+        self.assertEqual(primary.cache_dir, os.path.join(cache_dir, "primary"))
+        self.assertEqual(primary.max_bytes, 4096)
+        self.assertIsInstance(second, CachedStorage)
+        self.assertEqual(second.max_bytes, 1024)
+        self.assertNotEqual(second.cache_dir, primary.cache_dir)
+        self.assertIsInstance(third, S3Storage)
+        self.assertIsInstance(local, LocalNetworkStorage)
+
+    def test_cache_requires_a_directory(self):
+        path = self._write("storage.json", json.dumps({
+            "cache": {"max_bytes": 4096},
+            "backends": [{"type": "s3", "endpoint": "minio.local:9000", "bucket": "first"}],
+        }))
+        with self.assertRaises(ValueError):
+            self.factory.load_from_config(path)
+
+    def test_unknown_type_is_rejected(self):
+        path = self._write("storage.json", json.dumps({"backends": [{"type": "tape"}]}))
+        with self.assertRaises(ValueError):
+            self.factory.load_from_config(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from storage.cache import CachedStorage
+from storage.factory import ClientCache, StorageFactory
+from storage.topology import StorageTopology
+
+class TestStorageTopology(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmpdir, "storage.json")
+        self._write_config([{"type": "local", "id": "primary", "base_path": os.path.join(self.tmpdir, "a")}])
+        self.topology = StorageTopology(self.config_path, StorageFactory(ClientCache()))
+
+    def tearDown(self):
+        self.topology.stop_watching()
+        shutil.rmtree(self.tmpdir)
+
+    def _write_config(self, data) -> None:
+        with open(self.config_path, "w") as f:
+            json.dump(data, f)
+
+    def _read_config(self):
+        with open(self.config_path) as f:
+            return json.load(f)
+
+    def test_add_and_remove_persist_and_bump_version(self):
+        first = self.topology.current
+        self.assertEqual(first.version, 1)
+
+        snapshot = self.topology.add_backend({"type": "local", "base_path": os.path.join(self.tmpdir, "b")})
+        self.assertEqual(snapshot.version, 2)
+        self.assertEqual(len(snapshot.backends), 2)
+        saved = self._read_config()
+        self.assertEqual(len(saved), 2)
+        self.assertTrue(saved[1]["id"].startswith("local-"))
+        # The earlier snapshot is never modified
+        self.assertEqual(len(first.backends), 1)
+
+        snapshot = self.topology.remove_backend(saved[1]["id"])
+        self.assertEqual(snapshot.version, 3)
+        self.assertEqual([c["id"] for c in self._read_config()], ["primary"])
+        with self.assertRaises(KeyError):
+            self.topology.remove_backend("missing")
+
+    def test_unchanged_backends_are_reused(self):
+        primary = self.topology.current.find("primary")
+        self.topology.add_backend({"type": "local", "id": "secondary", "base_path": os.path.join(self.tmpdir, "b")})
+        self.assertIs(self.topology.current.find("primary"), primary)
+
+    def test_cache_section_wraps_remote_backends(self):
+        remote = {"type": "s3", "id": "remote", "endpoint": "minio.local:9000", "bucket": "sessions"}
+        self._write_config({"cache": {"dir": os.path.join(self.tmpdir, "cache")}, "backends": [remote]})
+        self.assertTrue(self.topology.reload())
+        cached = self.topology.current.find("remote")
+        self.assertIsInstance(cached, CachedStorage)
+        self.assertEqual(cached.cache_dir, os.path.join(self.tmpdir, "cache", "remote"))
+
+        # A new cache section rebuilds the backends that use it
+        self._write_config({"cache": {"dir": os.path.join(self.tmpdir, "other")}, "backends": [remote]})
+        self.assertTrue(self.topology.reload(force=True))
+        self.assertEqual(self.topology.current.find("remote").cache_dir, os.path.join(self.tmpdir, "other", "remote"))
+
+    def test_invalid_backend_is_not_persisted(self):
+        before = self._read_config()
+        with self.assertRaises(ValueError):
+            self.topology.add_backend({"type": "tape"})
+        with self.assertRaises(ValueError):
+            self.topology.add_backend({"type": "local", "id": "primary", "base_path": self.tmpdir})
+        self.assertEqual(self._read_config(), before)
+        self.assertEqual(self.topology.current.version, 1)
+
+    def test_rejected_reload_keeps_the_file_layout(self):
+        good = self._read_config()
+        self._write_config({"retention": {"days": 30}, "backends": good + [{"type": "tape"}]})
+        self.assertFalse(self.topology.reload())
+
+        # Backends added afterwards are written in the layout that was loaded
+        self.topology.add_backend({"type": "local", "id": "secondary", "base_path": os.path.join(self.tmpdir, "b")})
+        self.assertEqual([c["id"] for c in self._read_config()], ["primary", "secondary"])
+
+    def test_reload_picks_up_external_edits(self):
+        changes = []
+        self.topology.add_listener(lambda old, new: changes.append((old.version, new.version)))
+        self.assertFalse(self.topology.reload())
+
+        self._write_config(self._read_config() + [
+            {"type": "local", "id": "secondary", "base_path": os.path.join(self.tmpdir, "b")}
+        ])
+        self.assertTrue(self.topology.reload(force=True))
+        self.assertIsNotNone(self.topology.current.find("secondary"))
+        self.assertEqual(changes, [(1, 2)])
+
+        # A broken file keeps the last good topology
+        with open(self.config_path, "w") as f:
+            f.write("{not json")
+        self.assertFalse(self.topology.reload(force=True))
+        self.assertEqual(self.topology.current.version, 2)
+
+    def test_watcher_reloads_in_background(self):
+        self.topology.start_watching(interval=0.05)
+        self._write_config([{"type": "local", "id": "other", "base_path": os.path.join(self.tmpdir, "c")}])
+        deadline = time.monotonic() + 5
+        while self.topology.current.find("other") is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIsNotNone(self.topology.current.find("other"))
+        self.assertIsNone(self.topology.current.find("primary"))
+
+if __name__ == '__main__':
+    unittest.main()
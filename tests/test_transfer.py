@@ -0,0 +1,129 @@
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from storage.s3 import S3Storage
+from storage.transfer import RangeWriter, byte_ranges, iter_parts, map_bounded
+
+class FakeS3Client:
+    """
+    An in-memory stand-in for the boto3 calls used by the streaming methods.
+    """
+
+    def __init__(self, fail_part=None):
+        self.objects = {}
+        self.uploads = {}
+        self.fail_part = fail_part
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.uploads["upload"] = {}
+        return {"UploadId": "upload"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if PartNumber == self.fail_part:
+                raise IOError("part failed")
+            self.uploads[UploadId][PartNumber] = bytes(Body)
+            return {"ETag": f"etag-{PartNumber}"}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        self.objects[Key] = b"".join(parts[number] for number in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self.objects[Key]), "ETag": "etag"}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        data = self.objects[Key]
+        if Range:
+            start, end = map(int, Range[len("bytes="):].split("-"))
+            data = data[start:end + 1]
+        return {"Body": io.BytesIO(data)}
+
+class TestStreamingTransfers(unittest.TestCase):
+    PART_SIZE = 5 * 1024 * 1024
+
+    def test_iter_parts_rebuffers_sources(self):
+        pieces = [b"a" * 3, b"b" * 5, b"c" * 4]
+        self.assertEqual([len(p) for p in iter_parts(pieces, 5)], [5, 5, 2])
+        self.assertEqual(b"".join(iter_parts(io.BytesIO(b"x" * 11), 4)), b"x" * 11)
+        self.assertEqual(list(iter_parts(b"", 4)), [])
+        self.assertEqual(byte_ranges(10, 4), [(0, 3), (4, 7), (8, 9)])
+
+    def test_map_bounded_limits_in_flight(self):
+        consumed = []
+
+        def items():
+            for index in range(20):
+                consumed.append(index)
+                yield index
+
+        read_ahead = []
+
+        def double(index, item):
+            read_ahead.append(len(consumed) - index)
+            return item * 2
+
+        self.assertEqual(map_bounded(double, items(), 3), [i * 2 for i in range(20)])
+        # One item waits for a free slot besides the three in flight
+        self.assertLessEqual(max(read_ahead), 4)
+
+    def test_multipart_round_trip(self):
+        client = FakeS3Client()
+        storage = S3Storage(client, "bucket")
+        data = os.urandom(3 * self.PART_SIZE + 100)
+        locator = storage.upload_stream("session", io.BytesIO(data), part_size=self.PART_SIZE, max_concurrency=2)
+        self.assertEqual(client.objects[locator], data)
+        self.assertLessEqual(client.max_in_flight, 2)
+
+        buffer = bytearray(len(data))
+        self.assertEqual(storage.download_into(locator, buffer, part_size=1024 * 1024), len(data))
+        self.assertEqual(buffer, data)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "out")
+            storage.download_into(locator, path, part_size=2 * 1024 * 1024)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    def test_small_stream_uses_single_put(self):
+        client = FakeS3Client()
+        locator = S3Storage(client, "bucket").upload_stream("session", [b"small"], part_size=self.PART_SIZE)
+        self.assertEqual(client.objects[locator], b"small")
+        self.assertEqual(client.uploads, {})
+
+    def test_failed_part_aborts_upload(self):
+        client = FakeS3Client(fail_part=2)
+        storage = S3Storage(client, "bucket")
+        with self.assertRaises(IOError):
+            storage.upload_stream("session", os.urandom(2 * self.PART_SIZE + 1), part_size=self.PART_SIZE)
+        self.assertEqual(client.uploads, {})
+        self.assertEqual(client.objects, {})
+
+    def test_range_writer_rejects_small_buffer(self):
+        with self.assertRaises(ValueError):
+            RangeWriter(bytearray(3), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
+import io
 import unittest
 import os
 import time
-from transport.encryption import TransportEncryption
+from cryptography.exceptions import InvalidTag
+from transport.encryption import DEFAULT_MAX_STREAM_CHUNK_SIZE, TransportEncryption
 from transport.metadata import MetadataProtection
 
 class TestTransportEncryption(unittest.TestCase):
@@ -34,6 +36,214 @@ class TestTransportEncryption(unittest.TestCase):
         # The key should have changed
         self.assertNotEqual(initial_key, encryptor._key)
 
+class TestRecordLayer(unittest.TestCase):
+
+    def setUp(self):
+        self.encryptor = TransportEncryption(os.urandom(32))
+
+    def test_records_round_trip(self):
+        messages = [b"first", b"", b"third" * 1000]
+        out = bytearray()
+        written = self.encryptor.encrypt_records(messages, out, associated_data=b"ad")
+        self.assertEqual(written, len(out))
+        self.assertEqual(written, sum(TransportEncryption.record_size(len(m)) for m in messages))
+        self.assertEqual(self.encryptor.decrypt_records(out, associated_data=b"ad"), messages)
+
+    def test_buffer_into_preallocated_memoryview(self):
+        data = os.urandom(10000)
+        out = bytearray(8 + TransportEncryption.record_size(0) * 3 + len(data))
+        written = self.encryptor.encrypt_buffer(data, memoryview(out), offset=8, record_size=4096)
+        self.assertEqual(written, len(out) - 8)
+        plain = bytearray(len(data))
+        self.assertEqual(self.encryptor.decrypt_buffer(memoryview(out)[8:], plain), len(data))
+        self.assertEqual(plain, data)
+        with self.assertRaises(ValueError):
+            self.encryptor.encrypt_buffer(data, memoryview(bytearray(10)))
+
+    def _record_nonces(self, encryptor, count):
+        out = bytearray()
+        encryptor.encrypt_records([b"x"] * count, out)
+        record = TransportEncryption.record_size(1)
+        return {bytes(out[i + 5:i + 17]) for i in range(0, len(out), record)}
+
+    def test_counter_nonces_are_unique(self):
+        nonces = self._record_nonces(TransportEncryption(os.urandom(32), role="initiator"), 100)
+        self.assertEqual(len(nonces), 100)
+        self.assertEqual(len({nonce[:4] for nonce in nonces}), 1)
+
+    def test_nonces_are_random_without_a_role(self):
+        # Both peers seal under the same key, so no counter is shared
+        nonces = self._record_nonces(self.encryptor, 100)
+        self.assertEqual(len(nonces), 100)
+        self.assertEqual(len({nonce[:4] for nonce in nonces}), 100)
+        self.assertNotEqual(self.encryptor.encrypt(b"x")[1:13], self.encryptor.encrypt(b"x")[1:13])
+
+    def test_tampering_is_detected(self):
+        out = bytearray()
+        self.encryptor.encrypt_records([b"payload"], out)
+        out[-1] ^= 1
+        with self.assertRaises(InvalidTag):
+            self.encryptor.decrypt_records(out)
+        with self.assertRaises(ValueError):
+            self.encryptor.decrypt_records(out[:-3])
+
+    def test_rekey_checked_once_per_batch(self):
+        self.encryptor.REKEY_BYTES_THRESHOLD = 100
+        key = self.encryptor._key
+        out = bytearray()
+        self.encryptor.encrypt_records([b"x" * 50] * 10, out)
+        self.assertEqual(self.encryptor._key, key)
+        self.assertEqual(len(self.encryptor.decrypt_records(out)), 10)
+        self.encryptor.encrypt_records([b"x"], bytearray())
+        self.assertNotEqual(self.encryptor._key, key)
+
+class TestStreamEncryption(unittest.TestCase):
+
+    def setUp(self):
+        self.encryptor = TransportEncryption(os.urandom(32))
+
+    def _encrypt(self, data, **kwargs):
+        return b"".join(self.encryptor.encrypt_stream(data, **kwargs))
+
+    def test_round_trip_at_chunk_boundaries(self):
+        for size in [0, 1, 1023, 1024, 1025, 4096]:
+            data = os.urandom(size)
+            sealed = self._encrypt(data, chunk_size=1024)
+            self.assertEqual(b"".join(self.encryptor.decrypt_stream(sealed)), data)
+            # Arbitrary network-sized pieces
+            pieces = [sealed[i:i + 100] for i in range(0, len(sealed), 100)]
+            self.assertEqual(b"".join(self.encryptor.decrypt_stream(pieces)), data)
+
+    def test_streams_from_file_and_generator(self):
+        data = os.urandom(10000)
+        sealed = self._encrypt(io.BytesIO(data), chunk_size=4096)
+        self.assertEqual(b"".join(self.encryptor.decrypt_stream(io.BytesIO(sealed))), data)
+        pieces = (data[i:i + 333] for i in range(0, len(data), 333))
+        self.assertEqual(b"".join(self.encryptor.decrypt_stream(self._encrypt(pieces, chunk_size=4096))), data)
+
+    def test_decrypts_before_the_end_arrives(self):
+        data = os.urandom(5000)
+        sealed = self._encrypt(data, chunk_size=1000)
+        stream = self.encryptor.decrypt_stream(iter([sealed[:2500]]))
+        self.assertEqual(next(stream), data[:1000])
+
+    def test_truncation_and_reordering_are_detected(self):
+        sealed = self._encrypt(os.urandom(3000), chunk_size=1000)
+        header = 22
+        chunk = 1000 + 16
+        with self.assertRaises(InvalidTag):
+            list(self.encryptor.decrypt_stream(sealed[:header + 2 * chunk]))
+        swapped = sealed[:header] + sealed[header + chunk:header + 2 * chunk] + sealed[header:header + chunk] + sealed[header + 2 * chunk:]
+        with self.assertRaises(InvalidTag):
+            list(self.encryptor.decrypt_stream(swapped))
+        with self.assertRaises(ValueError):
+            list(self.encryptor.decrypt_stream(sealed[:10]))
+
+    def test_associated_data_is_bound(self):
+        sealed = self._encrypt(b"payload", associated_data=b"session-1")
+        with self.assertRaises(InvalidTag):
+            list(self.encryptor.decrypt_stream(sealed, associated_data=b"session-2"))
+
+    def test_oversized_chunks_are_rejected(self):
+        sealed = self._encrypt(os.urandom(3000), chunk_size=2048)
+        with self.assertRaises(ValueError):
+            list(self.encryptor.decrypt_stream(sealed, max_chunk_size=1024))
+        self.assertEqual(len(b"".join(self.encryptor.decrypt_stream(sealed, max_chunk_size=2048))), 3000)
+        # A forged header announcing 4 GiB chunks is refused before any buffering
+        forged = bytearray(sealed[:22])
+        forged[18:22] = (2 ** 32 - 1).to_bytes(4, "big")
+        pieces = iter([bytes(forged), b"\0" * 4096])
+        with self.assertRaises(ValueError):
+            list(self.encryptor.decrypt_stream(pieces))
+
+    def test_encrypt_stream_respects_the_reader_limit(self):
+        with self.assertRaises(ValueError):
+            self._encrypt(b"payload", chunk_size=DEFAULT_MAX_STREAM_CHUNK_SIZE + 1)
+        with self.assertRaises(ValueError):
+            self._encrypt(b"payload", chunk_size=2048, max_chunk_size=1024)
+        data = os.urandom(3000)
+        sealed = self._encrypt(data, chunk_size=DEFAULT_MAX_STREAM_CHUNK_SIZE)
+        self.assertEqual(b"".join(self.encryptor.decrypt_stream(sealed)), data)
+
+class TestKeyEpochs(unittest.TestCase):
+
+    def setUp(self):
+        key = os.urandom(32)
+        self.sender = TransportEncryption(key)
+        self.receiver = TransportEncryption(key)
+
+    def test_decrypts_messages_sealed_before_a_rekey(self):
+        before = self.sender.encrypt(b"before")
+        records = bytearray()
+        self.sender.encrypt_records([b"record"], records)
+        stream = b"".join(self.sender.encrypt_stream(b"stream"))
+        self.sender._rekey()
+        after = self.sender.encrypt(b"after")
+        # Out of order, across the rekey, on both ends
+        self.assertEqual(self.sender.decrypt(after), b"after")
+        self.assertEqual(self.sender.decrypt(before), b"before")
+        self.assertEqual(self.sender.decrypt_records(records), [b"record"])
+        self.assertEqual(b"".join(self.sender.decrypt_stream(stream)), b"stream")
+
+    def test_receiver_ratchets_forward(self):
+        self.sender._rekey()
+        self.sender._rekey()
+        message = self.sender.encrypt(b"ahead")
+        self.assertEqual(self.receiver.decrypt(message), b"ahead")
+        self.assertEqual(self.receiver._epoch, self.sender._epoch)
+        self.assertEqual(self.receiver._key, self.sender._key)
+        # Messages from the skipped epochs stay readable
+        self.assertIn(1, self.receiver._previous)
+
+    def test_forged_epoch_does_not_ratchet(self):
+        message = bytearray(self.sender.encrypt(b"payload"))
+        message[0] = 2
+        with self.assertRaises(InvalidTag):
+            self.receiver.decrypt(bytes(message))
+        self.assertEqual(self.receiver._epoch, 0)
+
+    def test_window_is_bounded(self):
+        old = self.sender.encrypt(b"old")
+        for _ in range(TransportEncryption.KEY_WINDOW + 1):
+            self.sender._rekey()
+        self.assertEqual(len(self.sender._previous), TransportEncryption.KEY_WINDOW)
+        with self.assertRaises(ValueError):
+            self.sender.decrypt(old)
+
+class TestDirectionKeys(unittest.TestCase):
+
+    def setUp(self):
+        key = os.urandom(32)
+        self.initiator = TransportEncryption(key, role="initiator")
+        self.responder = TransportEncryption(key, role="responder")
+
+    def test_each_direction_has_its_own_key(self):
+        # Even with the same prefix and counter, the two senders never
+        # seal under the same key and nonce
+        self.responder._nonce_prefix = self.initiator._nonce_prefix
+        sent = self.initiator.encrypt(b"payload")
+        received = self.responder.encrypt(b"payload")
+        self.assertEqual(sent[:13], received[:13])
+        self.assertNotEqual(sent, received)
+        self.assertEqual(self.responder.decrypt(sent), b"payload")
+        self.assertEqual(self.initiator.decrypt(received), b"payload")
+        with self.assertRaises(InvalidTag):
+            self.initiator.decrypt(sent)
+
+    def test_records_and_ratchet_across_roles(self):
+        self.initiator._rekey()
+        out = bytearray()
+        self.initiator.encrypt_records([b"ahead"], out)
+        self.assertEqual(self.responder.decrypt_records(out), [b"ahead"])
+        self.assertEqual(self.responder._epoch, 1)
+        self.assertEqual(self.initiator.decrypt(self.responder.encrypt(b"reply")), b"reply")
+        stream = b"".join(self.initiator.encrypt_stream(b"stream"))
+        self.assertEqual(b"".join(self.responder.decrypt_stream(stream)), b"stream")
+
+    def test_unknown_role_is_rejected(self):
+        with self.assertRaises(ValueError):
+            TransportEncryption(os.urandom(32), role="client")
+
 class TestMetadataProtection(unittest.TestCase):
 
     def test_padding(self):
@@ -0,0 +1,158 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tsm_ai_security import FeatureReservoir, SessionSecurityAI
+
+SAMPLE_SESSION = {
+    "last_login_time": "23:50",
+    "message_frequency_per_hour": 150,
+    "api_calls_last_24h": 80
+}
+
+class TestSessionSecurityAIPersistence(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp_dir.name, "models", "session_ai.joblib")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_trains_and_persists_when_model_missing(self):
+        ai = SessionSecurityAI(model_path=self.model_path)
+        self.assertTrue(os.path.exists(self.model_path))
+        self.assertIsNotNone(ai.analyze_session(SAMPLE_SESSION))
+
+    def test_loaded_model_matches_trained_model(self):
+        trained = SessionSecurityAI(model_path=self.model_path)
+        loaded = SessionSecurityAI(model_path=self.model_path)
+        self.assertAlmostEqual(
+            trained.analyze_session(SAMPLE_SESSION).risk_score,
+            loaded.analyze_session(SAMPLE_SESSION).risk_score,
+        )
+
+    def test_load_without_mmap(self):
+        SessionSecurityAI(model_path=self.model_path)
+        ai = SessionSecurityAI(model_path=self.model_path, mmap_mode=None)
+        self.assertIsNotNone(ai.analyze_session(SAMPLE_SESSION))
+
+class TestSessionSecurityAIBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.ai = SessionSecurityAI()
+        self.sessions = [
+            SAMPLE_SESSION,
+            {"last_login_time": "12:15", "message_frequency_per_hour": 10, "api_calls_last_24h": 5},
+            {"last_login_time": "03:05", "message_frequency_per_hour": 900, "api_calls_last_24h": 99},
+        ]
+
+    def test_bulk_matches_single_session_analysis(self):
+        batch = {
+            key: np.array([session[key] for session in self.sessions])
+            for key in SAMPLE_SESSION
+        }
+        bulk_reports = list(self.ai.analyze_sessions_bulk(batch, batch_size=2))
+        self.assertEqual(len(bulk_reports), len(self.sessions))
+        for session, report in zip(self.sessions, bulk_reports):
+            expected = self.ai.analyze_session(session)
+            self.assertAlmostEqual(expected.risk_score, report.risk_score)
+            self.assertEqual(expected.threats, report.threats)
+
+    def test_bulk_accepts_numeric_login_hours(self):
+        batch = {
+            "last_login_time": np.array([23, 12]),
+            "message_frequency_per_hour": np.array([150, 10]),
+            "api_calls_last_24h": np.array([80, 5]),
+        }
+        reports = list(self.ai.analyze_sessions_bulk(batch))
+        self.assertAlmostEqual(
+            reports[0].risk_score, self.ai.analyze_session(SAMPLE_SESSION).risk_score
+        )
+
+def varied_sessions(count):
+    rng = np.random.RandomState(7)
+    return [
+        {
+            "last_login_time": f"{rng.randint(24):02d}:00",
+            "message_frequency_per_hour": int(rng.randint(1000)),
+            "api_calls_last_24h": int(rng.randint(100)),
+        }
+        for _ in range(count)
+    ]
+
+class TestSessionSecurityAIRetraining(unittest.TestCase):
+
+    def test_reservoir_is_bounded(self):
+        reservoir = FeatureReservoir(capacity=10)
+        for i in range(100):
+            reservoir.add(np.array([[i, i, i]]))
+        self.assertEqual(len(reservoir), 10)
+        self.assertEqual(reservoir.snapshot().shape, (10, 3))
+
+    def test_only_observed_sessions_feed_reservoir(self):
+        ai = SessionSecurityAI()
+        ai.analyze_session(SAMPLE_SESSION)
+        self.assertEqual(len(ai.reservoir), 0)
+        ai.analyze_session(SAMPLE_SESSION, observe=True)
+        self.assertEqual(len(ai.reservoir), 1)
+
+    def test_retrain_requires_min_samples(self):
+        ai = SessionSecurityAI()
+        original_model = ai.model
+        ai.analyze_session(SAMPLE_SESSION, observe=True)
+        self.assertFalse(ai.retrain(min_samples=2))
+        self.assertIs(ai.model, original_model)
+
+    def test_retrain_swaps_model(self):
+        ai = SessionSecurityAI()
+        original_model = ai.model
+        for session in varied_sessions(20):
+            ai.analyze_session(session, observe=True)
+        self.assertTrue(ai.retrain(min_samples=10, min_distinct=10))
+        self.assertIsNot(ai.model, original_model)
+
+    def test_repeated_sessions_do_not_replace_the_model(self):
+        ai = SessionSecurityAI()
+        original_model = ai.model
+        before = ai.analyze_session(SAMPLE_SESSION).risk_score
+        for _ in range(300):
+            ai.analyze_session(SAMPLE_SESSION, observe=True)
+        self.assertFalse(ai.retrain(min_samples=10))
+        self.assertIs(ai.model, original_model)
+        self.assertEqual(ai.analyze_session(SAMPLE_SESSION).risk_score, before)
+
+    def test_retraining_is_reproducible(self):
+        first, second = SessionSecurityAI(), SessionSecurityAI()
+        for session in varied_sessions(50):
+            first.analyze_session(session, observe=True)
+            second.analyze_session(session, observe=True)
+        self.assertTrue(first.retrain(min_samples=10, min_distinct=10))
+        self.assertTrue(second.retrain(min_samples=10, min_distinct=10))
+        self.assertEqual(
+            first.analyze_session(SAMPLE_SESSION).risk_score,
+            second.analyze_session(SAMPLE_SESSION).risk_score,
+        )
+
+    def test_background_retraining(self):
+        ai = SessionSecurityAI()
+        original_model = ai.model
+        for session in varied_sessions(20):
+            ai.analyze_session(session, observe=True)
+        ai.start_retraining(interval=0.05, min_samples=10, min_distinct=10)
+        try:
+            deadline = time.time() + 5
+            while ai.model is original_model and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            ai.stop_retraining()
+        self.assertIsNot(ai.model, original_model)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,25 +1,112 @@
 import os
+import struct
 import time
+from collections import OrderedDict
 from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes
 
+NONCE_SIZE = 12
+NONCE_PREFIX_SIZE = 4
+TAG_SIZE = 16
+
+# Peers sharing a key chain take opposite roles, and each direction is
+# sealed under its own key derived from the chain.
+ROLES = ("initiator", "responder")
+
+# Every key is numbered by an epoch that wraps at 256. Messages, records and
+# streams carry the epoch of their key so the receiver can pick the right
+# key across rekeys.
+EPOCH_MODULUS = 256
+
+# A message is the key epoch, the nonce and the ciphertext with its tag.
+MESSAGE_OVERHEAD = 1 + NONCE_SIZE + TAG_SIZE
+
+# A record is the key epoch, a big-endian plaintext length, the nonce and
+# the ciphertext with its tag.
+RECORD_HEADER = struct.Struct(">BI12s")
+RECORD_NONCE_OFFSET = 5
+RECORD_OVERHEAD = RECORD_HEADER.size + TAG_SIZE
+DEFAULT_RECORD_SIZE = 64 * 1024
+
+# A stream starts with a format version, the key epoch, a random salt for
+# its subkey and the plaintext chunk size. Chunk nonces are a 7-byte zero prefix, a 32-bit
+# chunk counter and a flag byte that is 1 only on the final chunk (the
+# STREAM construction), so chunks cannot be reordered, dropped or
+# truncated without failing authentication.
+STREAM_VERSION = 2
+STREAM_HEADER = struct.Struct(">BB16sI")
+STREAM_NONCE = struct.Struct(">7xIB")
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024
+# The largest chunk size a stream header may announce by default. The
+# header is unauthenticated until its first chunk opens, so the receiver
+# bounds how much it will buffer.
+DEFAULT_MAX_STREAM_CHUNK_SIZE = 1024 * 1024
+MAX_STREAM_CHUNKS = 2 ** 32
+
+# encrypt_into/decrypt_into write straight into a buffer (cryptography >= 45)
+_HAS_INTO = hasattr(ChaCha20Poly1305, "encrypt_into")
+
 class TransportEncryption:
     """
     Provides encryption and decryption using ChaCha20-Poly1305 with rekeying.
+
+    Both peers of a connection hold the same key chain, so they should be
+    given opposite `role`s. Each direction then seals under its own key,
+    derived from the chain key as in TLS 1.3, and its nonces are a random
+    4-byte prefix, drawn once per key, followed by a 64-bit message
+    counter: one sender never repeats a nonce under a key and makes no
+    call to the system random source per message. Without a role, both
+    peers seal under the chain key itself, so a counter could collide
+    with the peer's; each message then gets a fully random 96-bit nonce
+    instead. Streams are not affected, because each stream has its own
+    subkey derived from a random 128-bit salt.
+
+    Besides single messages, a record API encrypts batches of messages, or
+    a large buffer split into fixed-size records, into a caller-supplied
+    buffer. A batch checks the rekey thresholds once and is encrypted
+    under a single key, and records are written in place without
+    intermediate copies.
+
+    Payloads too large to hold in memory go through `encrypt_stream` and
+    `decrypt_stream`, which work chunk by chunk under a per-stream subkey.
+
+    Rekeying never breaks messages in flight. Everything sent carries the
+    epoch of its key, and the contexts of the last `KEY_WINDOW` epochs are
+    kept for decryption, so data sealed just before a rekey still opens
+    after it. A peer that has rekeyed first is followed by ratcheting the
+    key chain forward, by at most `MAX_RATCHET_STEPS` epochs, once a
+    message under the newer key authenticates. Keys that leave the window
+    are discarded.
     """
     REKEY_BYTES_THRESHOLD = 1024 * 1024 * 1024  # 1 GB
     REKEY_TIME_THRESHOLD = 300  # 5 minutes
+    KEY_WINDOW = 4
+    MAX_RATCHET_STEPS = 4
 
-    def __init__(self, initial_key):
+    def __init__(self, initial_key, role=None):
+        """
+        Args:
+            initial_key: The 32-byte key the chain starts from.
+            role: "initiator" or "responder", opposite to the peer's, or
+                  None to seal and open under the chain key itself.
+        """
+        if role is not None and role not in ROLES:
+            raise ValueError(f"Unknown role: {role}")
+        self.role = role
         self._key = initial_key
+        self._epoch = 0
+        self._previous = OrderedDict()  # epoch -> (key, opening aead), oldest first
         self._bytes_encrypted = 0
         self._last_rekey_time = time.time()
-        self._aead = ChaCha20Poly1305(self._key)
+        self._aead, self._open_aead = self._direction_aeads(self._key)
+        self._nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self._counter = 0
 
-    def _rekey(self):
+    @staticmethod
+    def _next_key(key):
         """
-        Derives a new key using HKDF-SHA3-512.
+        Derives the next key in the chain using HKDF-SHA3-512.
         """
         hkdf = HKDF(
             algorithm=hashes.SHA3_512(),
@@ -27,11 +114,105 @@ class TransportEncryption:
             salt=None,
             info=b'rekeying',
         )
-        self._key = hkdf.derive(self._key)
-        self._aead = ChaCha20Poly1305(self._key)
+        return hkdf.derive(key)
+
+    @staticmethod
+    def _direction_key(key, role):
+        """
+        Derives the key sealing the messages sent by `role`.
+        """
+        hkdf = HKDF(
+            algorithm=hashes.SHA3_512(),
+            length=32,
+            salt=None,
+            info=b'direction ' + role.encode(),
+        )
+        return hkdf.derive(key)
+
+    def _direction_aeads(self, key):
+        """
+        Returns the AEADs sealing our messages and opening the peer's under
+        a chain key.
+        """
+        if self.role is None:
+            aead = ChaCha20Poly1305(key)
+            return aead, aead
+        peer = ROLES[1 - ROLES.index(self.role)]
+        return (
+            ChaCha20Poly1305(self._direction_key(key, self.role)),
+            ChaCha20Poly1305(self._direction_key(key, peer)),
+        )
+
+    def _install(self, key):
+        """
+        Makes `key` the key of the next epoch, keeping the current one in
+        the decryption window.
+        """
+        self._previous[self._epoch] = (self._key, self._open_aead)
+        while len(self._previous) > self.KEY_WINDOW:
+            self._previous.popitem(last=False)
+        self._key = key
+        self._aead, self._open_aead = self._direction_aeads(self._key)
+        self._epoch = (self._epoch + 1) % EPOCH_MODULUS
+        self._nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self._counter = 0
         self._bytes_encrypted = 0
         self._last_rekey_time = time.time()
 
+    def _rekey(self):
+        """
+        Moves to the next key in the chain.
+        """
+        self._install(self._next_key(self._key))
+
+    def _resolve_epoch(self, epoch):
+        """
+        Finds the key for an epoch.
+
+        Returns:
+            The key, the AEAD opening the peer's data and the keys to install with `_ratchet` once
+            data under the epoch has authenticated (empty unless the epoch
+            is ahead of ours).
+
+        Raises:
+            ValueError: If the epoch is outside the window and too far ahead.
+        """
+        if epoch == self._epoch:
+            return self._key, self._open_aead, []
+        if epoch in self._previous:
+            key, aead = self._previous[epoch]
+            return key, aead, []
+        steps = (epoch - self._epoch) % EPOCH_MODULUS
+        if steps > self.MAX_RATCHET_STEPS:
+            raise ValueError(f"Key epoch {epoch} is outside the decryption window.")
+        keys = []
+        key = self._key
+        for _ in range(steps):
+            key = self._next_key(key)
+            keys.append(key)
+        return key, self._direction_aeads(key)[1], keys
+
+    def _ratchet(self, epoch, keys):
+        """
+        Advances to `epoch` with keys from `_resolve_epoch`, skipping any
+        steps already taken since they were derived.
+        """
+        steps = (epoch - self._epoch) % EPOCH_MODULUS
+        if 0 < steps <= len(keys):
+            for key in keys[-steps:]:
+                self._install(key)
+
+    def _open(self, epoch, nonce, sealed, associated_data):
+        """
+        Decrypts one message under the key of its epoch.
+        """
+        if epoch == self._epoch:
+            return self._open_aead.decrypt(nonce, sealed, associated_data)
+        _, aead, ratchet = self._resolve_epoch(epoch)
+        plaintext = aead.decrypt(nonce, sealed, associated_data)
+        self._ratchet(epoch, ratchet)
+        return plaintext
+
     def _should_rekey(self):
         """
         Checks if a rekey is needed based on bytes encrypted or time elapsed.
@@ -42,6 +223,18 @@ class TransportEncryption:
             return True
         return False
 
+    def _nonces(self, count):
+        """
+        Returns `count` fresh nonces for the current key: counter nonces
+        with a role, random ones without.
+        """
+        if self.role is None:
+            data = os.urandom(NONCE_SIZE * count)
+            return [data[i:i + NONCE_SIZE] for i in range(0, len(data), NONCE_SIZE)]
+        first = self._counter
+        self._counter += count
+        return [self._nonce_prefix + (first + i).to_bytes(8, "big") for i in range(count)]
+
     def encrypt(self, plaintext, associated_data=None):
         """
         Encrypts the given plaintext.
@@ -49,15 +242,284 @@ class TransportEncryption:
         if self._should_rekey():
             self._rekey()
 
-        nonce = os.urandom(12)
+        nonce = self._nonces(1)[0]
         ciphertext = self._aead.encrypt(nonce, plaintext, associated_data)
         self._bytes_encrypted += len(ciphertext)
-        return nonce + ciphertext
+        return bytes((self._epoch,)) + nonce + ciphertext
 
     def decrypt(self, ciphertext, associated_data=None):
         """
-        Decrypts the given ciphertext.
+        Decrypts the given ciphertext, with the key of the epoch it was
+        encrypted under.
+        """
+        if len(ciphertext) < MESSAGE_OVERHEAD:
+            raise ValueError("Ciphertext is too short.")
+        with memoryview(ciphertext) as view:
+            return self._open(view[0], view[1:1 + NONCE_SIZE], view[1 + NONCE_SIZE:], associated_data)
+
+    @staticmethod
+    def record_size(plaintext_length):
+        """
+        Returns the encrypted size of a record holding `plaintext_length` bytes.
+        """
+        return plaintext_length + RECORD_OVERHEAD
+
+    def encrypt_records(self, messages, out, offset=0, associated_data=None):
+        """
+        Encrypts a batch of messages as consecutive records.
+
+        Args:
+            messages: An iterable of bytes-like messages.
+            out: The output buffer. A bytearray is grown as needed; any
+                 other writable buffer must have room for all records.
+            offset: Where in `out` the first record is written.
+            associated_data: Authenticated with every record.
+
+        Returns:
+            The number of bytes written.
+        """
+        messages = [memoryview(message).cast("B") for message in messages]
+        total = sum(len(message) for message in messages) + RECORD_OVERHEAD * len(messages)
+        if isinstance(out, bytearray) and offset + total > len(out):
+            out.extend(bytes(offset + total - len(out)))
+
+        if self._should_rekey():
+            self._rekey()
+        aead, epoch = self._aead, self._epoch
+        nonces = self._nonces(len(messages))
+
+        with memoryview(out).cast("B") as view:
+            if offset + total > len(view):
+                raise ValueError(f"Buffer of {len(view)} bytes cannot hold {total} bytes at offset {offset}.")
+            pos = offset
+            for message, nonce in zip(messages, nonces):
+                RECORD_HEADER.pack_into(view, pos, epoch, len(message), nonce)
+                start = pos + RECORD_HEADER.size
+                end = start + len(message) + TAG_SIZE
+                if _HAS_INTO:
+                    aead.encrypt_into(nonce, message, associated_data, view[start:end])
+                else:
+                    view[start:end] = aead.encrypt(nonce, bytes(message), associated_data)
+                pos = end
+        self._bytes_encrypted += total
+        return total
+
+    def encrypt_buffer(self, data, out, offset=0, record_size=DEFAULT_RECORD_SIZE, associated_data=None):
+        """
+        Splits a buffer into records of `record_size` plaintext bytes (the
+        last may be shorter) and encrypts them as one batch.
+
+        Returns:
+            The number of bytes written.
+        """
+        if record_size <= 0:
+            raise ValueError("Record size must be positive.")
+        view = memoryview(data).cast("B")
+        records = [view[start:start + record_size] for start in range(0, len(view), record_size)]
+        return self.encrypt_records(records, out, offset, associated_data)
+
+    @staticmethod
+    def _iter_records(view):
+        """
+        Yields (epoch, nonce, sealed) for each record in a buffer.
+        """
+        pos = 0
+        while pos < len(view):
+            if len(view) - pos < RECORD_OVERHEAD:
+                raise ValueError("Truncated record header.")
+            epoch, length = struct.unpack_from(">BI", view, pos)
+            start = pos + RECORD_HEADER.size
+            end = start + length + TAG_SIZE
+            if end > len(view):
+                raise ValueError("Truncated record.")
+            yield epoch, view[pos + RECORD_NONCE_OFFSET:start], view[start:end]
+            pos = end
+
+    def decrypt_records(self, data, associated_data=None):
+        """
+        Decrypts consecutive records into a list of messages.
+
+        Raises:
+            cryptography.exceptions.InvalidTag: If a record fails authentication.
+            ValueError: If the data ends in the middle of a record.
+        """
+        with memoryview(data).cast("B") as view:
+            return [
+                self._open(epoch, nonce, sealed, associated_data)
+                for epoch, nonce, sealed in self._iter_records(view)
+            ]
+
+    def decrypt_buffer(self, data, out, offset=0, associated_data=None):
+        """
+        Decrypts consecutive records and writes their plaintexts back to
+        back into `out`, the reverse of `encrypt_buffer`.
+
+        Returns:
+            The number of plaintext bytes written.
+        """
+        with memoryview(data).cast("B") as view:
+            records = list(self._iter_records(view))
+            total = sum(len(sealed) - TAG_SIZE for _, _, sealed in records)
+            if isinstance(out, bytearray) and offset + total > len(out):
+                out.extend(bytes(offset + total - len(out)))
+            with memoryview(out).cast("B") as target:
+                if offset + total > len(target):
+                    raise ValueError(f"Buffer of {len(target)} bytes cannot hold {total} bytes at offset {offset}.")
+                pos = offset
+                for epoch, nonce, sealed in records:
+                    size = len(sealed) - TAG_SIZE
+                    _, aead, ratchet = self._resolve_epoch(epoch)
+                    if _HAS_INTO:
+                        aead.decrypt_into(nonce, sealed, associated_data, target[pos:pos + size])
+                    else:
+                        target[pos:pos + size] = aead.decrypt(bytes(nonce), bytes(sealed), associated_data)
+                    self._ratchet(epoch, ratchet)
+                    pos += size
+            return total
+
+    @staticmethod
+    def _stream_aead(key, salt):
+        """
+        Derives the AEAD for one stream from a transport key and its salt.
+        """
+        hkdf = HKDF(
+            algorithm=hashes.SHA3_512(),
+            length=32,
+            salt=salt,
+            info=b'stream',
+        )
+        return ChaCha20Poly1305(hkdf.derive(key))
+
+    @staticmethod
+    def _iter_source(source, size):
+        """
+        Yields a bytes-like object, a file-like object or an iterable of
+        bytes-like pieces as pieces of at most about `size` bytes.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source).cast("B")
+            for start in range(0, len(view), size):
+                yield view[start:start + size]
+        elif hasattr(source, "read"):
+            yield from iter(lambda: source.read(size), b"")
+        else:
+            yield from source
+
+    def encrypt_stream(
+        self,
+        source,
+        chunk_size=DEFAULT_STREAM_CHUNK_SIZE,
+        associated_data=None,
+        max_chunk_size=DEFAULT_MAX_STREAM_CHUNK_SIZE,
+    ):
+        """
+        Encrypts a payload of any size in constant memory.
+
+        The plaintext is read one chunk ahead, so the final chunk can be
+        flagged as such; an empty payload yields a single empty final chunk.
+
+        Args:
+            source: A bytes-like object, a readable file-like object or an
+                    iterable of bytes-like pieces of any size.
+            chunk_size: The plaintext size of every chunk but the last.
+            associated_data: Authenticated with every chunk.
+            max_chunk_size: The largest chunk size allowed, which must not
+                            exceed the receiver's `decrypt_stream` limit.
+
+        Yields:
+            The stream header, then one ciphertext per chunk.
+
+        Raises:
+            ValueError: If `chunk_size` is not between 1 and
+                `max_chunk_size`, so a stream is never written that the
+                receiver would reject.
+        """
+        if not 0 < chunk_size <= min(max_chunk_size, 2 ** 32 - 1):
+            raise ValueError(f"Stream chunk size {chunk_size} must be between 1 and {max_chunk_size}.")
+        if self._should_rekey():
+            self._rekey()
+        salt = os.urandom(16)
+        aead = self._stream_aead(self._key, salt)
+        yield STREAM_HEADER.pack(STREAM_VERSION, self._epoch, salt, chunk_size)
+
+        buffer = bytearray()
+        counter = 0
+        for piece in self._iter_source(source, chunk_size):
+            buffer += piece
+            # Keep at least one byte back: only the last chunk is final
+            while len(buffer) > chunk_size:
+                with memoryview(buffer) as view:
+                    chunk = aead.encrypt(STREAM_NONCE.pack(counter, 0), view[:chunk_size], associated_data)
+                del buffer[:chunk_size]
+                counter += 1
+                if counter >= MAX_STREAM_CHUNKS:
+                    raise OverflowError("Stream has too many chunks.")
+                self._bytes_encrypted += len(chunk)
+                yield chunk
+        chunk = aead.encrypt(STREAM_NONCE.pack(counter, 1), bytes(buffer), associated_data)
+        self._bytes_encrypted += len(chunk)
+        yield chunk
+
+    def decrypt_stream(self, source, associated_data=None, max_chunk_size=DEFAULT_MAX_STREAM_CHUNK_SIZE):
+        """
+        Decrypts a stream from `encrypt_stream` in constant memory.
+
+        Chunks are decrypted as soon as they are complete and known not to
+        be the last one. Every chunk is authenticated before it is yielded,
+        but the stream as a whole is only known to be complete once the
+        generator finishes without raising, so a consumer must not act on
+        the output before then.
+
+        Args:
+            source: A bytes-like object, a readable file-like object or an
+                    iterable of byte pieces of any size.
+            associated_data: As given to `encrypt_stream`.
+            max_chunk_size: The largest chunk size accepted from the
+                            header, bounding the memory a stream can
+                            make the receiver buffer.
+
+        Yields:
+            The plaintext chunks.
+
+        Raises:
+            cryptography.exceptions.InvalidTag: If a chunk fails
+                authentication, including a truncated or reordered stream.
+            ValueError: If the header is missing or malformed, announces
+                chunks larger than `max_chunk_size`, or its key epoch is
+                outside the decryption window.
         """
-        nonce = ciphertext[:12]
-        ciphertext = ciphertext[12:]
-        return self._aead.decrypt(nonce, ciphertext, associated_data)
+        buffer = bytearray()
+        aead = None
+        sealed_size = None
+        epoch = None
+        ratchet = []
+        counter = 0
+        for piece in self._iter_source(source, DEFAULT_STREAM_CHUNK_SIZE + TAG_SIZE):
+            buffer += piece
+            if aead is None:
+                if len(buffer) < STREAM_HEADER.size:
+                    continue
+                version, epoch, salt, chunk_size = STREAM_HEADER.unpack_from(buffer)
+                if version != STREAM_VERSION:
+                    raise ValueError(f"Unsupported stream version {version}.")
+                if chunk_size > max_chunk_size:
+                    raise ValueError(f"Stream chunk size {chunk_size} exceeds the limit of {max_chunk_size}.")
+                key, _, ratchet = self._resolve_epoch(epoch)
+                aead = self._stream_aead(key, salt)
+                sealed_size = chunk_size + TAG_SIZE
+                del buffer[:STREAM_HEADER.size]
+            while len(buffer) > sealed_size:
+                with memoryview(buffer) as view:
+                    chunk = aead.decrypt(STREAM_NONCE.pack(counter, 0), view[:sealed_size], associated_data)
+                del buffer[:sealed_size]
+                counter += 1
+                if ratchet:
+                    # The sender's newer key is proven, follow it
+                    self._ratchet(epoch, ratchet)
+                    ratchet = []
+                yield chunk
+        if aead is None:
+            raise ValueError("Truncated stream header.")
+        chunk = aead.decrypt(STREAM_NONCE.pack(counter, 1), bytes(buffer), associated_data)
+        self._ratchet(epoch, ratchet)
+        yield chunk
@@ -5,12 +5,22 @@ AUTHOR: JULES
 DESCRIPTION: AI-powered security analysis for TSM sessions.
 """
 
+import logging
+import os
+import random
+import tempfile
+import threading
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Mapping, Optional
 
+import joblib
 import numpy as np
 from sklearn.ensemble import IsolationForest
 
+log = logging.getLogger(__name__)
+
+NUM_FEATURES = 3
+
 @dataclass
 class SecurityReport:
     """A structured report of a session's security analysis."""
@@ -18,30 +28,135 @@ class SecurityReport:
     threats: List[str]
     recommendations: List[str]
 
+class FeatureReservoir:
+    """
+    A bounded, thread-safe uniform sample of observed feature vectors.
+
+    Uses reservoir sampling (Algorithm R), so memory stays fixed no matter
+    how many sessions are analyzed while every observation has an equal
+    chance of being kept.
+    """
+
+    def __init__(self, capacity: int = 10000, num_features: int = NUM_FEATURES):
+        if capacity < 1:
+            raise ValueError("Reservoir capacity must be a positive number.")
+        self.capacity = capacity
+        self._samples = np.empty((capacity, num_features))
+        self._seen = 0
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._seen, self.capacity)
+
+    def add(self, features: np.ndarray) -> None:
+        """
+        Offers one or more feature rows to the reservoir.
+        """
+        with self._lock:
+            for row in np.atleast_2d(features):
+                if self._seen < self.capacity:
+                    self._samples[self._seen] = row
+                else:
+                    slot = self._rng.randrange(self._seen + 1)
+                    if slot < self.capacity:
+                        self._samples[slot] = row
+                self._seen += 1
+
+    def snapshot(self) -> np.ndarray:
+        """
+        Returns a copy of the current sample, safe to use outside the lock.
+        """
+        with self._lock:
+            return self._samples[:len(self)].copy()
+
 class SessionSecurityAI:
     """
     Analyzes session data using a pre-trained Isolation Forest model
     to detect anomalies and assess risk.
     """
 
-    def __init__(self, model_path: str = None):
+    def __init__(
+        self,
+        model_path: str = None,
+        mmap_mode: Optional[str] = "r",
+        reservoir_size: int = 10000,
+        random_state: Optional[int] = 42,
+    ):
         """
         Initializes the security AI.
 
         Args:
-            model_path: Path to a pre-trained model file. If None,
-                        a mock model is created.
+            model_path: Path to a pre-trained model file. If the file exists
+                        the model is loaded from it; otherwise a mock model is
+                        trained and, when a path was given, persisted there so
+                        that later instances and processes can load it.
+            mmap_mode: Memory-map mode passed to joblib when loading. The
+                       default read-only mapping lets several processes
+                       share the model's array pages.
+            reservoir_size: Number of observed feature vectors kept for
+                            background retraining.
+            random_state: Seed for retrained models, so retraining on the
+                          same sample gives the same model.
         """
-        if model_path:
-            # In a real scenario, we would load the model from a file.
-            # self.model = joblib.load(model_path)
-            pass
+        self.model_path = model_path
+        self.random_state = random_state
+        self.reservoir = FeatureReservoir(reservoir_size)
+        self._retrain_thread = None
+        self._stop_retraining = threading.Event()
+
+        if model_path and os.path.exists(model_path):
+            self.model = self.load_model(model_path, mmap_mode=mmap_mode)
         else:
-            # For this task, we create a mock pre-trained model.
-            # This model is "trained" on normal-looking data.
-            rng = np.random.RandomState(42)
-            X_train = 0.2 * rng.randn(100, 3)
-            self.model = IsolationForest(random_state=rng).fit(X_train)
+            self.model = self._train_default_model()
+            if model_path:
+                self.save_model(model_path)
+
+    @staticmethod
+    def _train_default_model() -> IsolationForest:
+        """
+        Trains the mock model on normal-looking data.
+        """
+        rng = np.random.RandomState(42)
+        X_train = 0.2 * rng.randn(100, 3)
+        return IsolationForest(random_state=rng).fit(X_train)
+
+    @staticmethod
+    def load_model(model_path: str, mmap_mode: Optional[str] = "r") -> IsolationForest:
+        """
+        Loads a model previously written by `save_model`.
+
+        Args:
+            model_path: Path to the serialized model.
+            mmap_mode: Memory-map mode for the model's NumPy arrays, or None
+                       to read them fully into memory.
+
+        Returns:
+            The deserialized model.
+        """
+        return joblib.load(model_path, mmap_mode=mmap_mode)
+
+    def save_model(self, model_path: str) -> None:
+        """
+        Serializes the current model to disk.
+
+        The model is written to a temporary file in the target directory and
+        renamed into place, so concurrent readers never see a partial file.
+
+        Args:
+            model_path: Destination path for the serialized model.
+        """
+        directory = os.path.dirname(os.path.abspath(model_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(self.model, tmp_path)
+            os.replace(tmp_path, model_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
     def _extract_features(self, session_data: Dict[str, Any]) -> np.ndarray:
         """
@@ -62,31 +177,68 @@ class SessionSecurityAI:
 
         return features
 
-    def analyze_session(self, session_data: Dict[str, Any]) -> SecurityReport:
+    def _extract_features_bulk(self, batch: Mapping[str, Any]) -> np.ndarray:
         """
-        Analyzes mock session data to produce a security report.
+        Extracts the model features for a columnar batch of sessions.
 
-        Args:
-            session_data: A dictionary containing mock session data.
+        This mirrors `_extract_features`, but operates on whole columns at
+        once. `last_login_time` may hold "HH:MM" strings or numeric hours.
+        """
+        def column(name):
+            try:
+                values = batch[name]
+            except KeyError:
+                return None
+            return np.asarray(values)
 
-        Returns:
-            A SecurityReport with the analysis results.
+        login_times = column("last_login_time")
+        message_frequency = column("message_frequency_per_hour")
+        api_calls = column("api_calls_last_24h")
+
+        num_rows = next(
+            (len(c) for c in (login_times, message_frequency, api_calls) if c is not None),
+            0,
+        )
+
+        if login_times is None:
+            login_hours = np.zeros(num_rows)
+        elif login_times.dtype.kind in ("U", "S", "O"):
+            login_hours = np.char.partition(login_times.astype(str), ":")[:, 0].astype(int)
+        else:
+            login_hours = login_times.astype(float)
+
+        if message_frequency is None:
+            message_frequency = np.zeros(num_rows)
+        if api_calls is None:
+            api_calls = np.zeros(num_rows)
+
+        return np.column_stack((
+            login_hours / 24.0,
+            message_frequency.astype(float) / 1000.0,
+            api_calls.astype(float) / 100.0,
+        ))
+
+    @staticmethod
+    def _risk_scores(anomaly_scores: np.ndarray) -> np.ndarray:
         """
-        features = self._extract_features(session_data)
+        Converts `decision_function` output to risk scores from 0.0 to 1.0.
 
-        # The `decision_function` gives a score where negative values are
-        # more anomalous. We'll invert and scale it to be a risk score
-        # from 0.0 to 1.0.
-        anomaly_score = self.model.decision_function(features)[0]
-        risk_score = 1 / (1 + np.exp(anomaly_score * 5)) # Sigmoid scaling
+        Negative anomaly scores are more anomalous, so the sigmoid is inverted.
+        """
+        return 1 / (1 + np.exp(anomaly_scores * 5))
 
+    @staticmethod
+    def _build_report(risk_score: float, login_feature: float) -> SecurityReport:
+        """
+        Turns a risk score into a report with threats and recommendations.
+        """
         threats = []
         recommendations = []
 
         if risk_score > 0.7:
             threats.append("Anomalous Activity Detected")
             recommendations.append("Review recent session activity for suspicious behavior.")
-            if features[0, 0] > 0.9 or features[0, 0] < 0.2: # Late night or early morning
+            if login_feature > 0.9 or login_feature < 0.2: # Late night or early morning
                  threats.append("Unusual Login Time")
                  recommendations.append("Verify the login was legitimate.")
 
@@ -104,3 +256,126 @@ class SessionSecurityAI:
             threats=threats,
             recommendations=recommendations,
         )
+
+    def analyze_session(self, session_data: Dict[str, Any], observe: bool = False) -> SecurityReport:
+        """
+        Analyzes mock session data to produce a security report.
+
+        Args:
+            session_data: A dictionary containing mock session data.
+            observe: Whether to add the session to the retraining reservoir.
+                     Only pass True when every feature was measured from
+                     the session; placeholder values would teach the model
+                     that they are normal.
+
+        Returns:
+            A SecurityReport with the analysis results.
+        """
+        features = self._extract_features(session_data)
+        if observe:
+            self.reservoir.add(features)
+
+        anomaly_score = self.model.decision_function(features)[0]
+        risk_score = self._risk_scores(anomaly_score)
+
+        return self._build_report(risk_score, features[0, 0])
+
+    def analyze_sessions_bulk(
+        self, batch: Mapping[str, Any], batch_size: Optional[int] = None
+    ) -> Iterator[SecurityReport]:
+        """
+        Analyzes a columnar batch of sessions, yielding one report per row.
+
+        Features are extracted column-wise and the model is called once per
+        `batch_size` rows (once overall by default), so scoring every session
+        in the database costs a handful of vectorized calls rather than one
+        model invocation per session. Bulk audits are not added to the
+        retraining reservoir, so they do not skew it towards stored sessions.
+
+        Args:
+            batch: A pandas DataFrame or a mapping of column name to array,
+                   using the same keys as `analyze_session`.
+            batch_size: Optional maximum number of rows scored per model call.
+
+        Yields:
+            A SecurityReport for each row, in input order.
+        """
+        model = self.model
+        features = self._extract_features_bulk(batch)
+        num_rows = features.shape[0]
+        step = batch_size or max(num_rows, 1)
+
+        for start in range(0, num_rows, step):
+            block = features[start:start + step]
+            risk_scores = self._risk_scores(model.decision_function(block))
+            for risk_score, login_feature in zip(risk_scores, block[:, 0]):
+                yield self._build_report(float(risk_score), login_feature)
+
+    def retrain(self, min_samples: int = 256, min_distinct: int = 32) -> bool:
+        """
+        Fits a fresh model on the reservoir sample and swaps it in.
+
+        The new model is trained entirely on a snapshot, then published with
+        a single attribute assignment, so concurrent analyses keep using the
+        previous model until the swap and never wait on training. A sample
+        made of a few repeated vectors says nothing about normal behavior,
+        so it is not trained on.
+
+        Args:
+            min_samples: Minimum number of observed vectors required before
+                         a retrain is attempted.
+            min_distinct: Minimum number of distinct vectors among them.
+
+        Returns:
+            True if the model was replaced, False if there was too little data.
+        """
+        samples = self.reservoir.snapshot()
+        if len(samples) < min_samples:
+            return False
+        distinct = len(np.unique(samples, axis=0))
+        if distinct < min_distinct:
+            log.warning(f"Not retraining the security model: only {distinct} distinct sessions observed")
+            return False
+
+        new_model = IsolationForest(random_state=self.random_state).fit(samples)
+        self.model = new_model
+        if self.model_path:
+            self.save_model(self.model_path)
+        log.info(f"Security model retrained on {len(samples)} observed sessions")
+        return True
+
+    def start_retraining(self, interval: float = 3600, min_samples: int = 256, min_distinct: int = 32) -> None:
+        """
+        Starts periodic background retraining in a daemon thread.
+
+        Args:
+            interval: Seconds between retraining attempts.
+            min_samples: Passed through to `retrain`.
+            min_distinct: Passed through to `retrain`.
+        """
+        if self._retrain_thread and self._retrain_thread.is_alive():
+            return
+        self._stop_retraining.clear()
+        self._retrain_thread = threading.Thread(
+            target=self._retrain_loop, args=(interval, min_samples, min_distinct), daemon=True
+        )
+        self._retrain_thread.start()
+
+    def stop_retraining(self) -> None:
+        """
+        Stops the background retraining thread.
+        """
+        self._stop_retraining.set()
+        if self._retrain_thread:
+            self._retrain_thread.join()
+            self._retrain_thread = None
+
+    def _retrain_loop(self, interval: float, min_samples: int, min_distinct: int) -> None:
+        """
+        Retrains every `interval` seconds until stopped.
+        """
+        while not self._stop_retraining.wait(interval):
+            try:
+                self.retrain(min_samples, min_distinct)
+            except Exception as e:
+                log.error(f"Background retraining failed: {e}")